@@ -1,12 +1,17 @@
 from datetime import datetime, timedelta
 from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 from jose import JWTError, jwt
 import bcrypt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from app.models import TokenData
+from app.models import TokenData, Principal
+from app.cache import TTLCache
+from app.database import get_database
 import os
 import hashlib
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,17 +19,34 @@ load_dotenv()
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-this-in-production")
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+PRINCIPAL_CACHE_MAX_SIZE = int(os.getenv("PRINCIPAL_CACHE_MAX_SIZE", "10000"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+# Hash schemes stored in users.password_scheme
+PASSWORD_SCHEME = "sha256-bcrypt"
+LEGACY_PASSWORD_SCHEME = "bcrypt"
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
+# Resolved principals keyed by (subject, token expiry)
+_principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_MAX_SIZE, ttl=PRINCIPAL_CACHE_TTL_SECONDS)
+
+# bcrypt releases the GIL, so a small thread pool keeps password work off the event loop
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_password_pending = 0
+
 def _pre_hash_password(password: str) -> bytes:
     """Pre-hash password with SHA-256 to handle bcrypt's 72-byte limit."""
     return hashlib.sha256(password.encode('utf-8')).digest()
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against a bcrypt hash.
-    Supports both new (pre-hashed) and old (direct) password hashes for backward compatibility.
+def match_password_scheme(plain_password: str, hashed_password: str, allow_legacy: bool = True) -> Optional[str]:
+    """Return the scheme the password matched (PASSWORD_SCHEME or LEGACY_PASSWORD_SCHEME), or None.
+    The legacy (direct) check is only attempted when allow_legacy is set.
     """
+    if not hashed_password:
+        return None
     # Ensure hashed_password is bytes
     if isinstance(hashed_password, str):
         hashed_password_bytes = hashed_password.encode('utf-8')
@@ -34,14 +56,24 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     # Try new method first (with SHA-256 pre-hashing)
     pre_hashed = _pre_hash_password(plain_password)
     if bcrypt.checkpw(pre_hashed, hashed_password_bytes):
-        return True
+        return PASSWORD_SCHEME
+    if not allow_legacy:
+        return None
     
     # Fallback to old method (direct password) for backward compatibility
     try:
-        return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password_bytes)
+        if bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password_bytes):
+            return LEGACY_PASSWORD_SCHEME
     except ValueError:
         # Password too long for old method, but new method already failed
-        return False
+        pass
+    return None
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against a bcrypt hash.
+    Supports both new (pre-hashed) and old (direct) password hashes for backward compatibility.
+    """
+    return match_password_scheme(plain_password, hashed_password) is not None
 
 def get_password_hash(password: str) -> str:
     """Hash a password using bcrypt with SHA-256 pre-hashing."""
@@ -51,6 +83,44 @@ def get_password_hash(password: str) -> str:
     hashed = bcrypt.hashpw(pre_hashed, salt)
     return hashed.decode('utf-8')
 
+async def _run_password_work(func, *args):
+    """Run CPU-bound password work on the password pool, rejecting fast with 503 when it is saturated."""
+    global _password_pending
+    if _password_pending >= PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    _password_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_password_executor, func, *args)
+    finally:
+        _password_pending -= 1
+
+async def verify_password_async(
+    plain_password: str,
+    hashed_password: str,
+    password_scheme: Optional[str] = None
+) -> Optional[str]:
+    """Verify a password off the event loop. Returns the matched scheme, or None.
+    Users already marked with the current scheme skip the legacy fallback check.
+    """
+    return await _run_password_work(
+        match_password_scheme,
+        plain_password,
+        hashed_password,
+        password_scheme != PASSWORD_SCHEME
+    )
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password off the event loop."""
+    return await _run_password_work(get_password_hash, password)
+
+def shutdown_password_pool() -> None:
+    _password_executor.shutdown(wait=False)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -77,3 +147,49 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         raise credentials_exception
     return token_data
 
+
+async def get_current_principal(token: str = Depends(oauth2_scheme)) -> Principal:
+    """Resolve the JWT to its user's id, role and active flag, served from cache when possible."""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise credentials_exception
+    email = payload.get("sub")
+    if email is None:
+        raise credentials_exception
+    expires_at = payload.get("exp")
+    
+    cache_key = (email, expires_at)
+    principal = _principal_cache.get(cache_key)
+    if principal is None:
+        db = get_database()
+        user = await db.users.find_one({"email": email}, {"email": 1, "role": 1, "is_active": 1})
+        if not user:
+            raise credentials_exception
+        principal = Principal(
+            id=str(user["_id"]),
+            email=user["email"],
+            role=user.get("role", "buyer"),
+            is_active=user.get("is_active", True)
+        )
+        # Never keep a principal around longer than its token is valid
+        ttl = PRINCIPAL_CACHE_TTL_SECONDS
+        if expires_at is not None:
+            ttl = min(ttl, expires_at - time.time())
+        _principal_cache.set(cache_key, principal, ttl=ttl)
+    
+    if not principal.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User account is inactive"
+        )
+    return principal
+
+def invalidate_principal(email: str) -> None:
+    """Drop every cached principal for a user, e.g. after their role or active flag changes."""
+    _principal_cache.discard_where(lambda key: key[0] == email)
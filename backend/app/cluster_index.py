@@ -0,0 +1,223 @@
+"""
+Per-worker grid index for map marker clustering.
+
+Every approved, active listing with a location is counted into one grid cell per level.
+Level L splits the world into 2^L x 2^L equal longitude/latitude cells; each cell keeps
+the listing count, coordinate sums (for the centroid) and a sorted price list (for the
+price range), so a cluster query only reads the pre-aggregated cells inside the
+viewport. Rows are kept fresh through the change hooks and the whole index is rebuilt
+from MongoDB every CLUSTER_INDEX_REBUILD_SECONDS to pick up writes made by other workers.
+
+A map zoom level z uses grid level z + 2: about four clusters across a 256px tile.
+"""
+import asyncio
+import bisect
+import os
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from dotenv import load_dotenv
+
+from app import hooks
+
+load_dotenv()
+
+CLUSTER_INDEX_ENABLED = os.getenv("CLUSTER_INDEX_ENABLED", "true").lower() == "true"
+CLUSTER_INDEX_REBUILD_SECONDS = float(os.getenv("CLUSTER_INDEX_REBUILD_SECONDS", "600"))
+
+MIN_LEVEL = 2
+MAX_LEVEL = 20
+MAX_ZOOM = MAX_LEVEL - MIN_LEVEL
+
+PROJECTION = {"location": 1, "price": 1}
+
+
+class Cell:
+    __slots__ = ("count", "sum_lat", "sum_lng", "prices")
+
+    def __init__(self):
+        self.count = 0
+        self.sum_lat = 0.0
+        self.sum_lng = 0.0
+        self.prices: List[float] = []
+
+
+def _cell_key(level: int, latitude: float, longitude: float) -> Tuple[int, int]:
+    cells = 1 << level
+    x = min(int((longitude + 180.0) / 360.0 * cells), cells - 1)
+    y = min(int((latitude + 90.0) / 180.0 * cells), cells - 1)
+    return x, y
+
+
+def _cell_bounds(level: int, x: int, y: int) -> List[float]:
+    width, height = 360.0 / (1 << level), 180.0 / (1 << level)
+    return [x * width - 180.0, y * height - 90.0, (x + 1) * width - 180.0, (y + 1) * height - 90.0]
+
+
+def _point(document: dict) -> Optional[Tuple[float, float, Optional[float]]]:
+    location = document.get("location")
+    if not location:
+        return None
+    longitude, latitude = location["coordinates"]
+    price = document.get("price")
+    return latitude, longitude, float(price) if price is not None else None
+
+
+class ClusterIndex:
+    def __init__(self):
+        self.ready = False
+        self._pending_changes: Optional[List[Tuple[str, dict]]] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._points: Dict[ObjectId, Tuple[float, float, Optional[float]]] = {}
+        self._levels: List[Dict[Tuple[int, int], Cell]] = [{} for _ in range(MAX_LEVEL + 1)]
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    # ----------------------------------------
+    # Writes
+    # ----------------------------------------
+
+    def _add(self, point: Tuple[float, float, Optional[float]]) -> None:
+        latitude, longitude, price = point
+        for level in range(MIN_LEVEL, MAX_LEVEL + 1):
+            key = _cell_key(level, latitude, longitude)
+            cell = self._levels[level].get(key)
+            if cell is None:
+                cell = self._levels[level][key] = Cell()
+            cell.count += 1
+            cell.sum_lat += latitude
+            cell.sum_lng += longitude
+            if price is not None:
+                bisect.insort(cell.prices, price)
+
+    def _subtract(self, point: Tuple[float, float, Optional[float]]) -> None:
+        latitude, longitude, price = point
+        for level in range(MIN_LEVEL, MAX_LEVEL + 1):
+            key = _cell_key(level, latitude, longitude)
+            cell = self._levels[level][key]
+            cell.count -= 1
+            if cell.count == 0:
+                del self._levels[level][key]
+                continue
+            cell.sum_lat -= latitude
+            cell.sum_lng -= longitude
+            if price is not None:
+                del cell.prices[bisect.bisect_left(cell.prices, price)]
+
+    def upsert(self, document: dict) -> None:
+        """Index an approved, active listing with a location; anything else is removed."""
+        point = _point(document)
+        if point is None or not document.get("is_active", True) or document.get("status") != "approved":
+            self.remove(document["_id"])
+            return
+        previous = self._points.get(document["_id"])
+        if previous == point:
+            return
+        if previous is not None:
+            self._subtract(previous)
+        self._add(point)
+        self._points[document["_id"]] = point
+
+    def remove(self, object_id: ObjectId) -> None:
+        point = self._points.pop(object_id, None)
+        if point is not None:
+            self._subtract(point)
+
+    def apply_change(self, action: str, document: dict) -> None:
+        """hooks subscriber for the properties collection."""
+        if self._pending_changes is not None:
+            # A rebuild is loading a fresh snapshot; replay this change on top of it
+            self._pending_changes.append((action, document))
+        if action == hooks.UPSERT:
+            self.upsert(document)
+        else:
+            self.remove(document["_id"])
+
+    async def rebuild(self, db) -> None:
+        """Reload every approved listing with a location from MongoDB."""
+        self._pending_changes = []
+        try:
+            fresh = ClusterIndex.__new__(ClusterIndex)
+            fresh._reset()
+            query = {"is_active": True, "status": "approved", "location": {"$ne": None}}
+            async for document in db.properties.find(query, PROJECTION):
+                document.update(is_active=True, status="approved")
+                fresh.upsert(document)
+            for action, document in self._pending_changes:
+                if action == hooks.UPSERT:
+                    fresh.upsert(document)
+                else:
+                    fresh.remove(document["_id"])
+            self._points, self._levels = fresh._points, fresh._levels
+            self.ready = True
+        finally:
+            self._pending_changes = None
+
+    # ----------------------------------------
+    # Reads
+    # ----------------------------------------
+
+    def clusters(self, bbox: Tuple[float, float, float, float], zoom: int) -> List[dict]:
+        """Clusters for every grid cell overlapping the viewport at this zoom."""
+        level = min(max(zoom, 0), MAX_ZOOM) + MIN_LEVEL
+        cells = self._levels[level]
+        min_lng, min_lat, max_lng, max_lat = bbox
+        low_x, low_y = _cell_key(level, min_lat, min_lng)
+        high_x, high_y = _cell_key(level, max_lat, max_lng)
+        span = (high_x - low_x + 1) * (high_y - low_y + 1)
+        if span <= len(cells):
+            keys = (
+                (x, y) for x in range(low_x, high_x + 1) for y in range(low_y, high_y + 1)
+                if (x, y) in cells
+            )
+        else:
+            # Viewport larger than the populated part of the grid: walk the populated cells
+            keys = (key for key in cells if low_x <= key[0] <= high_x and low_y <= key[1] <= high_y)
+
+        result = []
+        for x, y in keys:
+            cell = cells[(x, y)]
+            result.append({
+                "count": cell.count,
+                "centroid": {"lat": cell.sum_lat / cell.count, "lng": cell.sum_lng / cell.count},
+                "price_min": cell.prices[0] if cell.prices else None,
+                "price_max": cell.prices[-1] if cell.prices else None,
+                "bounds": _cell_bounds(level, x, y),
+            })
+        return result
+
+
+cluster_index: Optional[ClusterIndex] = ClusterIndex() if CLUSTER_INDEX_ENABLED else None
+_rebuild_task: Optional[asyncio.Task] = None
+
+
+def get_cluster_index() -> Optional[ClusterIndex]:
+    """The index, if enabled and loaded."""
+    if cluster_index is not None and cluster_index.ready:
+        return cluster_index
+    return None
+
+
+async def _rebuild_loop(db) -> None:
+    while True:
+        try:
+            await cluster_index.rebuild(db)
+        except Exception as e:
+            print(f"Warning: cluster index rebuild failed: {e}")
+        await asyncio.sleep(CLUSTER_INDEX_REBUILD_SECONDS)
+
+
+def start_cluster_index(db) -> None:
+    global _rebuild_task
+    if cluster_index is None:
+        return
+    hooks.subscribe("properties", cluster_index.apply_change)
+    _rebuild_task = asyncio.create_task(_rebuild_loop(db))
+
+
+async def stop_cluster_index() -> None:
+    if _rebuild_task is not None:
+        _rebuild_task.cancel()
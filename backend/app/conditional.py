@@ -0,0 +1,117 @@
+"""
+Conditional GET support: ETag / If-None-Match, Last-Modified / If-Modified-Since and
+per-route Cache-Control.
+
+Detail routes derive a strong ETag from the document id, `updated_at` and any counters
+that change without touching `updated_at` (views, registrations), so a matching
+If-None-Match is answered with 304 straight after the read, before the response model is
+built. List routes hash the encoded body instead.
+
+Cache-Control defaults to "public, no-cache" (always revalidate, which the ETag makes
+cheap). Override per route with CACHE_CONTROL_POLICIES, a JSON object such as
+    {"property": "public, max-age=60", "properties": "public, max-age=15"}
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+from fastapi import Request, Response
+
+load_dotenv()
+
+DEFAULT_CACHE_CONTROL = "public, no-cache"
+CACHE_CONTROL_POLICIES: Dict[str, str] = json.loads(os.getenv("CACHE_CONTROL_POLICIES", "{}"))
+
+
+def cache_control(route: str) -> str:
+    return CACHE_CONTROL_POLICIES.get(route, DEFAULT_CACHE_CONTROL)
+
+
+def document_etag(document: dict, *counter_fields: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for value in (document["_id"], document.get("updated_at") or document.get("created_at")):
+        digest.update(repr(value).encode())
+    for field in counter_fields:
+        digest.update(repr(document.get(field)).encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def body_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def _http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison: ignore W/ prefixes on either side
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def _not_modified_since(request: Request, last_modified: Optional[datetime]) -> bool:
+    header = request.headers.get("if-modified-since")
+    if not header or last_modified is None or "if-none-match" in request.headers:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    # HTTP dates have one-second resolution
+    return last_modified.replace(microsecond=0) <= since
+
+
+def _validators(route: str, etag: str, last_modified: Optional[datetime]) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": cache_control(route)}
+    if last_modified is not None:
+        headers["Last-Modified"] = _http_date(last_modified)
+    return headers
+
+
+def check_document(
+    request: Request,
+    response: Response,
+    route: str,
+    document: dict,
+    *counter_fields: str
+) -> Optional[Response]:
+    """Return a 304 if the client's copy of `document` is current; otherwise set the
+    validators on the injected `response` and return None so the handler carries on.
+
+    counter_fields: fields that change without bumping updated_at. Last-Modified cannot
+    see those changes, so If-Modified-Since is only honoured for documents without them.
+    """
+    etag = document_etag(document, *counter_fields)
+    last_modified = document.get("updated_at")
+    headers = _validators(route, etag, last_modified)
+    if _etag_matches(request, etag) or (
+        not counter_fields and _not_modified_since(request, last_modified)
+    ):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+def check_body(request: Request, response: Response, route: str) -> Response:
+    """Tag an encoded response with a content-hash ETag (kept if already present, e.g. on
+    a response-cache hit) and answer 304 when the client already has it."""
+    etag = response.headers.get("etag") or body_etag(response.body)
+    headers = _validators(route, etag, None)
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return response
@@ -0,0 +1,146 @@
+"""
+Facet counts and histograms for the property and rental filter panels.
+
+One aggregation answers a whole panel: the filters that are not facets ($match up front)
+narrow the collection once, then a $facet stage runs one branch per facet. Each branch
+applies the *other* facet filters but not its own, so a panel with "flat" selected still
+shows how many villas or plots the rest of the filters would match. Histograms use fixed
+bucket boundaries so the buckets stay put while the user refines the filters.
+
+Results are cached per worker by the normalized filter (city_id rather than the typed
+city, etc.) and dropped whenever the collection changes.
+"""
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from app import hooks
+from app.cache import TTLCache
+from app.geo import unordered
+
+load_dotenv()
+
+FACETS_CACHE_TTL_SECONDS = float(os.getenv("FACETS_CACHE_TTL_SECONDS", "60"))
+
+INFINITY = float("inf")
+TERM_LIMIT = 50
+
+LAKH = 100_000
+PRICE_BOUNDARIES = [0, 10 * LAKH, 25 * LAKH, 50 * LAKH, 75 * LAKH, 100 * LAKH, 200 * LAKH, 500 * LAKH, 1000 * LAKH, INFINITY]
+AREA_BOUNDARIES = [0, 500, 1000, 1500, 2000, 3000, 5000, 10_000, 43_560, INFINITY]
+RENT_BOUNDARIES = [0, 5_000, 10_000, 15_000, 25_000, 50_000, 100_000, INFINITY]
+
+# Collection -> term facets (name -> field, label field) and histograms (field -> boundaries)
+FACETS: Dict[str, Dict[str, Any]] = {
+    "properties": {
+        "terms": {
+            "property_type": ("property_type", None),
+            "listing_type": ("listing_type", None),
+            "bedrooms": ("bedrooms", None),
+            "city": ("city_id", "city"),
+        },
+        "histograms": {"price": PRICE_BOUNDARIES, "area_sqft": AREA_BOUNDARIES},
+    },
+    "rentals": {
+        "terms": {
+            "property_type": ("property_type", None),
+            "rent_type": ("rent_type", None),
+            "tenant_type": ("tenant_type", None),
+            "bedrooms": ("bedrooms", None),
+            "city": ("city_id", "city"),
+        },
+        "histograms": {"monthly_rent": RENT_BOUNDARIES, "area_sqft": AREA_BOUNDARIES},
+    },
+}
+
+_cache = TTLCache(maxsize=1000, ttl=FACETS_CACHE_TTL_SECONDS)
+
+
+def _facet_fields(collection: str) -> List[str]:
+    config = FACETS[collection]
+    return [field for field, _ in config["terms"].values()] + list(config["histograms"])
+
+
+def facet_pipeline(collection: str, filter_dict: Dict[str, Any]) -> List[dict]:
+    """Aggregation pipeline computing every facet of `collection` under `filter_dict`."""
+    config = FACETS[collection]
+    fields = _facet_fields(collection)
+    base = {key: value for key, value in filter_dict.items() if key not in fields}
+    if "location" in base:
+        base["location"] = unordered(base["location"])
+    selected = {key: value for key, value in filter_dict.items() if key in fields}
+
+    def others(field: str) -> List[dict]:
+        conditions = {key: value for key, value in selected.items() if key != field}
+        return [{"$match": conditions}] if conditions else []
+
+    branches = {"total": others("") + [{"$count": "count"}]}
+    for name, (field, label) in config["terms"].items():
+        group = {"_id": f"${field}", "count": {"$sum": 1}}
+        if label:
+            group["label"] = {"$first": f"${label}"}
+        branches[name] = others(field) + [
+            {"$match": {field: {"$ne": None}}},
+            {"$group": group},
+            {"$sort": {"count": -1, "_id": 1}},
+            {"$limit": TERM_LIMIT},
+        ]
+    for field, boundaries in config["histograms"].items():
+        branches[field] = others(field) + [
+            {"$match": {field: {"$gte": boundaries[0], "$lt": boundaries[-1]}}},
+            {"$bucket": {"groupBy": f"${field}", "boundaries": boundaries, "output": {"count": {"$sum": 1}}}},
+        ]
+    return [{"$match": base}, {"$facet": branches}]
+
+
+def _histogram(buckets: List[dict], boundaries: List[float]) -> List[dict]:
+    counts = {bucket["_id"]: bucket["count"] for bucket in buckets}
+    return [
+        {"min": low, "max": None if high == INFINITY else high, "count": counts.get(low, 0)}
+        for low, high in zip(boundaries, boundaries[1:])
+    ]
+
+
+def _shape(collection: str, result: dict) -> dict:
+    config = FACETS[collection]
+    terms = {}
+    for name, (_, label) in config["terms"].items():
+        terms[name] = [
+            {"value": row["_id"], "count": row["count"], **({"label": row.get("label")} if label else {})}
+            for row in result[name]
+        ]
+    return {
+        "total": result["total"][0]["count"] if result["total"] else 0,
+        "facets": terms,
+        "histograms": {
+            field: _histogram(result[field], boundaries) for field, boundaries in config["histograms"].items()
+        },
+    }
+
+
+def facet_key(collection: str, filter_dict: Dict[str, Any], extra: str = "") -> str:
+    return f"{collection}:{json.dumps(filter_dict, sort_keys=True, default=str)}:{extra}"
+
+
+async def facet_counts(db, collection: str, filter_dict: Dict[str, Any], cache_key: Optional[str] = None) -> dict:
+    """Facet counts and histograms for `filter_dict`, cached under `cache_key`
+    (facet_key of the filter by default)."""
+    key = cache_key or facet_key(collection, filter_dict)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+    results = await db[collection].aggregate(facet_pipeline(collection, filter_dict)).to_list(length=1)
+    facets = _shape(collection, results[0])
+    _cache.set(key, facets)
+    return facets
+
+
+def start_facets() -> None:
+    """Drop a collection's cached facets whenever it changes."""
+    for collection in FACETS:
+        hooks.subscribe(
+            collection,
+            lambda action, document, prefix=f"{collection}:": _cache.discard_where(lambda key: key.startswith(prefix))
+        )
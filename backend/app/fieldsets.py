@@ -0,0 +1,86 @@
+"""
+Sparse field selection for list endpoints.
+
+`?fields=title,price,city` returns only those fields (plus `id`); `?fields=summary`
+returns the compact card view defined below. Either is turned into a MongoDB projection,
+so unrequested fields are never read, sent over the wire or serialized. Without `fields`
+the full documents are returned as before.
+"""
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+# Only the first image is needed for a listing card thumbnail
+_FIRST_IMAGE = {"images": {"$slice": 1}}
+
+# Collection -> named view -> projection
+VIEWS: Dict[str, Dict[str, Dict[str, Any]]] = {
+    "properties": {
+        "summary": {
+            **{field: 1 for field in (
+                "title", "locality", "city", "state", "price", "property_type", "listing_type",
+                "area_sqft", "bedrooms", "bathrooms", "status", "created_at"
+            )},
+            **_FIRST_IMAGE,
+        },
+    },
+    "rentals": {
+        "summary": {
+            **{field: 1 for field in (
+                "title", "locality", "city", "state", "monthly_rent", "property_type", "rent_type",
+                "area_sqft", "bedrooms", "bathrooms", "created_at"
+            )},
+            **_FIRST_IMAGE,
+        },
+    },
+    "projects": {
+        "summary": {
+            **{field: 1 for field in (
+                "name", "location", "city", "state", "status", "available_units",
+                "price_range_min", "price_range_max", "created_at"
+            )},
+            **_FIRST_IMAGE,
+        },
+    },
+    "events": {
+        "summary": {
+            **{field: 1 for field in (
+                "title", "location", "city", "event_date", "event_time", "is_past", "registered_count"
+            )},
+            **_FIRST_IMAGE,
+        },
+    },
+    "investments": {
+        "summary": {
+            **{field: 1 for field in (
+                "title", "location", "city", "state", "investment_type", "min_investment",
+                "expected_roi", "created_at"
+            )},
+            **_FIRST_IMAGE,
+        },
+    },
+}
+
+FIELDS_DESCRIPTION = "Comma-separated fields to return, or 'summary' for the compact card view"
+
+
+def select_fields(fields: Optional[str], model: Type[BaseModel], collection: str) -> Optional[Dict[str, Any]]:
+    """Projection for a `fields` query parameter; None means full documents."""
+    if not fields:
+        return None
+    view = VIEWS.get(collection, {}).get(fields)
+    if view is not None:
+        return dict(view)
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in model.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown field(s): {', '.join(unknown)}")
+    return {name: 1 for name in names if name != "id"}
+
+
+def query_projection(projection: Optional[Dict[str, Any]], sort: List[Tuple[str, int]]) -> Optional[Dict[str, Any]]:
+    """The projection to query with: also loads the sort fields the next-page cursor is built from."""
+    if projection is None:
+        return None
+    return {**{field: 1 for field, _ in sort if field != "_id"}, **projection}
@@ -0,0 +1,69 @@
+"""
+Structured listing filters shared by the property list, its facets and saved searches.
+
+Each filter is a FastAPI dependency that turns the query parameters into the normalized
+MongoDB filter (city_id rather than the typed city, prefix regexes on the *_norm fields).
+"""
+from typing import Optional
+
+from fastapi import Query
+
+from app.models import ListingType, PropertyStatus, PropertyType
+from app.normalization import canonical_city_id, canonical_state_id, prefix_filter
+
+
+def property_filter(
+    city: Optional[str] = Query(None),
+    state: Optional[str] = Query(None),
+    locality: Optional[str] = Query(None),
+    property_type: Optional[PropertyType] = Query(None),
+    listing_type: Optional[ListingType] = Query(None),
+    min_price: Optional[float] = Query(None),
+    max_price: Optional[float] = Query(None),
+    min_area_sqft: Optional[float] = Query(None),
+    max_area_sqft: Optional[float] = Query(None),
+    bedrooms: Optional[int] = Query(None),
+    bathrooms: Optional[int] = Query(None),
+    parking: Optional[bool] = Query(None),
+    facing: Optional[str] = Query(None)
+) -> dict:
+    """MongoDB filter for approved listings matching the structured list filters"""
+    filter_dict = {
+        "is_active": True,
+        "status": PropertyStatus.APPROVED.value
+    }
+
+    if city:
+        filter_dict["city_id"] = canonical_city_id(city)
+    if state:
+        filter_dict["state_id"] = canonical_state_id(state)
+    if locality:
+        filter_dict["locality_norm"] = prefix_filter(locality)
+    if property_type:
+        filter_dict["property_type"] = property_type.value
+    if listing_type:
+        filter_dict["listing_type"] = listing_type.value
+    if min_price is not None:
+        filter_dict["price"] = {"$gte": min_price}
+    if max_price is not None:
+        if "price" in filter_dict:
+            filter_dict["price"]["$lte"] = max_price
+        else:
+            filter_dict["price"] = {"$lte": max_price}
+    if min_area_sqft is not None:
+        filter_dict["area_sqft"] = {"$gte": min_area_sqft}
+    if max_area_sqft is not None:
+        if "area_sqft" in filter_dict:
+            filter_dict["area_sqft"]["$lte"] = max_area_sqft
+        else:
+            filter_dict["area_sqft"] = {"$lte": max_area_sqft}
+    if bedrooms:
+        filter_dict["bedrooms"] = bedrooms
+    if bathrooms:
+        filter_dict["bathrooms"] = bathrooms
+    if parking is not None:
+        filter_dict["parking"] = parking
+    if facing:
+        filter_dict["facing_norm"] = prefix_filter(facing)
+
+    return filter_dict
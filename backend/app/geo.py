@@ -0,0 +1,103 @@
+"""
+Geospatial helpers for listings.
+
+Listings keep the `latitude`/`longitude` users typed and also store a GeoJSON
+`location` point (maintained on write by normalized_fields, or by geo_point_expression
+when an update changes only one coordinate, backfilled by the
+`backfill_geo_locations` migration) that a 2dsphere index serves:
+
+    near=lat,lng&radius_km=5             - listings within the radius, nearest first
+    within=min_lng,min_lat,max_lng,max_lat - listings inside a map viewport
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+MAX_RADIUS_KM = 200
+EARTH_RADIUS_M = 6_378_100
+
+
+def geo_point(latitude: Any, longitude: Any) -> Optional[Dict[str, Any]]:
+    """GeoJSON point for a coordinate pair, or None when it is missing or out of range."""
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+
+def geo_point_expression(latitude: str = "$latitude", longitude: str = "$longitude") -> Dict[str, Any]:
+    """Aggregation expression building the same point as geo_point from a document's own
+    fields, for pipeline updates that change only one coordinate."""
+    valid = {"$and": [
+        {"$isNumber": latitude}, {"$isNumber": longitude},
+        {"$gte": [latitude, -90]}, {"$lte": [latitude, 90]},
+        {"$gte": [longitude, -180]}, {"$lte": [longitude, 180]},
+    ]}
+    return {"$cond": [valid, {"type": "Point", "coordinates": [longitude, latitude]}, None]}
+
+
+def _floats(value: str, count: int, name: str) -> List[float]:
+    try:
+        numbers = [float(part) for part in value.split(",")]
+    except ValueError:
+        numbers = []
+    if len(numbers) != count:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}")
+    return numbers
+
+
+def parse_point(value: str) -> Tuple[float, float]:
+    latitude, longitude = _floats(value, 2, "near: expected lat,lng")
+    if geo_point(latitude, longitude) is None:
+        raise HTTPException(status_code=400, detail="Invalid near: coordinates out of range")
+    return latitude, longitude
+
+
+def parse_bbox(value: str) -> Tuple[float, float, float, float]:
+    min_lng, min_lat, max_lng, max_lat = _floats(value, 4, "within: expected min_lng,min_lat,max_lng,max_lat")
+    if (
+        geo_point(min_lat, min_lng) is None or geo_point(max_lat, max_lng) is None
+        or min_lng >= max_lng or min_lat >= max_lat
+    ):
+        raise HTTPException(status_code=400, detail="Invalid within: bounding box out of range")
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def bbox_polygon(bbox: Tuple[float, float, float, float]) -> Dict[str, Any]:
+    min_lng, min_lat, max_lng, max_lat = bbox
+    return {
+        "type": "Polygon",
+        "coordinates": [[
+            [min_lng, min_lat], [max_lng, min_lat], [max_lng, max_lat], [min_lng, max_lat], [min_lng, min_lat]
+        ]],
+    }
+
+
+def geo_filter(near: Optional[str], radius_km: float, within: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Condition on `location` for the near/within query parameters (None if neither is set).
+    A `near` condition makes MongoDB return results nearest first."""
+    if near and within:
+        raise HTTPException(status_code=400, detail="Use either near or within, not both")
+    if near:
+        latitude, longitude = parse_point(near)
+        return {"$nearSphere": {
+            "$geometry": {"type": "Point", "coordinates": [longitude, latitude]},
+            "$maxDistance": radius_km * 1000,
+        }}
+    if within:
+        return {"$geoWithin": {"$geometry": bbox_polygon(parse_bbox(within))}}
+    return None
+
+
+def unordered(condition: Dict[str, Any]) -> Dict[str, Any]:
+    """The area of a $nearSphere condition as a $geoWithin circle, for aggregation $match
+    stages (which reject $nearSphere). Other conditions are returned unchanged."""
+    near = condition.get("$nearSphere")
+    if near is None:
+        return condition
+    return {"$geoWithin": {"$centerSphere": [
+        near["$geometry"]["coordinates"], near["$maxDistance"] / EARTH_RADIUS_M
+    ]}}
@@ -0,0 +1,34 @@
+"""
+In-process change notifications.
+
+Routers call `notify()` after they write to a collection; in-memory indexes and caches
+`subscribe()` to keep themselves fresh without polling MongoDB.
+
+Actions:
+    "upsert" - document is the full, current document (with `_id`)
+    "remove" - document only needs `_id`; the row was deleted or soft-deleted
+"""
+import inspect
+from collections import defaultdict
+from typing import Any, Callable, Dict, List
+
+UPSERT = "upsert"
+REMOVE = "remove"
+
+_subscribers: Dict[str, List[Callable[[str, dict], Any]]] = defaultdict(list)
+
+
+def subscribe(collection: str, callback: Callable[[str, dict], Any]) -> None:
+    """Register callback(action, document) for changes to a collection. Callbacks may be async."""
+    _subscribers[collection].append(callback)
+
+
+async def notify(collection: str, action: str, document: dict) -> None:
+    """Fan a change out to every subscriber. A failing subscriber never fails the request."""
+    for callback in _subscribers.get(collection, []):
+        try:
+            result = callback(action, document)
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            print(f"Warning: {collection} change subscriber {getattr(callback, '__qualname__', callback)} failed: {e}")
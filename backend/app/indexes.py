@@ -0,0 +1,262 @@
+"""
+Declarative MongoDB index registry.
+
+Indexes are applied on startup and can be applied or verified from the command line:
+
+    python -m app.indexes           # create/refresh every registered index
+    python -m app.indexes --check   # explain() the canonical query shapes, report COLLSCANs
+"""
+import argparse
+import asyncio
+import sys
+from datetime import datetime
+from typing import Dict, List, Tuple, Any
+
+from pymongo import IndexModel, ASCENDING, DESCENDING, GEOSPHERE
+from pymongo.errors import OperationFailure
+
+# ========================================
+# INDEX REGISTRY
+# ========================================
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("role", ASCENDING)], name="role"),
+    ],
+    "properties": [
+        IndexModel(
+            [("is_active", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="active_status_created_id"
+        ),
+        IndexModel(
+            [("is_active", ASCENDING), ("status", ASCENDING), ("city_id", ASCENDING),
+             ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="active_status_city_created_id"
+        ),
+        IndexModel(
+            [("is_active", ASCENDING), ("status", ASCENDING), ("city_id", ASCENDING), ("locality_norm", ASCENDING)],
+            name="active_status_city_locality"
+        ),
+        IndexModel(
+            [("is_active", ASCENDING), ("property_type", ASCENDING), ("city_id", ASCENDING), ("price", ASCENDING)],
+            name="active_type_city_price"
+        ),
+        IndexModel([("seller_id", ASCENDING), ("created_at", DESCENDING)], name="seller_created"),
+        IndexModel(
+            [("location", GEOSPHERE), ("is_active", ASCENDING), ("status", ASCENDING)],
+            name="location_active_status"
+        ),
+        IndexModel([("updated_at", ASCENDING)], name="updated"),
+        IndexModel([("approved_at", ASCENDING)], name="approved"),
+    ],
+    "rentals": [
+        IndexModel(
+            [("is_active", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="active_status_created_id"
+        ),
+        IndexModel(
+            [("is_active", ASCENDING), ("status", ASCENDING), ("city_id", ASCENDING),
+             ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="active_status_city_created_id"
+        ),
+        IndexModel(
+            [("owner_id", ASCENDING), ("is_active", ASCENDING), ("created_at", DESCENDING)],
+            name="owner_active_created"
+        ),
+        IndexModel(
+            [("location", GEOSPHERE), ("is_active", ASCENDING), ("status", ASCENDING)],
+            name="location_active_status"
+        ),
+    ],
+    "projects": [
+        IndexModel(
+            [("is_active", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="active_status_created_id"
+        ),
+        IndexModel([("is_active", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="active_created_id"),
+        IndexModel(
+            [("is_active", ASCENDING), ("city_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="active_city_created_id"
+        ),
+    ],
+    "events": [
+        IndexModel(
+            [("is_active", ASCENDING), ("is_past", ASCENDING), ("event_date", ASCENDING), ("_id", ASCENDING)],
+            name="active_past_date_id"
+        ),
+        IndexModel([("is_active", ASCENDING), ("event_date", ASCENDING), ("_id", ASCENDING)], name="active_date_id"),
+        IndexModel(
+            [("is_active", ASCENDING), ("city_id", ASCENDING), ("event_date", ASCENDING), ("_id", ASCENDING)],
+            name="active_city_date_id"
+        ),
+    ],
+    "event_registrations": [
+        IndexModel([("event_id", ASCENDING), ("email", ASCENDING)], name="event_email_unique", unique=True),
+    ],
+    "investments": [
+        IndexModel([("is_active", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="active_created_id"),
+        IndexModel(
+            [("is_active", ASCENDING), ("city_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="active_city_created_id"
+        ),
+    ],
+    "investor_registrations": [
+        IndexModel([("email", ASCENDING)], name="email"),
+        IndexModel([("created_at", DESCENDING)], name="created"),
+    ],
+    "contact_submissions": [
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_id"),
+        IndexModel([("is_read", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="read_created_id"),
+    ],
+    "enquiries": [
+        IndexModel([("seller_id", ASCENDING), ("created_at", DESCENDING)], name="seller_created"),
+        IndexModel([("buyer_id", ASCENDING), ("created_at", DESCENDING)], name="buyer_created"),
+        IndexModel([("created_at", DESCENDING)], name="created"),
+        IndexModel([("is_read", ASCENDING)], name="read"),
+    ],
+    "recommendations": [
+        IndexModel([("buyer_id", ASCENDING), ("created_at", DESCENDING)], name="buyer_created"),
+    ],
+    "saved_searches": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created"),
+    ],
+    "property_requirements": [
+        IndexModel([("created_at", DESCENDING)], name="created"),
+        IndexModel([("is_fulfilled", ASCENDING), ("created_at", DESCENDING)], name="fulfilled_created"),
+        IndexModel([("city_id", ASCENDING), ("created_at", DESCENDING)], name="city_created"),
+    ],
+}
+
+# ========================================
+# CANONICAL QUERY SHAPES
+# ========================================
+
+# (name, collection, filter, sort) for the hot queries issued by the routers.
+# Values are placeholders - only the shape matters to the query planner.
+QUERY_SHAPES: List[Tuple[str, str, Dict[str, Any], List[Tuple[str, int]]]] = [
+    ("auth.login", "users", {"email": "user@example.com"}, []),
+    ("admin.users_by_role", "users", {"role": "admin"}, []),
+    ("properties.list", "properties",
+     {"is_active": True, "status": "approved"}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("properties.by_city", "properties",
+     {"is_active": True, "status": "approved", "city_id": "indore"},
+     [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("properties.by_locality_prefix", "properties",
+     {"is_active": True, "status": "approved", "city_id": "indore", "locality_norm": {"$regex": "^vijay"}}, []),
+    ("recommendations.match", "properties",
+     {"is_active": True, "status": "approved", "property_type": "flat", "city_id": "indore",
+      "price": {"$gte": 1, "$lte": 2}}, [("price", ASCENDING)]),
+    ("recommendations.changed_since", "properties",
+     {"is_active": True, "status": "approved", "property_type": "flat", "city_id": "indore",
+      "price": {"$gte": 1, "$lte": 2}, "updated_at": {"$gte": datetime(2024, 1, 1)}}, []),
+    ("properties.pending", "properties",
+     {"status": "pending", "is_active": True}, [("created_at", DESCENDING)]),
+    ("properties.my_properties", "properties",
+     {"seller_id": "000000000000000000000000"}, [("created_at", DESCENDING)]),
+    ("properties.near", "properties",
+     {"is_active": True, "status": "approved", "location": {"$nearSphere": {
+         "$geometry": {"type": "Point", "coordinates": [75.86, 22.72]}, "$maxDistance": 5000}}}, []),
+    ("properties.within_bbox", "properties",
+     {"is_active": True, "status": "approved", "location": {"$geoWithin": {"$geometry": {
+         "type": "Polygon", "coordinates": [[[75.8, 22.6], [76.0, 22.6], [76.0, 22.8], [75.8, 22.8], [75.8, 22.6]]]}}}},
+     []),
+    ("rentals.list", "rentals",
+     {"is_active": True, "status": "approved"}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("rentals.by_city", "rentals",
+     {"is_active": True, "status": "approved", "city_id": "indore"},
+     [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("rentals.my_listings", "rentals",
+     {"owner_id": "000000000000000000000000", "is_active": True}, [("created_at", DESCENDING)]),
+    ("projects.by_status", "projects",
+     {"is_active": True, "status": "completed"}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("projects.list", "projects", {"is_active": True}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("events.upcoming", "events",
+     {"is_active": True, "is_past": False}, [("event_date", ASCENDING), ("_id", ASCENDING)]),
+    ("events.list", "events", {"is_active": True}, [("event_date", ASCENDING), ("_id", ASCENDING)]),
+    ("events.registration_lookup", "event_registrations",
+     {"event_id": "000000000000000000000000", "email": "user@example.com"}, []),
+    ("investments.list", "investments", {"is_active": True}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("investments.registration_lookup", "investor_registrations", {"email": "user@example.com"}, []),
+    ("contact.list", "contact_submissions", {"is_read": False}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("enquiries.received", "enquiries",
+     {"seller_id": "000000000000000000000000"}, [("created_at", DESCENDING)]),
+    ("enquiries.sent", "enquiries",
+     {"buyer_id": "000000000000000000000000"}, [("created_at", DESCENDING)]),
+    ("recommendations.mine", "recommendations",
+     {"buyer_id": "000000000000000000000000"}, [("created_at", DESCENDING)]),
+    ("saved_searches.new_listings", "properties",
+     {"is_active": True, "status": "approved", "approved_at": {"$gt": datetime(2024, 1, 1), "$lte": datetime(2024, 1, 2)}},
+     []),
+    ("saved_searches.mine", "saved_searches",
+     {"user_id": "000000000000000000000000"}, [("created_at", DESCENDING)]),
+    ("requirements.list", "property_requirements",
+     {"is_fulfilled": False}, [("created_at", DESCENDING)]),
+]
+
+
+async def ensure_indexes(db) -> None:
+    """Create every registered index. Failures are reported per collection and do not abort startup."""
+    for collection_name, models in INDEXES.items():
+        try:
+            await db[collection_name].create_indexes(models)
+        except OperationFailure as e:
+            print(f"Warning: Could not create indexes on '{collection_name}': {e}")
+    print("MongoDB indexes ensured")
+
+
+def _plan_stages(plan: Any) -> List[str]:
+    """Collect every stage name that appears anywhere in an explain() plan."""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+
+async def verify_query_plans(db) -> List[str]:
+    """Run explain() on each canonical query shape and return the names of those still doing a COLLSCAN."""
+    collscans = []
+    for name, collection_name, filter_dict, sort in QUERY_SHAPES:
+        cursor = db[collection_name].find(filter_dict)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+        if "COLLSCAN" in _plan_stages(winning_plan):
+            collscans.append(name)
+            print(f"Warning: query shape '{name}' on '{collection_name}' is a COLLSCAN")
+    if not collscans:
+        print("All canonical query shapes are served by an index")
+    return collscans
+
+
+async def _main(check: bool) -> int:
+    from app.database import connect_to_mongo, close_mongo_connection, get_database
+
+    await connect_to_mongo()
+    try:
+        db = get_database()
+        await ensure_indexes(db)
+        if check:
+            collscans = await verify_query_plans(db)
+            return 1 if collscans else 0
+        return 0
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply the MongoDB index registry")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Also explain() each canonical query shape and exit non-zero on any COLLSCAN"
+    )
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.check)))
@@ -0,0 +1,303 @@
+"""
+Optional per-worker columnar index over active property listings.
+
+Numeric columns live in NumPy arrays (NaN for missing values) and categorical columns
+are dictionary-encoded into int32 codes, so a filter is a handful of vectorized boolean
+masks instead of a MongoDB query. Rows are kept fresh through the change hooks
+(create/update/approve/reject/delete) and the whole index is rebuilt from MongoDB every
+LISTING_INDEX_REBUILD_SECONDS to pick up writes made by other workers.
+
+Enable with LISTING_INDEX_ENABLED=true (requires numpy).
+"""
+import asyncio
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from dotenv import load_dotenv
+
+from app import hooks
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed when the index is enabled
+    np = None
+
+load_dotenv()
+
+LISTING_INDEX_ENABLED = os.getenv("LISTING_INDEX_ENABLED", "false").lower() == "true"
+LISTING_INDEX_REBUILD_SECONDS = float(os.getenv("LISTING_INDEX_REBUILD_SECONDS", "600"))
+
+NUMERIC_COLUMNS = ("price", "area_sqft", "bedrooms", "bathrooms", "parking")
+CATEGORICAL_COLUMNS = ("status", "property_type", "listing_type", "city_id", "state_id")
+
+PROJECTION = {field: 1 for field in NUMERIC_COLUMNS + CATEGORICAL_COLUMNS + ("created_at", "is_active")}
+
+_INITIAL_CAPACITY = 1024
+
+
+def _timestamp(value: Optional[datetime]) -> float:
+    if value is None:
+        return 0.0
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _object_id_keys(object_id: ObjectId) -> Tuple[int, int]:
+    """Split the 12-byte ObjectId into two integers that sort the same way the bytes do."""
+    raw = object_id.binary
+    return int.from_bytes(raw[:4], "big"), int.from_bytes(raw[4:], "big")
+
+
+def _numeric(value: Any) -> float:
+    if value is None:
+        return float("nan")
+    return float(value)
+
+
+class ListingIndex:
+    """Columnar snapshot of active listings supporting filtered, sorted id pages."""
+
+    def __init__(self):
+        self.ready = False
+        self._pending_changes: Optional[List[Tuple[str, dict]]] = None
+        self._reset(_INITIAL_CAPACITY)
+
+    def _reset(self, capacity: int) -> None:
+        self._size = 0
+        self._ids: List[ObjectId] = []
+        self._positions: Dict[ObjectId, int] = {}
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._created = np.zeros(capacity, dtype=np.float64)
+        self._oid_hi = np.zeros(capacity, dtype=np.uint64)
+        self._oid_lo = np.zeros(capacity, dtype=np.uint64)
+        self._numeric = {column: np.full(capacity, np.nan) for column in NUMERIC_COLUMNS}
+        self._codes = {column: np.full(capacity, -1, dtype=np.int32) for column in CATEGORICAL_COLUMNS}
+        self._dictionaries: Dict[str, Dict[Any, int]] = {column: {} for column in CATEGORICAL_COLUMNS}
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    # ----------------------------------------
+    # Writes
+    # ----------------------------------------
+
+    def _grow(self) -> None:
+        capacity = len(self._alive) * 2
+        self._alive = np.resize(self._alive, capacity)
+        self._alive[self._size:] = False
+        self._created = np.resize(self._created, capacity)
+        self._oid_hi = np.resize(self._oid_hi, capacity)
+        self._oid_lo = np.resize(self._oid_lo, capacity)
+        for column in NUMERIC_COLUMNS:
+            self._numeric[column] = np.resize(self._numeric[column], capacity)
+        for column in CATEGORICAL_COLUMNS:
+            self._codes[column] = np.resize(self._codes[column], capacity)
+
+    def _code(self, column: str, value: Any) -> int:
+        if value is None:
+            return -1
+        dictionary = self._dictionaries[column]
+        code = dictionary.get(value)
+        if code is None:
+            code = dictionary[value] = len(dictionary)
+        return code
+
+    def upsert(self, document: dict) -> None:
+        """Insert or overwrite a listing row; inactive listings are removed instead."""
+        if not document.get("is_active", True):
+            self.remove(document["_id"])
+            return
+        object_id = document["_id"]
+        position = self._positions.get(object_id)
+        if position is None:
+            if self._size == len(self._alive):
+                self._grow()
+            position = self._size
+            self._size += 1
+            self._ids.append(object_id)
+            self._positions[object_id] = position
+        self._alive[position] = True
+        self._created[position] = _timestamp(document.get("created_at"))
+        self._oid_hi[position], self._oid_lo[position] = _object_id_keys(object_id)
+        for column in NUMERIC_COLUMNS:
+            self._numeric[column][position] = _numeric(document.get(column))
+        for column in CATEGORICAL_COLUMNS:
+            self._codes[column][position] = self._code(column, document.get(column))
+
+    def remove(self, object_id: ObjectId) -> None:
+        position = self._positions.pop(object_id, None)
+        if position is not None:
+            self._alive[position] = False
+
+    def apply_change(self, action: str, document: dict) -> None:
+        """hooks subscriber for the properties collection."""
+        if self._pending_changes is not None:
+            # A rebuild is loading a fresh snapshot; replay this change on top of it
+            self._pending_changes.append((action, document))
+        if action == hooks.UPSERT:
+            self.upsert(document)
+        else:
+            self.remove(document["_id"])
+
+    async def rebuild(self, db) -> None:
+        """Reload every active listing from MongoDB, compacting removed rows."""
+        self._pending_changes = []
+        try:
+            fresh = ListingIndex.__new__(ListingIndex)
+            fresh._reset(_INITIAL_CAPACITY)
+            async for document in db.properties.find({"is_active": True}, PROJECTION):
+                fresh.upsert(document)
+            for action, document in self._pending_changes:
+                if action == hooks.UPSERT:
+                    fresh.upsert(document)
+                else:
+                    fresh.remove(document["_id"])
+            self.__dict__.update({
+                key: value for key, value in fresh.__dict__.items()
+                if key not in ("ready", "_pending_changes")
+            })
+            self.ready = True
+        finally:
+            self._pending_changes = None
+
+    # ----------------------------------------
+    # Reads
+    # ----------------------------------------
+
+    def search(
+        self,
+        equals: Optional[Dict[str, Any]] = None,
+        ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+        after: Optional[Tuple[datetime, ObjectId]] = None,
+        skip: int = 0,
+        limit: int = 100
+    ) -> List[ObjectId]:
+        """Ids of matching listings sorted by (created_at, _id) descending.
+
+        equals: column -> value (numeric or categorical columns)
+        ranges: numeric column -> (min, max), either bound may be None
+        after:  keyset cursor position; only rows strictly after it are returned
+        """
+        n = self._size
+        mask = self._alive[:n].copy()
+        for column, value in (equals or {}).items():
+            if column in self._codes:
+                code = self._dictionaries[column].get(value)
+                if code is None:
+                    return []
+                mask &= self._codes[column][:n] == code
+            else:
+                mask &= self._numeric[column][:n] == float(value)
+        for column, (low, high) in (ranges or {}).items():
+            values = self._numeric[column][:n]
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+        if after is not None:
+            created = self._created[:n]
+            after_created = _timestamp(after[0])
+            hi, lo = _object_id_keys(after[1])
+            oid_hi, oid_lo = self._oid_hi[:n], self._oid_lo[:n]
+            mask &= (created < after_created) | (
+                (created == after_created) & ((oid_hi < hi) | ((oid_hi == hi) & (oid_lo < lo)))
+            )
+
+        rows = np.flatnonzero(mask)
+        if not len(rows):
+            return []
+        # lexsort sorts ascending by the last key first; reverse for newest-first
+        order = np.lexsort((self._oid_lo[rows], self._oid_hi[rows], self._created[rows]))[::-1]
+        page = rows[order[skip:skip + limit]]
+        return [self._ids[row] for row in page]
+
+    def __contains__(self, object_id: ObjectId) -> bool:
+        return object_id in self._positions
+
+    def sort_key(self, object_id: ObjectId) -> Tuple[datetime, ObjectId]:
+        """(created_at, _id) of an indexed listing, as a keyset cursor position."""
+        created = self._created[self._positions[object_id]]
+        return datetime.fromtimestamp(created, tz=timezone.utc).replace(tzinfo=None), object_id
+
+    def search_filter(
+        self,
+        filter_dict: Dict[str, Any],
+        after: Optional[Tuple[datetime, ObjectId]] = None,
+        skip: int = 0,
+        limit: int = 100
+    ) -> Optional[List[ObjectId]]:
+        """Serve a MongoDB listing filter from the index.
+
+        Returns None when the filter uses a field or operator the index does not hold
+        (e.g. locality prefixes), in which case the caller should query MongoDB.
+        """
+        if filter_dict.get("is_active") is not True:
+            return None
+        equals = {}
+        ranges = {}
+        for field, value in filter_dict.items():
+            if field == "is_active":
+                continue
+            if field not in self._codes and field not in self._numeric:
+                return None
+            if isinstance(value, dict):
+                if field not in self._numeric or set(value) - {"$gte", "$lte"}:
+                    return None
+                ranges[field] = (value.get("$gte"), value.get("$lte"))
+            else:
+                equals[field] = value
+        return self.search(equals, ranges, after=after, skip=skip, limit=limit)
+
+
+listing_index: Optional[ListingIndex] = ListingIndex() if (LISTING_INDEX_ENABLED and np is not None) else None
+_rebuild_task: Optional[asyncio.Task] = None
+
+
+async def fetch_in_order(
+    collection,
+    ids: List[ObjectId],
+    filter_dict: Dict[str, Any],
+    projection: Optional[Dict[str, Any]] = None
+) -> List[dict]:
+    """Load documents for index hits, keeping the index order.
+    Re-applying the filter drops rows that changed on another worker since the last rebuild.
+    """
+    if not ids:
+        return []
+    documents = await collection.find({**filter_dict, "_id": {"$in": ids}}, projection).to_list(length=len(ids))
+    by_id = {document["_id"]: document for document in documents}
+    return [by_id[object_id] for object_id in ids if object_id in by_id]
+
+
+def get_listing_index() -> Optional[ListingIndex]:
+    """The index, if enabled and loaded; callers fall back to MongoDB when this is None."""
+    if listing_index is not None and listing_index.ready:
+        return listing_index
+    return None
+
+
+async def _rebuild_loop(db) -> None:
+    while True:
+        try:
+            await listing_index.rebuild(db)
+        except Exception as e:
+            print(f"Warning: listing index rebuild failed: {e}")
+        await asyncio.sleep(LISTING_INDEX_REBUILD_SECONDS)
+
+
+def start_listing_index(db) -> None:
+    global _rebuild_task
+    if LISTING_INDEX_ENABLED and np is None:
+        print("Warning: LISTING_INDEX_ENABLED is set but numpy is not installed; listing index disabled")
+    if listing_index is None:
+        return
+    hooks.subscribe("properties", listing_index.apply_change)
+    _rebuild_task = asyncio.create_task(_rebuild_loop(db))
+
+
+async def stop_listing_index() -> None:
+    if _rebuild_task is not None:
+        _rebuild_task.cancel()
@@ -0,0 +1,363 @@
+"""
+Per-worker index behind location autocomplete.
+
+Every distinct city, state and (city, locality) pair used by approved properties and
+rentals and active projects becomes an entry, counted by the listings that reference it.
+Entries are found two ways:
+
+    prefix trie - each node holds the entries of every term below it and keeps its top
+                  MAX_SUGGESTIONS by listing count up to date, so a keystroke is a walk
+                  down len(prefix) nodes plus a slice. Terms are
+                  the normalized spellings, their word-start suffixes ("nagar" finds
+                  "Vijay Nagar") and canonical city/state names ("bangalore" -> Bengaluru).
+    trigrams    - when the prefix matches too little, entries sharing 60% of the
+                  prefix's trigrams are suggested too, so "bengalru" still finds Bengaluru.
+                  Candidates come from the rarest trigrams only (any match must contain
+                  one of them), then are verified against the rest.
+
+Rows are kept fresh through the change hooks and the index is rebuilt from MongoDB every
+LOCATION_INDEX_REBUILD_SECONDS to pick up writes made by other workers.
+"""
+import asyncio
+import heapq
+import math
+import os
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app import hooks
+from app.normalization import canonical_city_id, canonical_state_id, normalize_text
+
+load_dotenv()
+
+LOCATION_INDEX_ENABLED = os.getenv("LOCATION_INDEX_ENABLED", "true").lower() == "true"
+LOCATION_INDEX_REBUILD_SECONDS = float(os.getenv("LOCATION_INDEX_REBUILD_SECONDS", "600"))
+
+MAX_SUGGESTIONS = 20
+MIN_FUZZY_LENGTH = 3
+# Nodes covering at least this many entries get their top lists computed ahead of reads
+WARM_MIN_ENTRIES = 500
+MIN_TRIGRAM_SIMILARITY = 0.6
+
+# Collection -> filter of the documents that count towards suggestions
+SOURCES = {
+    "properties": {"is_active": True, "status": "approved"},
+    "rentals": {"is_active": True, "status": "approved"},
+    "projects": {"is_active": True},
+}
+
+PROJECTION = {"city": 1, "state": 1, "locality": 1, "is_active": 1, "status": 1}
+
+# ("city", city_id) | ("state", state_id) | ("locality", locality_norm, city_id)
+EntryKey = Tuple[str, ...]
+
+
+class Entry:
+    __slots__ = ("count", "spellings")
+
+    def __init__(self):
+        self.count = 0
+        self.spellings: Counter = Counter()
+
+    @property
+    def display(self) -> str:
+        return self.spellings.most_common(1)[0][0]
+
+
+class _Node:
+    __slots__ = ("children", "entries", "top")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        # Entry -> number of its terms passing through this node
+        self.entries: Counter = Counter()
+        # Best MAX_SUGGESTIONS entries by count; None until read or after a demotion
+        self.top: Optional[List[EntryKey]] = None
+
+
+def _is_live(source: str, document: dict) -> bool:
+    if not document.get("is_active", True):
+        return False
+    return all(document.get(field) == value for field, value in SOURCES[source].items() if field != "is_active")
+
+
+def _document_entries(document: dict) -> List[Tuple[EntryKey, str]]:
+    """(entry key, spelling as typed) for each location field of a listing."""
+    entries = []
+    city_id = canonical_city_id(document.get("city"))
+    if city_id:
+        entries.append((("city", city_id), document["city"].strip()))
+    state_id = canonical_state_id(document.get("state"))
+    if state_id:
+        entries.append((("state", state_id), document["state"].strip()))
+    locality = normalize_text(document.get("locality"))
+    if locality:
+        entries.append((("locality", locality, city_id or ""), document["locality"].strip()))
+    return entries
+
+
+def _terms(key: EntryKey, spelling: str) -> List[str]:
+    """Trie terms for one spelling of an entry: the text, its word-start suffixes and,
+    for cities and states, the canonical name."""
+    text = normalize_text(spelling)
+    words = text.split(" ")
+    terms = {" ".join(words[i:]) for i in range(len(words))}
+    if key[0] != "locality":
+        terms.add(key[1].replace("-", " "))
+    return list(terms)
+
+
+def _trigrams(text: str) -> List[str]:
+    # Only left padding: a typed prefix has no known end
+    padded = "  " + text
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+class LocationIndex:
+    def __init__(self):
+        self.ready = False
+        self._pending_changes: Optional[List[Tuple[str, str, dict]]] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._entries: Dict[EntryKey, Entry] = {}
+        self._documents: Dict[Tuple[str, object], List[Tuple[EntryKey, str]]] = {}
+        self._root = _Node()
+        # Term -> entry -> number of spellings producing it
+        self._term_entries: Dict[str, Counter] = {}
+        self._trigrams: Dict[str, Counter] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ----------------------------------------
+    # Writes
+    # ----------------------------------------
+
+    def _path(self, term: str) -> List[_Node]:
+        path = [self._root]
+        for char in term:
+            node = path[-1].children.get(char)
+            if node is None:
+                node = path[-1].children[char] = _Node()
+            path.append(node)
+        return path
+
+    def _rank(self, node: _Node, key: EntryKey) -> None:
+        """Fold a change of `key`'s count (or membership) into a node's cached top list."""
+        top = node.top
+        if top is None:
+            return
+        entry = self._entries.get(key)
+        if key not in node.entries or entry is None:
+            if key in top:
+                node.top = None
+            return
+        if key in top:
+            # Entries outside the list count no more than the old tail, so only a key that
+            # is (or fell below) the tail can have been overtaken by one of them
+            if len(node.entries) > len(top) and (key == top[-1] or entry.count < self._entries[top[-1]].count):
+                # Recompute on next read
+                node.top = None
+                return
+        elif len(top) < MAX_SUGGESTIONS:
+            top.append(key)
+        elif entry.count > self._entries[top[-1]].count:
+            top[-1] = key
+        else:
+            return
+        top.sort(key=lambda other: self._entries[other].count, reverse=True)
+
+    def _link(self, term: str, key: EntryKey, delta: int) -> None:
+        """Add (delta=1) or drop (delta=-1) one reference from `term` to `key`."""
+        references = self._term_entries.setdefault(term, Counter())
+        references[key] += delta
+        if references[key] and not (delta == 1 and references[key] == 1):
+            return
+        # First reference added or last one dropped: update the trie path and trigrams
+        if not references[key]:
+            del references[key]
+            if not references:
+                del self._term_entries[term]
+        path = self._path(term)
+        for node in path[1:]:
+            node.entries[key] += delta
+            if not node.entries[key]:
+                del node.entries[key]
+            self._rank(node, key)
+        for parent, char, node in zip(path, term, path[1:]):
+            # A node's entries include everything below it, so an empty node is a dead branch
+            if not node.entries:
+                del parent.children[char]
+                break
+        for trigram in _trigrams(term):
+            postings = self._trigrams.setdefault(trigram, Counter())
+            postings[key] += delta
+            if not postings[key]:
+                del postings[key]
+                if not postings:
+                    del self._trigrams[trigram]
+
+    def _add_spelling(self, key: EntryKey, spelling: str, delta: int) -> None:
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = Entry()
+        entry.count += delta
+        entry.spellings[spelling] += delta
+        if not entry.spellings[spelling] or (delta == 1 and entry.spellings[spelling] == 1):
+            # A spelling appeared or disappeared: its terms gain or lose a reference
+            if not entry.spellings[spelling]:
+                del entry.spellings[spelling]
+            for term in _terms(key, spelling):
+                self._link(term, key, delta)
+        if not entry.count:
+            del self._entries[key]
+            return
+        if not self.ready:
+            # Still loading: nothing has been read, so no node has a cached top list yet
+            return
+        # The count moved: re-rank the entry wherever it is cached
+        for term in {term for other in entry.spellings for term in _terms(key, other)}:
+            for node in self._path(term)[1:]:
+                self._rank(node, key)
+
+    def upsert(self, source: str, document: dict) -> None:
+        """Count a listing's locations if it is live; anything else is removed."""
+        self.remove(source, document["_id"])
+        if not _is_live(source, document):
+            return
+        entries = _document_entries(document)
+        for key, spelling in entries:
+            self._add_spelling(key, spelling, 1)
+        self._documents[(source, document["_id"])] = entries
+
+    def remove(self, source: str, object_id) -> None:
+        for key, spelling in self._documents.pop((source, object_id), ()):
+            self._add_spelling(key, spelling, -1)
+
+    def _apply(self, source: str, action: str, document: dict) -> None:
+        if action == hooks.UPSERT:
+            self.upsert(source, document)
+        else:
+            self.remove(source, document["_id"])
+
+    def subscriber(self, source: str):
+        """hooks subscriber for one source collection."""
+        def apply_change(action: str, document: dict) -> None:
+            if self._pending_changes is not None:
+                # A rebuild is loading a fresh snapshot; replay this change on top of it
+                self._pending_changes.append((source, action, document))
+            self._apply(source, action, document)
+        return apply_change
+
+    async def rebuild(self, db) -> None:
+        """Reload the locations of every live listing from MongoDB."""
+        self._pending_changes = []
+        try:
+            fresh = LocationIndex()
+            for source, query in SOURCES.items():
+                async for document in db[source].find(query, PROJECTION):
+                    fresh.upsert(source, document)
+            for source, action, document in self._pending_changes:
+                fresh._apply(source, action, document)
+            fresh.warm_up()
+            self._entries, self._documents, self._root = fresh._entries, fresh._documents, fresh._root
+            self._term_entries, self._trigrams = fresh._term_entries, fresh._trigrams
+            self.ready = True
+        finally:
+            self._pending_changes = None
+
+    # ----------------------------------------
+    # Reads
+    # ----------------------------------------
+
+    def _top(self, node: _Node) -> List[EntryKey]:
+        if node.top is None:
+            node.top = heapq.nlargest(MAX_SUGGESTIONS, node.entries, key=lambda key: self._entries[key].count)
+        return node.top
+
+    def warm_up(self, min_entries: int = WARM_MIN_ENTRIES) -> None:
+        """Compute the top lists of the broad nodes, the ones too expensive to rank on a
+        keystroke. A child never covers more entries than its parent, so stop descending
+        at the first narrow node."""
+        stack = list(self._root.children.values())
+        while stack:
+            node = stack.pop()
+            if len(node.entries) >= min_entries:
+                self._top(node)
+                stack.extend(node.children.values())
+
+    def _suggestion(self, key: EntryKey) -> dict:
+        entry = self._entries[key]
+        suggestion = {"type": key[0], "value": entry.display, "count": entry.count}
+        if key[0] == "locality":
+            city = self._entries.get(("city", key[2]))
+            suggestion["city"] = city.display if city is not None else None
+        return suggestion
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[dict]:
+        """Entries starting with `prefix` (at any word) by listing count, topped up with
+        near spellings when there are fewer than `limit`."""
+        text = normalize_text(prefix) or ""
+        if not text:
+            return []
+        limit = min(limit, MAX_SUGGESTIONS)
+        node = self._root
+        for char in text:
+            node = node.children.get(char)
+            if node is None:
+                break
+        matches: List[EntryKey] = []
+        if node is not None:
+            matches = self._top(node)[:limit]
+
+        if len(matches) < limit and len(text) >= MIN_FUZZY_LENGTH:
+            postings = sorted(
+                (self._trigrams.get(trigram, {}) for trigram in set(_trigrams(text))), key=len
+            )
+            needed = math.ceil(MIN_TRIGRAM_SIMILARITY * len(postings))
+            # A key sharing `needed` trigrams must be in one of the len - needed + 1 rarest
+            candidates = set().union(*postings[:len(postings) - needed + 1])
+            candidates.difference_update(matches)
+            shared = {key: sum(key in grams for grams in postings) for key in candidates}
+            fuzzy = [key for key, hits in shared.items() if hits >= needed]
+            matches += heapq.nlargest(
+                limit - len(matches), fuzzy, key=lambda key: (shared[key], self._entries[key].count)
+            )
+        return [self._suggestion(key) for key in matches]
+
+
+location_index: Optional[LocationIndex] = LocationIndex() if LOCATION_INDEX_ENABLED else None
+_rebuild_task: Optional[asyncio.Task] = None
+
+
+def get_location_index() -> Optional[LocationIndex]:
+    """The index, if enabled and loaded."""
+    if location_index is not None and location_index.ready:
+        return location_index
+    return None
+
+
+async def _rebuild_loop(db) -> None:
+    while True:
+        try:
+            await location_index.rebuild(db)
+        except Exception as e:
+            print(f"Warning: location index rebuild failed: {e}")
+        await asyncio.sleep(LOCATION_INDEX_REBUILD_SECONDS)
+
+
+def start_location_index(db) -> None:
+    global _rebuild_task
+    if location_index is None:
+        return
+    for source in SOURCES:
+        hooks.subscribe(source, location_index.subscriber(source))
+    _rebuild_task = asyncio.create_task(_rebuild_loop(db))
+
+
+async def stop_location_index() -> None:
+    if _rebuild_task is not None:
+        _rebuild_task.cancel()
@@ -2,14 +2,31 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import (
     auth, properties, enquiries, admin, users, recommendations,
-    projects, events, investments, contact, rentals, requirements
+    projects, events, investments, contact, rentals, requirements, locations, saved_searches
 )
-from app.database import connect_to_mongo, close_mongo_connection
+from app.database import connect_to_mongo, close_mongo_connection, get_database
+from app.indexes import ensure_indexes, verify_query_plans
+from app.auth import shutdown_password_pool
+from app.pagination import NEXT_CURSOR_HEADER
+from app.listing_index import start_listing_index, stop_listing_index
+from app.cluster_index import start_cluster_index, stop_cluster_index
+from app.search_index import start_search_index, stop_search_index
+from app.location_index import start_location_index, stop_location_index
+from app.percolator import start_percolator, stop_percolator
+from app.similar_index import start_similar_index, stop_similar_index
+from app.statistics import site_statistics
+from app.view_counter import view_counter
+from app.saved_searches import alert_scheduler
+from app.response_cache import start_response_cache
+from app.facets import start_facets
+from app.routers.admin import DB_ROUND_TRIPS_HEADER
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+VERIFY_QUERY_PLANS_ON_STARTUP = os.getenv("VERIFY_QUERY_PLANS_ON_STARTUP", "false").lower() == "true"
+
 app = FastAPI(
     title="DeepRealties API",
     version="2.0.0",
@@ -29,16 +46,41 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, DB_ROUND_TRIPS_HEADER],
 )
 
 # Database lifecycle
 @app.on_event("startup")
 async def startup_event():
     await connect_to_mongo()
+    await ensure_indexes(get_database())
+    if VERIFY_QUERY_PLANS_ON_STARTUP:
+        await verify_query_plans(get_database())
+    start_listing_index(get_database())
+    start_cluster_index(get_database())
+    start_search_index(get_database())
+    start_location_index(get_database())
+    start_percolator(get_database())
+    start_similar_index(get_database())
+    start_response_cache()
+    start_facets()
+    site_statistics.start()
+    view_counter.start(get_database())
+    alert_scheduler.start(get_database())
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await stop_listing_index()
+    await stop_cluster_index()
+    await stop_search_index()
+    await stop_location_index()
+    await stop_percolator()
+    await stop_similar_index()
+    site_statistics.stop()
+    await view_counter.stop()
+    await alert_scheduler.stop()
     await close_mongo_connection()
+    shutdown_password_pool()
 
 # Include routers
 # Authentication & Users
@@ -49,6 +91,7 @@ app.include_router(users.router, prefix="/api/users", tags=["Users"])
 app.include_router(properties.router, prefix="/api/properties", tags=["Properties"])
 app.include_router(requirements.router, prefix="/api/requirements", tags=["Property Requirements"])
 app.include_router(recommendations.router, prefix="/api/recommendations", tags=["Recommendations"])
+app.include_router(saved_searches.router, prefix="/api/saved-searches", tags=["Saved Searches"])
 
 # Rentals
 app.include_router(rentals.router, prefix="/api/rentals", tags=["Rentals"])
@@ -62,6 +105,9 @@ app.include_router(events.router, prefix="/api/events", tags=["Events"])
 # Investments
 app.include_router(investments.router, prefix="/api/investments", tags=["Investments"])
 
+# Locations
+app.include_router(locations.router, prefix="/api/locations", tags=["Locations"])
+
 # Contact & Enquiries
 app.include_router(contact.router, prefix="/api/contact", tags=["Contact"])
 app.include_router(enquiries.router, prefix="/api/enquiries", tags=["Enquiries"])
@@ -87,35 +133,4 @@ async def root():
 @app.get("/api/statistics")
 async def get_site_statistics():
     """Get overall site statistics"""
-    from app.database import get_database
-    
-    db = get_database()
-    
-    total_properties = await db.properties.count_documents({"is_active": True})
-    approved_properties = await db.properties.count_documents({
-        "is_active": True,
-        "status": "approved"
-    })
-    total_users = await db.users.count_documents({"is_active": True})
-    total_investors = await db.investor_registrations.count_documents({})
-    total_projects = await db.projects.count_documents({"is_active": True})
-    total_rentals = await db.rentals.count_documents({
-        "is_active": True,
-        "status": "approved"
-    })
-    
-    # Get unique cities
-    cities = await db.properties.distinct("city", {"is_active": True})
-    
-    return {
-        "total_properties": total_properties,
-        "approved_properties": approved_properties,
-        "total_users": total_users,
-        "total_investors": total_investors,
-        "total_projects": total_projects,
-        "total_rentals": total_rentals,
-        "cities_covered": len(cities),
-        "years_experience": 5,
-        "properties_sold": 250,  # Can be updated with actual tracking
-        "happy_customers": total_users
-    }
+    return await site_statistics.get()
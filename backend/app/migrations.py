@@ -0,0 +1,98 @@
+"""
+One-off data migrations.
+
+Run from the backend directory:
+    python -m app.migrations                            # list available migrations
+    python -m app.migrations backfill_location_fields   # run one
+    python -m app.migrations backfill_geo_locations
+"""
+import argparse
+import asyncio
+import sys
+
+from pymongo import UpdateOne
+
+from app.geo import geo_point
+from app.normalization import SHADOW_FIELDS, normalized_fields
+
+BATCH_SIZE = 1000
+
+# Collections carrying free-text location fields
+LOCATION_COLLECTIONS = [
+    "properties", "rentals", "projects", "events", "investments", "property_requirements"
+]
+
+# Collections carrying latitude/longitude (projects use `location` for the address text)
+GEO_COLLECTIONS = ["properties", "rentals"]
+
+
+async def _bulk_set(collection, operations) -> int:
+    if not operations:
+        return 0
+    result = await collection.bulk_write(operations, ordered=False)
+    return result.modified_count
+
+
+async def backfill_location_fields(db) -> None:
+    """Populate city_id/state_id/locality_norm/facing_norm on documents written before they existed."""
+    source_fields = {field: 1 for field in SHADOW_FIELDS}
+    for collection_name in LOCATION_COLLECTIONS:
+        collection = db[collection_name]
+        modified = 0
+        operations = []
+        async for doc in collection.find({}, source_fields):
+            fields = normalized_fields(doc)
+            if fields:
+                operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": fields}))
+            if len(operations) >= BATCH_SIZE:
+                modified += await _bulk_set(collection, operations)
+                operations = []
+        modified += await _bulk_set(collection, operations)
+        print(f"{collection_name}: {modified} documents updated")
+
+
+async def backfill_geo_locations(db) -> None:
+    """Populate the GeoJSON `location` point from latitude/longitude for the 2dsphere index."""
+    for collection_name in GEO_COLLECTIONS:
+        collection = db[collection_name]
+        modified = 0
+        operations = []
+        query = {"latitude": {"$ne": None}, "longitude": {"$ne": None}}
+        async for doc in collection.find(query, {"latitude": 1, "longitude": 1}):
+            operations.append(UpdateOne(
+                {"_id": doc["_id"]},
+                {"$set": {"location": geo_point(doc["latitude"], doc["longitude"])}}
+            ))
+            if len(operations) >= BATCH_SIZE:
+                modified += await _bulk_set(collection, operations)
+                operations = []
+        modified += await _bulk_set(collection, operations)
+        print(f"{collection_name}: {modified} documents updated")
+
+
+MIGRATIONS = {
+    "backfill_location_fields": backfill_location_fields,
+    "backfill_geo_locations": backfill_geo_locations,
+}
+
+
+async def _main(name: str) -> int:
+    from app.database import connect_to_mongo, close_mongo_connection, get_database
+
+    await connect_to_mongo()
+    try:
+        await MIGRATIONS[name](get_database())
+        return 0
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a data migration")
+    parser.add_argument("name", nargs="?", choices=sorted(MIGRATIONS), help="migration to run")
+    args = parser.parse_args()
+    if not args.name:
+        for migration_name, migration in MIGRATIONS.items():
+            print(f"{migration_name}: {migration.__doc__}")
+        sys.exit(0)
+    sys.exit(asyncio.run(_main(args.name)))
@@ -149,6 +149,9 @@ class Property(PropertyBase):
     class Config:
         from_attributes = True
 
+class PropertyViewBatch(BaseModel):
+    property_ids: List[str] = Field(..., max_length=100, description="Listings viewed since the last beacon")
+
 # ========================================
 # RENTAL PROPERTY MODELS
 # ========================================
@@ -462,6 +465,7 @@ class PropertyRecommendationForm(BaseModel):
     bathrooms: Optional[int] = None
     parking: Optional[bool] = None
     facing: Optional[str] = None
+    amenities: Optional[List[str]] = None
     description: Optional[str] = None
 
 class PropertyRecommendation(BaseModel):
@@ -469,7 +473,29 @@ class PropertyRecommendation(BaseModel):
     buyer_id: str
     form_data: PropertyRecommendationForm
     created_at: datetime
+    # Best match first; scores[i] is the 0-1 match score of matched_properties[i]
     matched_properties: List[str] = []
+    scores: List[float] = []
+    # Listings updated after this are re-scored on the next read
+    last_evaluated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+# ========================================
+# SAVED SEARCH MODELS
+# ========================================
+
+class SavedSearchCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+
+class SavedSearch(BaseModel):
+    id: str
+    user_id: str
+    name: str
+    # Normalized MongoDB filter, as built by GET /api/properties/
+    filter: dict
+    created_at: datetime
 
     class Config:
         from_attributes = True
@@ -516,3 +542,10 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+
+class Principal(BaseModel):
+    """The authenticated user behind a request, as resolved from the JWT subject."""
+    id: str
+    email: str
+    role: str
+    is_active: bool = True
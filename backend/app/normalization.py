@@ -0,0 +1,124 @@
+"""
+Write-time normalization of free-text location fields.
+
+Listings keep the values users typed (`city`, `state`, `locality`, `facing`) and also
+store index-friendly shadow fields next to them:
+
+    city_id, state_id  - canonical ids ("Bangalore " -> "bengaluru", "M.P." -> "madhya-pradesh")
+    locality_norm      - lower-cased, whitespace-collapsed text for prefix matching
+    facing_norm        - same, for the facing direction
+    location           - GeoJSON point built from latitude/longitude (see app.geo)
+
+Filters run equality (ids) or anchored prefix regexes (norms) on the shadow fields,
+which compound indexes can serve.
+"""
+import re
+import unicodedata
+from typing import Any, Dict, Optional
+
+from app.geo import geo_point
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Historical/alternate city names mapped to the canonical name
+CITY_ALIASES = {
+    "bangalore": "bengaluru",
+    "bombay": "mumbai",
+    "calcutta": "kolkata",
+    "madras": "chennai",
+    "poona": "pune",
+    "gurgaon": "gurugram",
+    "mysore": "mysuru",
+    "baroda": "vadodara",
+    "cochin": "kochi",
+    "trivandrum": "thiruvananthapuram",
+    "allahabad": "prayagraj",
+    "benares": "varanasi",
+    "banaras": "varanasi",
+    "pondicherry": "puducherry",
+}
+
+# Common state abbreviations mapped to the canonical name
+STATE_ALIASES = {
+    "mp": "madhya pradesh",
+    "up": "uttar pradesh",
+    "ap": "andhra pradesh",
+    "hp": "himachal pradesh",
+    "mh": "maharashtra",
+    "rj": "rajasthan",
+    "gj": "gujarat",
+    "ka": "karnataka",
+    "tn": "tamil nadu",
+    "wb": "west bengal",
+    "dl": "delhi",
+    "cg": "chhattisgarh",
+    "uk": "uttarakhand",
+    "jk": "jammu and kashmir",
+    "j&k": "jammu and kashmir",
+    "orissa": "odisha",
+    "pondicherry": "puducherry",
+}
+
+# Source field -> shadow field
+SHADOW_FIELDS = {
+    "city": "city_id",
+    "state": "state_id",
+    "locality": "locality_norm",
+    "facing": "facing_norm",
+}
+
+
+def normalize_text(value: Optional[str]) -> Optional[str]:
+    """Case-fold and collapse whitespace: "  Vijay   Nagar " -> "vijay nagar"."""
+    if value is None:
+        return None
+    value = unicodedata.normalize("NFKC", str(value)).casefold()
+    return _WHITESPACE_RE.sub(" ", value).strip()
+
+
+def _to_id(value: str) -> str:
+    # Drop punctuation and symbols but keep letters and combining marks (Devanagari matras etc.)
+    value = "".join(
+        ch for ch in value
+        if ch == "-" or not unicodedata.category(ch).startswith(("P", "S"))
+    )
+    return _WHITESPACE_RE.sub("-", value.strip())
+
+
+def canonical_city_id(value: Optional[str]) -> Optional[str]:
+    text = normalize_text(value)
+    if not text:
+        return None
+    return _to_id(CITY_ALIASES.get(text, text))
+
+
+def canonical_state_id(value: Optional[str]) -> Optional[str]:
+    text = normalize_text(value)
+    if not text:
+        return None
+    compact = text.replace(".", "").replace(" ", "")
+    return _to_id(STATE_ALIASES.get(text) or STATE_ALIASES.get(compact) or text)
+
+
+def normalized_fields(data: Dict[str, Any], point: bool = True) -> Dict[str, Any]:
+    """Shadow fields for whichever location fields are present in `data` (a document or an update).
+    point=False skips the GeoJSON `location` point, for collections where `location` is free text."""
+    fields = {}
+    if "city" in data:
+        fields["city_id"] = canonical_city_id(data["city"])
+    if "state" in data:
+        fields["state_id"] = canonical_state_id(data["state"])
+    if "locality" in data:
+        fields["locality_norm"] = normalize_text(data["locality"])
+    if "facing" in data:
+        fields["facing_norm"] = normalize_text(data["facing"])
+    # A partial update that changes only one coordinate has to rebuild the point from the
+    # stored document instead (geo_point_expression)
+    if point and "latitude" in data and "longitude" in data:
+        fields["location"] = geo_point(data["latitude"], data["longitude"])
+    return fields
+
+
+def prefix_filter(value: str) -> Dict[str, str]:
+    """Anchored, escaped, case-sensitive regex on a *_norm field - servable by an index range scan."""
+    return {"$regex": "^" + re.escape(normalize_text(value) or "")}
@@ -0,0 +1,71 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor is an opaque, URL-safe token encoding the sort value and _id of the last row
+of a page. The next page is fetched with a range condition on (sort field, _id) instead
+of skip(), so deep pages cost the same as the first one.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def keyset_sort(sort_field: str, direction: int) -> List[Tuple[str, int]]:
+    """Sort specification with _id as the tie-breaker, matching the compound indexes."""
+    return [(sort_field, direction), ("_id", direction)]
+
+
+def encode_cursor(sort_value: Any, object_id: ObjectId) -> str:
+    if isinstance(sort_value, datetime):
+        value = {"dt": sort_value.isoformat()}
+    else:
+        value = {"v": sort_value}
+    payload = json.dumps([value, str(object_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, ObjectId]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, object_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        sort_value = datetime.fromisoformat(value["dt"]) if "dt" in value else value["v"]
+        return sort_value, ObjectId(object_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_filter(filter_dict: Dict[str, Any], sort: List[Tuple[str, int]], cursor: str) -> Dict[str, Any]:
+    """Restrict filter_dict to rows strictly after the cursor in the given sort order."""
+    sort_field, direction = sort[0]
+    sort_value, object_id = decode_cursor(cursor)
+    inclusive, exclusive = ("$lte", "$lt") if direction < 0 else ("$gte", "$gt")
+    # The top-level bound gives the index a tight range; the $or breaks ties on _id
+    after_cursor = {
+        sort_field: {inclusive: sort_value},
+        "$or": [
+            {sort_field: {exclusive: sort_value}},
+            {"_id": {exclusive: object_id}},
+        ],
+    }
+    return {"$and": [filter_dict, after_cursor]}
+
+
+def set_next_cursor(
+    response: Response,
+    documents: List[dict],
+    sort: List[Tuple[str, int]],
+    limit: int
+) -> Optional[str]:
+    """Expose the cursor for the page after `documents` in the X-Next-Cursor header (full pages only)."""
+    if len(documents) < limit or not documents:
+        return None
+    last = documents[-1]
+    next_cursor = encode_cursor(last.get(sort[0][0]), last["_id"])
+    response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return next_cursor
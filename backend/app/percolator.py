@@ -0,0 +1,317 @@
+"""
+Reverse matching of newly approved listings against stored buyer searches.
+
+Open property requirements are "stored queries". Rather than re-running every one of
+them when a listing is approved, the percolator indexes the queries themselves:
+
+    bucket        - (property_type, city_id), with None standing for "any"; a listing
+                    only looks at the four buckets its own type and city can fall into
+    interval tree - per bucket, one on the price/budget range and one on the area range,
+                    so only queries whose ranges contain the listing's price and area
+                    are visited
+
+Saved recommendation forms are not percolated: their rankings are refreshed from the
+listings changed since they were last read (app.scoring.refresh_ranking).
+
+Matches are appended to each query's `matched_properties` with one update per source
+collection. Queries are kept fresh through the change hooks and reloaded every
+PERCOLATOR_REBUILD_SECONDS to pick up ones stored by other workers.
+"""
+import asyncio
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from dotenv import load_dotenv
+
+from app import hooks
+from app.normalization import canonical_city_id
+
+load_dotenv()
+
+PERCOLATOR_ENABLED = os.getenv("PERCOLATOR_ENABLED", "true").lower() == "true"
+PERCOLATOR_REBUILD_SECONDS = float(os.getenv("PERCOLATOR_REBUILD_SECONDS", "60"))
+PERCOLATOR_WAIT_SECONDS = float(os.getenv("PERCOLATOR_WAIT_SECONDS", "10"))
+
+INFINITY = float("inf")
+UNBOUNDED = (-INFINITY, INFINITY)
+
+# Source collection -> (filter of open queries, projection)
+SOURCES = {
+    "property_requirements": (
+        {"is_fulfilled": False},
+        {"property_type": 1, "city": 1, "min_budget": 1, "max_budget": 1, "min_area_sqft": 1, "max_area_sqft": 1},
+    ),
+}
+
+Interval = Tuple[float, float]
+BucketKey = Tuple[Optional[str], Optional[str]]
+
+
+class IntervalTree:
+    """Static centered interval tree over closed intervals; stab(x) returns the keys of
+    every interval containing x in O(log n + matches)."""
+    __slots__ = ("center", "by_low", "by_high", "left", "right")
+
+    def __init__(self, intervals: List[Tuple[float, float, ObjectId]]):
+        # An empty range (low > high) contains nothing, and would never leave the left side
+        intervals = [interval for interval in intervals if interval[0] <= interval[1]]
+        endpoints = sorted(value for low, high, _ in intervals for value in (low, high))
+        self.center = endpoints[len(endpoints) // 2] if endpoints else 0.0
+        left, right, overlapping = [], [], []
+        for interval in intervals:
+            if interval[1] < self.center:
+                left.append(interval)
+            elif interval[0] > self.center:
+                right.append(interval)
+            else:
+                overlapping.append(interval)
+        self.by_low = sorted(overlapping, key=lambda interval: interval[0])
+        self.by_high = sorted(overlapping, key=lambda interval: interval[1], reverse=True)
+        self.left = IntervalTree(left) if left else None
+        self.right = IntervalTree(right) if right else None
+
+    def stab(self, x: float) -> List[ObjectId]:
+        result = []
+        node = self
+        while node is not None:
+            if x < node.center:
+                for low, _, key in node.by_low:
+                    if low > x:
+                        break
+                    result.append(key)
+                node = node.left
+            elif x > node.center:
+                for _, high, key in node.by_high:
+                    if high < x:
+                        break
+                    result.append(key)
+                node = node.right
+            else:
+                result.extend(key for _, _, key in node.by_low)
+                break
+        return result
+
+
+class StoredQuery:
+    __slots__ = ("price", "area")
+
+    def __init__(self, price: Interval, area: Interval):
+        self.price = price
+        self.area = area
+
+
+class _Bucket:
+    def __init__(self):
+        self.queries: Dict[ObjectId, StoredQuery] = {}
+        # Built on first match after a change
+        self._price_tree: Optional[IntervalTree] = None
+        self._area_tree: Optional[IntervalTree] = None
+
+    def add(self, object_id: ObjectId, query: StoredQuery) -> None:
+        self.queries[object_id] = query
+        self._price_tree = self._area_tree = None
+
+    def discard(self, object_id: ObjectId) -> None:
+        del self.queries[object_id]
+        self._price_tree = self._area_tree = None
+
+    def candidates(self, price: Optional[float], area: Optional[float]) -> List[ObjectId]:
+        if self._price_tree is None:
+            self._price_tree = IntervalTree([(*query.price, key) for key, query in self.queries.items()])
+            bounded = [(*query.area, key) for key, query in self.queries.items() if query.area != UNBOUNDED]
+            self._area_tree = IntervalTree(bounded) if bounded else None
+        # As in MongoDB, a missing value only passes queries that leave its range open
+        if price is None:
+            hits = [key for key, query in self.queries.items() if query.price == UNBOUNDED]
+        else:
+            hits = self._price_tree.stab(price)
+        if self._area_tree is None:
+            return hits
+        inside = set(self._area_tree.stab(area)) if area is not None else set()
+        return [key for key in hits if key in inside or self.queries[key].area == UNBOUNDED]
+
+
+def requirement_filter(document: dict) -> Dict[str, Any]:
+    """MongoDB filter for the listings a property requirement matches: approved and
+    active, same type and city, price within the budget and area within the range when
+    one was given. _requirement_query indexes the same criteria for percolation."""
+    property_type = document.get("property_type")
+    # Documents straight from a write still hold the enum rather than its stored value
+    property_type = getattr(property_type, "value", property_type)
+    city_id = canonical_city_id(document.get("city"))
+    query: Dict[str, Any] = {"is_active": True, "status": "approved"}
+    if property_type:
+        query["property_type"] = property_type
+    if city_id:
+        query["city_id"] = city_id
+    query["price"] = {"$gte": document["min_budget"], "$lte": document["max_budget"]}
+    if document.get("min_area_sqft") is not None:
+        query.setdefault("area_sqft", {})["$gte"] = document["min_area_sqft"]
+    if document.get("max_area_sqft") is not None:
+        query.setdefault("area_sqft", {})["$lte"] = document["max_area_sqft"]
+    return query
+
+
+def _requirement_query(document: dict) -> Optional[Tuple[BucketKey, StoredQuery]]:
+    """requirement_filter as a stored query (percolate only sees approved, active listings)."""
+    if document.get("is_fulfilled"):
+        return None
+    query = requirement_filter(document)
+    key = (query.get("property_type"), query.get("city_id"))
+    area = query.get("area_sqft", {})
+    return key, StoredQuery(
+        (query["price"]["$gte"], query["price"]["$lte"]),
+        (area.get("$gte", -INFINITY), area.get("$lte", INFINITY)),
+    )
+
+
+COMPILERS = {
+    "property_requirements": _requirement_query,
+}
+
+
+class Percolator:
+    def __init__(self):
+        self.ready = False
+        self._pending_changes: Optional[List[Tuple[str, str, dict]]] = None
+        self._loaded: Optional[asyncio.Event] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._buckets: Dict[Tuple[str, BucketKey], _Bucket] = {}
+        self._keys: Dict[Tuple[str, ObjectId], BucketKey] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    # ----------------------------------------
+    # Writes
+    # ----------------------------------------
+
+    def upsert(self, source: str, document: dict) -> None:
+        """Store an open query; a closed (fulfilled) one is removed."""
+        self.remove(source, document["_id"])
+        compiled = COMPILERS[source](document)
+        if compiled is None:
+            return
+        key, query = compiled
+        bucket = self._buckets.get((source, key))
+        if bucket is None:
+            bucket = self._buckets[(source, key)] = _Bucket()
+        bucket.add(document["_id"], query)
+        self._keys[(source, document["_id"])] = key
+
+    def remove(self, source: str, object_id: ObjectId) -> None:
+        key = self._keys.pop((source, object_id), None)
+        if key is None:
+            return
+        bucket = self._buckets[(source, key)]
+        bucket.discard(object_id)
+        if not bucket.queries:
+            del self._buckets[(source, key)]
+
+    def _apply(self, source: str, action: str, document: dict) -> None:
+        if action == hooks.UPSERT:
+            self.upsert(source, document)
+        else:
+            self.remove(source, document["_id"])
+
+    def subscriber(self, source: str):
+        """hooks subscriber for one source collection."""
+        def apply_change(action: str, document: dict) -> None:
+            if self._pending_changes is not None:
+                # A rebuild is loading a fresh snapshot; replay this change on top of it
+                self._pending_changes.append((source, action, document))
+            self._apply(source, action, document)
+        return apply_change
+
+    async def rebuild(self, db) -> None:
+        """Reload every open stored query from MongoDB."""
+        self._pending_changes = []
+        try:
+            fresh = Percolator()
+            for source, (query, projection) in SOURCES.items():
+                async for document in db[source].find(query, projection):
+                    try:
+                        fresh.upsert(source, document)
+                    except Exception as e:
+                        print(f"Warning: skipping unreadable {source} {document['_id']}: {e}")
+            for source, action, document in self._pending_changes:
+                fresh._apply(source, action, document)
+            self._buckets, self._keys = fresh._buckets, fresh._keys
+            self.ready = True
+            self.loaded().set()
+        finally:
+            self._pending_changes = None
+
+    def loaded(self) -> asyncio.Event:
+        if self._loaded is None:
+            self._loaded = asyncio.Event()
+        return self._loaded
+
+    # ----------------------------------------
+    # Reads
+    # ----------------------------------------
+
+    def match(self, listing: dict) -> Dict[str, List[ObjectId]]:
+        """Ids of the stored queries the listing satisfies, per source collection."""
+        price, area = listing.get("price"), listing.get("area_sqft")
+        property_type, city_id = listing.get("property_type"), listing.get("city_id")
+        matches: Dict[str, List[ObjectId]] = {}
+        for source in SOURCES:
+            for key in {(property_type, city_id), (property_type, None), (None, city_id), (None, None)}:
+                bucket = self._buckets.get((source, key))
+                if bucket is None:
+                    continue
+                hits = bucket.candidates(price, area)
+                if hits:
+                    matches.setdefault(source, []).extend(hits)
+        return matches
+
+
+percolator: Optional[Percolator] = Percolator() if PERCOLATOR_ENABLED else None
+_rebuild_task: Optional[asyncio.Task] = None
+
+
+async def percolate(db, listing: dict) -> int:
+    """Append a newly approved listing to the matched_properties of every stored query it
+    satisfies. Returns the number of queries matched."""
+    if percolator is None:
+        return 0
+    if not percolator.ready:
+        try:
+            await asyncio.wait_for(percolator.loaded().wait(), PERCOLATOR_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            print(f"Warning: percolator not loaded; listing {listing['_id']} was not matched to stored searches")
+            return 0
+    matches = percolator.match(listing)
+    for source, object_ids in matches.items():
+        await db[source].update_many(
+            {"_id": {"$in": object_ids}},
+            {"$addToSet": {"matched_properties": str(listing["_id"])}}
+        )
+    return sum(len(object_ids) for object_ids in matches.values())
+
+
+async def _rebuild_loop(db) -> None:
+    while True:
+        try:
+            await percolator.rebuild(db)
+        except Exception as e:
+            print(f"Warning: percolator rebuild failed: {e}")
+        await asyncio.sleep(PERCOLATOR_REBUILD_SECONDS)
+
+
+def start_percolator(db) -> None:
+    global _rebuild_task
+    if percolator is None:
+        return
+    for source in SOURCES:
+        hooks.subscribe(source, percolator.subscriber(source))
+    _rebuild_task = asyncio.create_task(_rebuild_loop(db))
+
+
+async def stop_percolator() -> None:
+    if _rebuild_task is not None:
+        _rebuild_task.cancel()
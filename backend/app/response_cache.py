@@ -0,0 +1,189 @@
+"""
+Response cache for public catalogue reads.
+
+Handlers look a request up before touching MongoDB and store the encoded response
+afterwards:
+
+    cache_key = await response_cache.key(request, ("properties",))
+    cached = await response_cache.lookup(cache_key)
+    if cached is not None:
+        return cached
+    ...
+    return await response_cache.store(cache_key, documents_response(...))
+
+Keys are the route path plus the normalized query string. Each entry is also keyed by
+the current generation of its tags (one tag per collection); a change notification for a
+collection (see app.hooks) bumps that tag's generation, so every entry built from the old
+data is skipped and ages out of the backend.
+
+Backends:
+    memory - per-worker LRU (default); other workers' writes are picked up after the TTL
+    redis  - shared across workers via RESPONSE_CACHE_REDIS_URL (requires the `redis` package)
+    none   - caching disabled
+"""
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+from fastapi import Request, Response
+
+from app import hooks
+from app.cache import TTLCache
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # only needed for the shared backend
+    aioredis = None
+
+load_dotenv()
+
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+# Collections whose changes invalidate cached responses tagged with their name
+CACHED_COLLECTIONS = ("properties", "rentals", "projects", "events", "investments", "investor_registrations")
+
+# Response headers worth replaying on a hit
+_STORED_HEADERS = ("content-type", "x-next-cursor")
+
+
+class MemoryBackend:
+    name = "memory"
+
+    def __init__(self, maxsize: int):
+        self._entries = TTLCache(maxsize=maxsize)
+        self._generations: Dict[str, int] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._entries.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._entries.set(key, value, ttl=ttl)
+
+    async def generations(self, tags: Sequence[str]) -> List[int]:
+        return [self._generations.get(tag, 0) for tag in tags]
+
+    async def bump(self, tag: str) -> None:
+        self._generations[tag] = self._generations.get(tag, 0) + 1
+
+
+class RedisBackend:
+    name = "redis"
+
+    def __init__(self, url: str):
+        self._redis = aioredis.from_url(url)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._redis.get(f"response:{key}")
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self._redis.set(f"response:{key}", value, px=int(ttl * 1000))
+
+    async def generations(self, tags: Sequence[str]) -> List[int]:
+        values = await self._redis.mget([f"response-tag:{tag}" for tag in tags])
+        return [int(value or 0) for value in values]
+
+    async def bump(self, tag: str) -> None:
+        await self._redis.incr(f"response-tag:{tag}")
+
+
+class ResponseCache:
+    def __init__(self, backend, ttl: float = RESPONSE_CACHE_TTL_SECONDS):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None and self.ttl > 0
+
+    async def key(self, request: Request, tags: Sequence[str]) -> Optional[str]:
+        """Cache key for a request, or None when caching is disabled or the backend is
+        unreachable (the request then bypasses the cache)."""
+        if not self.enabled:
+            return None
+        params = sorted(
+            (name, value.strip()) for name, value in request.query_params.multi_items()
+            if value.strip()
+        )
+        try:
+            generations = await self.backend.generations(tags)
+        except Exception as e:
+            print(f"Warning: response cache generations lookup failed: {e}")
+            return None
+        tag_part = ",".join(f"{tag}:{generation}" for tag, generation in zip(tags, generations))
+        query = "&".join(f"{name}={value}" for name, value in params)
+        return f"{request.url.path}?{query}#{tag_part}"
+
+    async def lookup(self, key: Optional[str]) -> Optional[Response]:
+        if key is None:
+            return None
+        try:
+            entry = await self.backend.get(key)
+        except Exception as e:
+            print(f"Warning: response cache lookup failed: {e}")
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        headers, body = _decode(entry)
+        self.hits += 1
+        self.bytes_saved += len(body)
+        return Response(content=body, headers=headers)
+
+    async def store(self, key: Optional[str], response: Response) -> Response:
+        if key is not None and response.status_code == 200:
+            headers = [(name, value) for name, value in response.headers.items() if name in _STORED_HEADERS]
+            try:
+                await self.backend.set(key, _encode(headers, response.body), self.ttl)
+            except Exception as e:
+                print(f"Warning: response cache store failed: {e}")
+        return response
+
+    async def invalidate(self, tag: str) -> None:
+        if self.backend is not None:
+            await self.backend.bump(tag)
+
+    def metrics(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name if self.backend is not None else "none",
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+        }
+
+
+def _encode(headers: Iterable[Tuple[str, str]], body: bytes) -> bytes:
+    return json.dumps(dict(headers)).encode() + b"\n" + body
+
+
+def _decode(entry: bytes) -> Tuple[Dict[str, str], bytes]:
+    header_line, body = entry.split(b"\n", 1)
+    return json.loads(header_line), body
+
+
+def _make_backend():
+    if RESPONSE_CACHE_BACKEND == "none":
+        return None
+    if RESPONSE_CACHE_BACKEND == "redis":
+        if aioredis is None:
+            print("Warning: RESPONSE_CACHE_BACKEND=redis but the redis package is not installed; using memory")
+        else:
+            return RedisBackend(RESPONSE_CACHE_REDIS_URL)
+    return MemoryBackend(RESPONSE_CACHE_MAX_ENTRIES)
+
+
+response_cache = ResponseCache(_make_backend())
+
+
+def start_response_cache() -> None:
+    """Invalidate cached responses whenever a cached collection changes."""
+    for collection in CACHED_COLLECTIONS:
+        hooks.subscribe(collection, lambda action, document, tag=collection: response_cache.invalidate(tag))
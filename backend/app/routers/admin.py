@@ -1,81 +1,131 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Response
 from typing import List, Dict, Any
-from app.models import User, Property, Enquiry, TokenData
-from app.auth import get_current_user
+from app.models import User, Property, Enquiry, Principal
+from app.auth import get_current_principal, invalidate_principal
+from app.cache import TTLCache
+from app.response_cache import response_cache
 from app.database import get_database
 from datetime import datetime, timedelta
+from dotenv import load_dotenv
+import asyncio
+import os
+
+load_dotenv()
+
+ADMIN_DASHBOARD_CACHE_SECONDS = float(os.getenv("ADMIN_DASHBOARD_CACHE_SECONDS", "0"))
+DB_ROUND_TRIPS_HEADER = "X-DB-Round-Trips"
+
+# Only the fields the admin dashboard renders
+RECENT_PROPERTY_PROJECTION = {
+    "title": 1, "city": 1, "state": 1, "locality": 1, "price": 1,
+    "property_type": 1, "status": 1, "created_at": 1
+}
+RECENT_ENQUIRY_PROJECTION = {
+    "property_id": 1, "buyer_id": 1, "seller_id": 1, "message": 1, "is_read": 1, "created_at": 1
+}
+
+_dashboard_cache = TTLCache(maxsize=1, ttl=ADMIN_DASHBOARD_CACHE_SECONDS)
 
 router = APIRouter()
 
-async def check_admin(current_user: TokenData = Depends(get_current_user)):
-    db = get_database()
-    user = await db.users.find_one({"email": current_user.email})
-    if not user or user.get("role") != "admin":
+async def check_admin(current_user: Principal = Depends(get_current_principal)):
+    if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required"
         )
-    return user
+    return current_user
 
-@router.get("/dashboard", response_model=Dict[str, Any])
-async def get_dashboard(admin_user: dict = Depends(check_admin)):
-    db = get_database()
-    
-    # Count users
-    total_users = await db.users.count_documents({})
-    buyers = await db.users.count_documents({"role": "buyer"})
-    sellers = await db.users.count_documents({"role": "seller"})
-    
-    # Count properties
-    total_properties = await db.properties.count_documents({"is_active": True})
-    
-    # Count enquiries
-    total_enquiries = await db.enquiries.count_documents({})
-    unread_enquiries = await db.enquiries.count_documents({"is_read": False})
-    
-    # Most active city
+def _count(facet_rows: list) -> int:
+    return facet_rows[0]["n"] if facet_rows else 0
+
+def _with_id(document: dict) -> dict:
+    document["id"] = str(document.pop("_id"))
+    return document
+
+async def _user_stats(db) -> dict:
+    pipeline = [{"$facet": {
+        "total": [{"$count": "n"}],
+        "by_role": [{"$group": {"_id": "$role", "count": {"$sum": 1}}}],
+    }}]
+    facets = (await db.users.aggregate(pipeline).to_list(length=1))[0]
+    by_role = {row["_id"]: row["count"] for row in facets["by_role"]}
+    return {
+        "total_users": _count(facets["total"]),
+        "buyers": by_role.get("buyer", 0),
+        "sellers": by_role.get("seller", 0),
+    }
+
+async def _property_stats(db) -> dict:
     pipeline = [
         {"$match": {"is_active": True}},
-        {"$group": {"_id": "$city", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}},
-        {"$limit": 5}
+        {"$facet": {
+            "total": [{"$count": "n"}],
+            "top_cities": [
+                {"$group": {"_id": "$city", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1}},
+                {"$limit": 5}
+            ],
+            "recent": [
+                {"$sort": {"created_at": -1}},
+                {"$limit": 5},
+                {"$project": RECENT_PROPERTY_PROJECTION}
+            ],
+        }},
     ]
-    top_cities = await db.properties.aggregate(pipeline).to_list(length=5)
-    
-    # Recent activities
-    recent_properties = await db.properties.find({"is_active": True}).sort("created_at", -1).limit(5).to_list(length=5)
-    recent_enquiries = await db.enquiries.find().sort("created_at", -1).limit(5).to_list(length=5)
+    return (await db.properties.aggregate(pipeline).to_list(length=1))[0]
+
+async def _enquiry_stats(db) -> dict:
+    pipeline = [{"$facet": {
+        "total": [{"$count": "n"}],
+        "unread": [{"$match": {"is_read": False}}, {"$count": "n"}],
+        "recent": [
+            {"$sort": {"created_at": -1}},
+            {"$limit": 5},
+            {"$project": RECENT_ENQUIRY_PROJECTION}
+        ],
+    }}]
+    return (await db.enquiries.aggregate(pipeline).to_list(length=1))[0]
+
+@router.get("/dashboard", response_model=Dict[str, Any])
+async def get_dashboard(response: Response, admin_user: Principal = Depends(check_admin)):
+    dashboard = _dashboard_cache.get("dashboard")
+    if dashboard is not None:
+        response.headers[DB_ROUND_TRIPS_HEADER] = "0"
+        return dashboard
     
-    # Format recent properties
-    formatted_properties = []
-    for prop in recent_properties:
-        prop["id"] = str(prop["_id"])
-        del prop["_id"]
-        formatted_properties.append(Property(**prop))
+    db = get_database()
     
-    # Format recent enquiries
-    formatted_enquiries = []
-    for enquiry in recent_enquiries:
-        enquiry["id"] = str(enquiry["_id"])
-        del enquiry["_id"]
-        formatted_enquiries.append(Enquiry(**enquiry))
+    # One $facet pipeline per collection, all in flight at once
+    user_stats, property_stats, enquiry_stats = await asyncio.gather(
+        _user_stats(db), _property_stats(db), _enquiry_stats(db)
+    )
+    response.headers[DB_ROUND_TRIPS_HEADER] = "3"
     
-    return {
+    dashboard = {
         "stats": {
-            "total_users": total_users,
-            "buyers": buyers,
-            "sellers": sellers,
-            "total_properties": total_properties,
-            "total_enquiries": total_enquiries,
-            "unread_enquiries": unread_enquiries
+            **user_stats,
+            "total_properties": _count(property_stats["total"]),
+            "total_enquiries": _count(enquiry_stats["total"]),
+            "unread_enquiries": _count(enquiry_stats["unread"])
         },
-        "top_cities": [{"city": city["_id"], "count": city["count"]} for city in top_cities],
-        "recent_properties": [prop.dict() for prop in formatted_properties],
-        "recent_enquiries": [enq.dict() for enq in formatted_enquiries]
+        "top_cities": [{"city": city["_id"], "count": city["count"]} for city in property_stats["top_cities"]],
+        "recent_properties": [_with_id(prop) for prop in property_stats["recent"]],
+        "recent_enquiries": [_with_id(enquiry) for enquiry in enquiry_stats["recent"]]
+    }
+    _dashboard_cache.set("dashboard", dashboard)
+    
+    return dashboard
+
+@router.get("/metrics", response_model=Dict[str, Any])
+async def get_metrics(admin_user: Principal = Depends(check_admin)):
+    """Per-worker cache metrics"""
+    return {
+        "response_cache": response_cache.metrics()
     }
 
 @router.get("/users", response_model=List[User])
-async def get_all_users(admin_user: dict = Depends(check_admin)):
+async def get_all_users(admin_user: Principal = Depends(check_admin)):
     db = get_database()
     
     cursor = db.users.find({}).sort("created_at", -1)
@@ -94,7 +144,7 @@ async def get_all_users(admin_user: dict = Depends(check_admin)):
 @router.put("/users/{user_id}/toggle-active")
 async def toggle_user_active(
     user_id: str,
-    admin_user: dict = Depends(check_admin)
+    admin_user: Principal = Depends(check_admin)
 ):
     db = get_database()
     from bson import ObjectId
@@ -111,11 +161,12 @@ async def toggle_user_active(
         {"_id": ObjectId(user_id)},
         {"$set": {"is_active": new_status}}
     )
+    invalidate_principal(user["email"])
     
     return {"message": f"User {'activated' if new_status else 'deactivated'}"}
 
 @router.get("/properties", response_model=List[Property])
-async def get_all_properties(admin_user: dict = Depends(check_admin)):
+async def get_all_properties(admin_user: Principal = Depends(check_admin)):
     db = get_database()
     
     cursor = db.properties.find({}).sort("created_at", -1)
@@ -130,7 +181,7 @@ async def get_all_properties(admin_user: dict = Depends(check_admin)):
     return result
 
 @router.get("/enquiries", response_model=List[Enquiry])
-async def get_all_enquiries(admin_user: dict = Depends(check_admin)):
+async def get_all_enquiries(admin_user: Principal = Depends(check_admin)):
     db = get_database()
     
     cursor = db.enquiries.find({}).sort("created_at", -1)
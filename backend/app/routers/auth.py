@@ -3,11 +3,14 @@ from fastapi.security import OAuth2PasswordRequestForm
 from datetime import timedelta
 from app.models import UserCreate, UserLogin, User, Token
 from app.auth import (
-    verify_password,
-    get_password_hash,
+    verify_password_async,
+    get_password_hash_async,
     create_access_token,
     get_current_user,
+    invalidate_principal,
     ACCESS_TOKEN_EXPIRE_MINUTES,
+    PASSWORD_SCHEME,
+    LEGACY_PASSWORD_SCHEME,
     TokenData
 )
 from app.database import get_database
@@ -33,15 +36,18 @@ async def register(user_data: UserCreate):
         "email": user_data.email,
         "full_name": user_data.full_name,
         "phone": user_data.phone,
-        "password": get_password_hash(user_data.password),
+        "password": await get_password_hash_async(user_data.password),
+        "password_scheme": PASSWORD_SCHEME,
         "role": user_data.role.value,
         "created_at": datetime.utcnow(),
         "is_active": True
     }
     
     result = await db.users.insert_one(user_dict)
+    invalidate_principal(user_data.email)
     user_dict["id"] = str(result.inserted_id)
     del user_dict["password"]
+    del user_dict["password_scheme"]
     
     return User(**user_dict)
 
@@ -50,7 +56,12 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     db = get_database()
     
     user = await db.users.find_one({"email": form_data.username})
-    if not user or not verify_password(form_data.password, user.get("password")):
+    matched_scheme = None
+    if user:
+        matched_scheme = await verify_password_async(
+            form_data.password, user.get("password"), user.get("password_scheme")
+        )
+    if not matched_scheme:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -63,6 +74,13 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
             detail="User account is inactive"
         )
     
+    # Upgrade legacy hashes in place so future logins only need a single bcrypt check
+    if user.get("password_scheme") != PASSWORD_SCHEME:
+        upgrade = {"password_scheme": PASSWORD_SCHEME}
+        if matched_scheme == LEGACY_PASSWORD_SCHEME:
+            upgrade["password"] = await get_password_hash_async(form_data.password)
+        await db.users.update_one({"_id": user["_id"]}, {"$set": upgrade})
+    
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user["email"]}, expires_delta=access_token_expires
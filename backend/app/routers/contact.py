@@ -1,13 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from typing import List
-from app.models import ContactSubmission, ContactSubmissionCreate, TokenData
-from app.auth import get_current_user
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from typing import List, Optional
+from app.models import ContactSubmission, ContactSubmissionCreate, Principal
+from app.auth import get_current_principal
 from app.database import get_database
+from app.pagination import keyset_sort, keyset_filter, set_next_cursor
+from app.updates import model_projection, update_and_fetch
 from bson import ObjectId
 from datetime import datetime
 
 router = APIRouter()
 
+SUBMISSION_PROJECTION = model_projection(ContactSubmission)
+
 @router.post("/", response_model=ContactSubmission, status_code=status.HTTP_201_CREATED)
 async def submit_contact_form(contact_data: ContactSubmissionCreate):
     """Submit a contact form"""
@@ -27,16 +31,17 @@ async def submit_contact_form(contact_data: ContactSubmissionCreate):
 
 @router.get("/", response_model=List[ContactSubmission])
 async def get_contact_submissions(
-    current_user: TokenData = Depends(get_current_user),
+    response: Response,
+    current_user: Principal = Depends(get_current_principal),
     is_read: bool = Query(None),
     skip: int = Query(0, ge=0),
-    limit: int = Query(50, ge=1, le=100)
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor; takes precedence over skip")
 ):
     """Get all contact submissions (Admin only)"""
     db = get_database()
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user or user.get("role") != "admin":
+    if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can view contact submissions"
@@ -46,8 +51,14 @@ async def get_contact_submissions(
     if is_read is not None:
         filter_dict["is_read"] = is_read
     
-    cursor = db.contact_submissions.find(filter_dict).sort("created_at", -1).skip(skip).limit(limit)
-    submissions = await cursor.to_list(length=limit)
+    sort = keyset_sort("created_at", -1)
+    if cursor:
+        filter_dict = keyset_filter(filter_dict, sort, cursor)
+        skip = 0
+    
+    db_cursor = db.contact_submissions.find(filter_dict).sort(sort).skip(skip).limit(limit)
+    submissions = await db_cursor.to_list(length=limit)
+    set_next_cursor(response, submissions, sort, limit)
     
     result = []
     for sub in submissions:
@@ -60,7 +71,7 @@ async def get_contact_submissions(
 @router.get("/{submission_id}", response_model=ContactSubmission)
 async def get_contact_submission(
     submission_id: str,
-    current_user: TokenData = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get a specific contact submission (Admin only)"""
     db = get_database()
@@ -68,8 +79,7 @@ async def get_contact_submission(
     if not ObjectId.is_valid(submission_id):
         raise HTTPException(status_code=400, detail="Invalid submission ID")
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user or user.get("role") != "admin":
+    if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can view contact submissions"
@@ -88,7 +98,7 @@ async def get_contact_submission(
 @router.put("/{submission_id}/read", response_model=ContactSubmission)
 async def mark_submission_read(
     submission_id: str,
-    current_user: TokenData = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Mark a submission as read (Admin only)"""
     db = get_database()
@@ -96,19 +106,19 @@ async def mark_submission_read(
     if not ObjectId.is_valid(submission_id):
         raise HTTPException(status_code=400, detail="Invalid submission ID")
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user or user.get("role") != "admin":
+    if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can update contact submissions"
         )
     
-    await db.contact_submissions.update_one(
-        {"_id": ObjectId(submission_id)},
-        {"$set": {"is_read": True}}
+    updated = await update_and_fetch(
+        db.contact_submissions,
+        ObjectId(submission_id),
+        {"$set": {"is_read": True}},
+        projection=SUBMISSION_PROJECTION,
+        not_found="Submission not found"
     )
-    
-    updated = await db.contact_submissions.find_one({"_id": ObjectId(submission_id)})
     updated["id"] = str(updated["_id"])
     del updated["_id"]
     
@@ -117,7 +127,7 @@ async def mark_submission_read(
 @router.put("/{submission_id}/responded", response_model=ContactSubmission)
 async def mark_submission_responded(
     submission_id: str,
-    current_user: TokenData = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Mark a submission as responded (Admin only)"""
     db = get_database()
@@ -125,19 +135,19 @@ async def mark_submission_responded(
     if not ObjectId.is_valid(submission_id):
         raise HTTPException(status_code=400, detail="Invalid submission ID")
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user or user.get("role") != "admin":
+    if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can update contact submissions"
         )
     
-    await db.contact_submissions.update_one(
-        {"_id": ObjectId(submission_id)},
-        {"$set": {"is_responded": True, "is_read": True}}
+    updated = await update_and_fetch(
+        db.contact_submissions,
+        ObjectId(submission_id),
+        {"$set": {"is_responded": True, "is_read": True}},
+        projection=SUBMISSION_PROJECTION,
+        not_found="Submission not found"
     )
-    
-    updated = await db.contact_submissions.find_one({"_id": ObjectId(submission_id)})
     updated["id"] = str(updated["_id"])
     del updated["_id"]
     
@@ -146,7 +156,7 @@ async def mark_submission_responded(
 @router.delete("/{submission_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_submission(
     submission_id: str,
-    current_user: TokenData = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Delete a contact submission (Admin only)"""
     db = get_database()
@@ -154,8 +164,7 @@ async def delete_submission(
     if not ObjectId.is_valid(submission_id):
         raise HTTPException(status_code=400, detail="Invalid submission ID")
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user or user.get("role") != "admin":
+    if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can delete contact submissions"
@@ -1,14 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, Request
 from typing import List, Optional
-from app.models import Event, EventCreate, EventUpdate, EventRegistration, TokenData
-from app.auth import get_current_user
+from app.models import Event, EventCreate, EventUpdate, EventRegistration, Principal
+from app.auth import get_current_principal
 from app.database import get_database
+from app.normalization import normalized_fields, canonical_city_id
+from app.pagination import keyset_sort, keyset_filter, set_next_cursor
+from app.serialization import documents_response
+from app.response_cache import response_cache
+from app.conditional import check_body, check_document
+from app.fieldsets import FIELDS_DESCRIPTION, select_fields, query_projection
+from app.updates import model_projection, update_and_fetch
+from app import hooks
 from bson import ObjectId
+from pymongo import ReturnDocument
 from datetime import datetime
 from pydantic import BaseModel, EmailStr
 
 router = APIRouter()
 
+EVENT_PROJECTION = model_projection(Event)
+
 class EventRegistrationCreate(BaseModel):
     full_name: str
     email: EmailStr
@@ -17,13 +28,12 @@ class EventRegistrationCreate(BaseModel):
 @router.post("/", response_model=Event, status_code=status.HTTP_201_CREATED)
 async def create_event(
     event_data: EventCreate,
-    current_user: TokenData = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Create a new event (Admin only)"""
     db = get_database()
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user or user.get("role") != "admin":
+    if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can create events"
@@ -32,47 +42,60 @@ async def create_event(
     event_dict = {
         **event_data.dict(),
         "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow(),
         "registered_count": 0,
         "is_active": True
     }
+    event_dict.update(normalized_fields(event_dict))
     
     result = await db.events.insert_one(event_dict)
+    await hooks.notify("events", hooks.UPSERT, event_dict)
     event_dict["id"] = str(result.inserted_id)
     
     return Event(**event_dict)
 
 @router.get("/", response_model=List[Event])
 async def get_events(
+    request: Request,
+    response: Response,
     is_past: Optional[bool] = Query(None),
     city: Optional[str] = Query(None),
     skip: int = Query(0, ge=0),
-    limit: int = Query(50, ge=1, le=100)
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor; takes precedence over skip"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)
 ):
     """Get all events with optional filters"""
     db = get_database()
+    projection = select_fields(fields, Event, "events")
     
     filter_dict = {"is_active": True}
     
     if is_past is not None:
         filter_dict["is_past"] = is_past
     if city:
-        filter_dict["city"] = {"$regex": city, "$options": "i"}
+        filter_dict["city_id"] = canonical_city_id(city)
     
-    cursor = db.events.find(filter_dict).sort("event_date", -1 if is_past else 1).skip(skip).limit(limit)
-    events = await cursor.to_list(length=limit)
+    sort = keyset_sort("event_date", -1 if is_past else 1)
+    if cursor:
+        filter_dict = keyset_filter(filter_dict, sort, cursor)
+        skip = 0
     
-    result = []
-    for event in events:
-        event["id"] = str(event["_id"])
-        del event["_id"]
-        result.append(Event(**event))
+    db_cursor = db.events.find(filter_dict, query_projection(projection, sort)).sort(sort).skip(skip).limit(limit)
+    events = await db_cursor.to_list(length=limit)
+    set_next_cursor(response, events, sort, limit)
     
-    return result
+    page = documents_response(events, Event, response, fields=projection)
+    return check_body(request, page, "events")
 
 @router.get("/upcoming", response_model=List[Event])
-async def get_upcoming_events():
+async def get_upcoming_events(request: Request):
     """Get all upcoming events"""
     db = get_database()
+    cache_key = await response_cache.key(request, ("events",))
+    cached = await response_cache.lookup(cache_key)
+    if cached is not None:
+        return check_body(request, cached, "events")
     
     cursor = db.events.find({
         "is_active": True,
@@ -82,13 +105,8 @@ async def get_upcoming_events():
     
     events = await cursor.to_list(length=50)
     
-    result = []
-    for event in events:
-        event["id"] = str(event["_id"])
-        del event["_id"]
-        result.append(Event(**event))
-    
-    return result
+    page = await response_cache.store(cache_key, documents_response(events, Event))
+    return check_body(request, page, "events")
 
 @router.get("/past", response_model=List[Event])
 async def get_past_events():
@@ -111,7 +129,7 @@ async def get_past_events():
     return result
 
 @router.get("/{event_id}", response_model=Event)
-async def get_event(event_id: str):
+async def get_event(event_id: str, request: Request, response: Response):
     """Get a specific event by ID"""
     db = get_database()
     
@@ -126,6 +144,10 @@ async def get_event(event_id: str):
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     
+    not_modified = check_document(request, response, "event", event, "registered_count")
+    if not_modified is not None:
+        return not_modified
+    
     event["id"] = str(event["_id"])
     del event["_id"]
     
@@ -177,10 +199,13 @@ async def register_for_event(
     reg_dict["id"] = str(result.inserted_id)
     
     # Update registered count
-    await db.events.update_one(
+    updated_event = await db.events.find_one_and_update(
         {"_id": ObjectId(event_id)},
-        {"$inc": {"registered_count": 1}}
+        {"$inc": {"registered_count": 1}},
+        return_document=ReturnDocument.AFTER
     )
+    if updated_event:
+        await hooks.notify("events", hooks.UPSERT, updated_event)
     
     return EventRegistration(**reg_dict)
 
@@ -188,7 +213,7 @@ async def register_for_event(
 async def update_event(
     event_id: str,
     event_data: EventUpdate,
-    current_user: TokenData = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Update an event (Admin only)"""
     db = get_database()
@@ -196,21 +221,24 @@ async def update_event(
     if not ObjectId.is_valid(event_id):
         raise HTTPException(status_code=400, detail="Invalid event ID")
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user or user.get("role") != "admin":
+    if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can update events"
         )
     
     update_data = {k: v for k, v in event_data.dict().items() if v is not None}
-    
-    await db.events.update_one(
-        {"_id": ObjectId(event_id)},
-        {"$set": update_data}
+    update_data.update(normalized_fields(update_data))
+    update_data["updated_at"] = datetime.utcnow()
+    
+    updated_event = await update_and_fetch(
+        db.events,
+        ObjectId(event_id),
+        {"$set": update_data},
+        projection=EVENT_PROJECTION,
+        not_found="Event not found"
     )
-    
-    updated_event = await db.events.find_one({"_id": ObjectId(event_id)})
+    await hooks.notify("events", hooks.UPSERT, updated_event)
     updated_event["id"] = str(updated_event["_id"])
     del updated_event["_id"]
     
@@ -219,7 +247,7 @@ async def update_event(
 @router.delete("/{event_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_event(
     event_id: str,
-    current_user: TokenData = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Delete an event (Admin only)"""
     db = get_database()
@@ -227,8 +255,7 @@ async def delete_event(
     if not ObjectId.is_valid(event_id):
         raise HTTPException(status_code=400, detail="Invalid event ID")
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user or user.get("role") != "admin":
+    if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can delete events"
@@ -238,6 +265,7 @@ async def delete_event(
         {"_id": ObjectId(event_id)},
         {"$set": {"is_active": False}}
     )
+    await hooks.notify("events", hooks.REMOVE, {"_id": ObjectId(event_id)})
     
     return None
 
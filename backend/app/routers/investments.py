@@ -1,16 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, Request
 from typing import List, Optional
 from app.models import (
     InvestmentOpportunity, InvestmentOpportunityCreate,
-    InvestorRegistration, InvestorRegistrationCreate, TokenData
+    InvestorRegistration, InvestorRegistrationCreate, Principal
 )
-from app.auth import get_current_user
+from app.auth import get_current_principal
 from app.database import get_database
+from app.normalization import normalized_fields, canonical_city_id
+from app.pagination import keyset_sort, keyset_filter, set_next_cursor
+from app.serialization import documents_response, dumps
+from app.response_cache import response_cache
+from app.conditional import check_body, check_document
+from app.fieldsets import FIELDS_DESCRIPTION, select_fields, query_projection
+from app.updates import model_projection, update_and_fetch
+from app import hooks
 from bson import ObjectId
+from pymongo import ReturnDocument
 from datetime import datetime
 
 router = APIRouter()
 
+REGISTRATION_PROJECTION = model_projection(InvestorRegistration)
+
 # ========================================
 # INVESTMENT OPPORTUNITIES
 # ========================================
@@ -18,13 +29,12 @@ router = APIRouter()
 @router.post("/opportunities", response_model=InvestmentOpportunity, status_code=status.HTTP_201_CREATED)
 async def create_investment_opportunity(
     investment_data: InvestmentOpportunityCreate,
-    current_user: TokenData = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Create a new investment opportunity (Admin only)"""
     db = get_database()
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user or user.get("role") != "admin":
+    if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can create investment opportunities"
@@ -37,30 +47,41 @@ async def create_investment_opportunity(
         "is_active": True,
         "investors_count": 0
     }
+    investment_dict.update(normalized_fields(investment_dict))
     
     result = await db.investments.insert_one(investment_dict)
+    await hooks.notify("investments", hooks.UPSERT, investment_dict)
     investment_dict["id"] = str(result.inserted_id)
     
     return InvestmentOpportunity(**investment_dict)
 
 @router.get("/opportunities", response_model=List[InvestmentOpportunity])
 async def get_investment_opportunities(
+    request: Request,
+    response: Response,
     investment_type: Optional[str] = Query(None),
     city: Optional[str] = Query(None),
     min_investment: Optional[float] = Query(None),
     max_investment: Optional[float] = Query(None),
     skip: int = Query(0, ge=0),
-    limit: int = Query(50, ge=1, le=100)
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor; takes precedence over skip"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)
 ):
     """Get all investment opportunities"""
     db = get_database()
+    projection = select_fields(fields, InvestmentOpportunity, "investments")
+    cache_key = await response_cache.key(request, ("investments",))
+    cached = await response_cache.lookup(cache_key)
+    if cached is not None:
+        return check_body(request, cached, "investments")
     
     filter_dict = {"is_active": True}
     
     if investment_type:
         filter_dict["investment_type"] = {"$regex": investment_type, "$options": "i"}
     if city:
-        filter_dict["city"] = {"$regex": city, "$options": "i"}
+        filter_dict["city_id"] = canonical_city_id(city)
     if min_investment is not None:
         filter_dict["min_investment"] = {"$gte": min_investment}
     if max_investment is not None:
@@ -69,19 +90,20 @@ async def get_investment_opportunities(
         else:
             filter_dict["min_investment"] = {"$lte": max_investment}
     
-    cursor = db.investments.find(filter_dict).sort("created_at", -1).skip(skip).limit(limit)
-    investments = await cursor.to_list(length=limit)
+    sort = keyset_sort("created_at", -1)
+    if cursor:
+        filter_dict = keyset_filter(filter_dict, sort, cursor)
+        skip = 0
     
-    result = []
-    for inv in investments:
-        inv["id"] = str(inv["_id"])
-        del inv["_id"]
-        result.append(InvestmentOpportunity(**inv))
+    db_cursor = db.investments.find(filter_dict, query_projection(projection, sort)).sort(sort).skip(skip).limit(limit)
+    investments = await db_cursor.to_list(length=limit)
+    set_next_cursor(response, investments, sort, limit)
     
-    return result
+    page = await response_cache.store(cache_key, documents_response(investments, InvestmentOpportunity, response, fields=projection))
+    return check_body(request, page, "investments")
 
 @router.get("/opportunities/{opportunity_id}", response_model=InvestmentOpportunity)
-async def get_investment_opportunity(opportunity_id: str):
+async def get_investment_opportunity(opportunity_id: str, request: Request, response: Response):
     """Get a specific investment opportunity"""
     db = get_database()
     
@@ -96,6 +118,10 @@ async def get_investment_opportunity(opportunity_id: str):
     if not investment:
         raise HTTPException(status_code=404, detail="Investment opportunity not found")
     
+    not_modified = check_document(request, response, "investment", investment, "investors_count")
+    if not_modified is not None:
+        return not_modified
+    
     investment["id"] = str(investment["_id"])
     del investment["_id"]
     
@@ -104,7 +130,7 @@ async def get_investment_opportunity(opportunity_id: str):
 @router.delete("/opportunities/{opportunity_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_investment_opportunity(
     opportunity_id: str,
-    current_user: TokenData = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Delete an investment opportunity (Admin only)"""
     db = get_database()
@@ -112,8 +138,7 @@ async def delete_investment_opportunity(
     if not ObjectId.is_valid(opportunity_id):
         raise HTTPException(status_code=400, detail="Invalid opportunity ID")
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user or user.get("role") != "admin":
+    if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can delete investment opportunities"
@@ -123,6 +148,7 @@ async def delete_investment_opportunity(
         {"_id": ObjectId(opportunity_id)},
         {"$set": {"is_active": False}}
     )
+    await hooks.notify("investments", hooks.REMOVE, {"_id": ObjectId(opportunity_id)})
     
     return None
 
@@ -154,28 +180,31 @@ async def register_as_investor(registration: InvestorRegistrationCreate):
     }
     
     result = await db.investor_registrations.insert_one(reg_dict)
+    await hooks.notify("investor_registrations", hooks.UPSERT, reg_dict)
     reg_dict["id"] = str(result.inserted_id)
     
     # If opportunity_id is provided, increment investors count
     if registration.opportunity_id:
-        await db.investments.update_one(
+        investment = await db.investments.find_one_and_update(
             {"_id": ObjectId(registration.opportunity_id)},
-            {"$inc": {"investors_count": 1}}
+            {"$inc": {"investors_count": 1}},
+            return_document=ReturnDocument.AFTER
         )
+        if investment:
+            await hooks.notify("investments", hooks.UPSERT, investment)
     
     return InvestorRegistration(**reg_dict)
 
 @router.get("/registrations", response_model=List[InvestorRegistration])
 async def get_investor_registrations(
-    current_user: TokenData = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100)
 ):
     """Get all investor registrations (Admin only)"""
     db = get_database()
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user or user.get("role") != "admin":
+    if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can view investor registrations"
@@ -195,7 +224,7 @@ async def get_investor_registrations(
 @router.put("/registrations/{registration_id}/contacted", response_model=InvestorRegistration)
 async def mark_investor_contacted(
     registration_id: str,
-    current_user: TokenData = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Mark an investor registration as contacted (Admin only)"""
     db = get_database()
@@ -203,19 +232,19 @@ async def mark_investor_contacted(
     if not ObjectId.is_valid(registration_id):
         raise HTTPException(status_code=400, detail="Invalid registration ID")
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user or user.get("role") != "admin":
+    if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can update investor registrations"
         )
     
-    await db.investor_registrations.update_one(
-        {"_id": ObjectId(registration_id)},
-        {"$set": {"is_contacted": True}}
+    updated = await update_and_fetch(
+        db.investor_registrations,
+        ObjectId(registration_id),
+        {"$set": {"is_contacted": True}},
+        projection=REGISTRATION_PROJECTION,
+        not_found="Registration not found"
     )
-    
-    updated = await db.investor_registrations.find_one({"_id": ObjectId(registration_id)})
     updated["id"] = str(updated["_id"])
     del updated["_id"]
     
@@ -226,9 +255,13 @@ async def mark_investor_contacted(
 # ========================================
 
 @router.get("/statistics")
-async def get_investment_statistics():
+async def get_investment_statistics(request: Request):
     """Get investment statistics"""
     db = get_database()
+    cache_key = await response_cache.key(request, ("investments", "investor_registrations"))
+    cached = await response_cache.lookup(cache_key)
+    if cached is not None:
+        return check_body(request, cached, "investment_statistics")
     
     total_opportunities = await db.investments.count_documents({"is_active": True})
     total_investors = await db.investor_registrations.count_documents({})
@@ -241,9 +274,12 @@ async def get_investment_statistics():
     roi_result = await db.investments.aggregate(pipeline).to_list(1)
     avg_roi = roi_result[0]["avg_roi"] if roi_result else 0
     
-    return {
+    statistics = {
         "total_opportunities": total_opportunities,
         "total_investors": total_investors,
         "average_roi": round(avg_roi, 2) if avg_roi else 0
     }
+    
+    page = await response_cache.store(cache_key, Response(content=dumps(statistics), media_type="application/json"))
+    return check_body(request, page, "investment_statistics")
 
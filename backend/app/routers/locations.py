@@ -0,0 +1,20 @@
+from fastapi import APIRouter, HTTPException, status, Query
+from app.location_index import MAX_SUGGESTIONS, get_location_index
+
+router = APIRouter()
+
+@router.get("/suggest")
+async def suggest_locations(
+    prefix: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=MAX_SUGGESTIONS)
+):
+    """Autocomplete cities, states and localities in use by live listings, most listings first"""
+    index = get_location_index()
+    if index is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Location suggestions are not available yet",
+            headers={"Retry-After": "5"}
+        )
+    
+    return index.suggest(prefix, limit)
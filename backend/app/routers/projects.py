@@ -1,23 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, Request
 from typing import List, Optional
-from app.models import Project, ProjectCreate, ProjectUpdate, ProjectStatus, TokenData
-from app.auth import get_current_user
+from app.models import Project, ProjectCreate, ProjectUpdate, ProjectStatus, Principal
+from app.auth import get_current_principal
 from app.database import get_database
+from app.normalization import normalized_fields, canonical_city_id
+from app.pagination import keyset_sort, keyset_filter, set_next_cursor
+from app.serialization import documents_response
+from app.response_cache import response_cache
+from app.conditional import check_body, check_document
+from app.fieldsets import FIELDS_DESCRIPTION, select_fields, query_projection
+from app.updates import model_projection, update_and_fetch
+from app import hooks
 from bson import ObjectId
 from datetime import datetime
 
 router = APIRouter()
 
+PROJECT_PROJECTION = model_projection(Project)
+
 @router.post("/", response_model=Project, status_code=status.HTTP_201_CREATED)
 async def create_project(
     project_data: ProjectCreate,
-    current_user: TokenData = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Create a new project (Admin only)"""
     db = get_database()
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user or user.get("role") != "admin":
+    if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can create projects"
@@ -29,44 +38,56 @@ async def create_project(
         "updated_at": datetime.utcnow(),
         "is_active": True
     }
+    project_dict.update(normalized_fields(project_dict, point=False))
     
     result = await db.projects.insert_one(project_dict)
+    await hooks.notify("projects", hooks.UPSERT, project_dict)
     project_dict["id"] = str(result.inserted_id)
     
     return Project(**project_dict)
 
 @router.get("/", response_model=List[Project])
 async def get_projects(
+    request: Request,
+    response: Response,
     status: Optional[ProjectStatus] = Query(None),
     city: Optional[str] = Query(None),
     skip: int = Query(0, ge=0),
-    limit: int = Query(50, ge=1, le=100)
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor; takes precedence over skip"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)
 ):
     """Get all projects with optional filters"""
     db = get_database()
+    projection = select_fields(fields, Project, "projects")
     
     filter_dict = {"is_active": True}
     
     if status:
         filter_dict["status"] = status.value
     if city:
-        filter_dict["city"] = {"$regex": city, "$options": "i"}
+        filter_dict["city_id"] = canonical_city_id(city)
     
-    cursor = db.projects.find(filter_dict).sort("created_at", -1).skip(skip).limit(limit)
-    projects = await cursor.to_list(length=limit)
+    sort = keyset_sort("created_at", -1)
+    if cursor:
+        filter_dict = keyset_filter(filter_dict, sort, cursor)
+        skip = 0
     
-    result = []
-    for proj in projects:
-        proj["id"] = str(proj["_id"])
-        del proj["_id"]
-        result.append(Project(**proj))
+    db_cursor = db.projects.find(filter_dict, query_projection(projection, sort)).sort(sort).skip(skip).limit(limit)
+    projects = await db_cursor.to_list(length=limit)
+    set_next_cursor(response, projects, sort, limit)
     
-    return result
+    page = documents_response(projects, Project, response, fields=projection)
+    return check_body(request, page, "projects")
 
 @router.get("/completed", response_model=List[Project])
-async def get_completed_projects():
+async def get_completed_projects(request: Request):
     """Get all completed projects"""
     db = get_database()
+    cache_key = await response_cache.key(request, ("projects",))
+    cached = await response_cache.lookup(cache_key)
+    if cached is not None:
+        return check_body(request, cached, "projects")
     
     cursor = db.projects.find({
         "is_active": True,
@@ -75,18 +96,17 @@ async def get_completed_projects():
     
     projects = await cursor.to_list(length=100)
     
-    result = []
-    for proj in projects:
-        proj["id"] = str(proj["_id"])
-        del proj["_id"]
-        result.append(Project(**proj))
-    
-    return result
+    page = await response_cache.store(cache_key, documents_response(projects, Project))
+    return check_body(request, page, "projects")
 
 @router.get("/ongoing", response_model=List[Project])
-async def get_ongoing_projects():
+async def get_ongoing_projects(request: Request):
     """Get all ongoing projects"""
     db = get_database()
+    cache_key = await response_cache.key(request, ("projects",))
+    cached = await response_cache.lookup(cache_key)
+    if cached is not None:
+        return check_body(request, cached, "projects")
     
     cursor = db.projects.find({
         "is_active": True,
@@ -95,18 +115,17 @@ async def get_ongoing_projects():
     
     projects = await cursor.to_list(length=100)
     
-    result = []
-    for proj in projects:
-        proj["id"] = str(proj["_id"])
-        del proj["_id"]
-        result.append(Project(**proj))
-    
-    return result
+    page = await response_cache.store(cache_key, documents_response(projects, Project))
+    return check_body(request, page, "projects")
 
 @router.get("/upcoming", response_model=List[Project])
-async def get_upcoming_projects():
+async def get_upcoming_projects(request: Request):
     """Get all upcoming projects"""
     db = get_database()
+    cache_key = await response_cache.key(request, ("projects",))
+    cached = await response_cache.lookup(cache_key)
+    if cached is not None:
+        return check_body(request, cached, "projects")
     
     cursor = db.projects.find({
         "is_active": True,
@@ -115,16 +134,11 @@ async def get_upcoming_projects():
     
     projects = await cursor.to_list(length=100)
     
-    result = []
-    for proj in projects:
-        proj["id"] = str(proj["_id"])
-        del proj["_id"]
-        result.append(Project(**proj))
-    
-    return result
+    page = await response_cache.store(cache_key, documents_response(projects, Project))
+    return check_body(request, page, "projects")
 
 @router.get("/{project_id}", response_model=Project)
-async def get_project(project_id: str):
+async def get_project(project_id: str, request: Request, response: Response):
     """Get a specific project by ID"""
     db = get_database()
     
@@ -139,6 +153,10 @@ async def get_project(project_id: str):
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
+    not_modified = check_document(request, response, "project", project)
+    if not_modified is not None:
+        return not_modified
+    
     project["id"] = str(project["_id"])
     del project["_id"]
     
@@ -148,7 +166,7 @@ async def get_project(project_id: str):
 async def update_project(
     project_id: str,
     project_data: ProjectUpdate,
-    current_user: TokenData = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Update a project (Admin only)"""
     db = get_database()
@@ -156,22 +174,24 @@ async def update_project(
     if not ObjectId.is_valid(project_id):
         raise HTTPException(status_code=400, detail="Invalid project ID")
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user or user.get("role") != "admin":
+    if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can update projects"
         )
     
     update_data = {k: v for k, v in project_data.dict().items() if v is not None}
+    update_data.update(normalized_fields(update_data, point=False))
     update_data["updated_at"] = datetime.utcnow()
     
-    await db.projects.update_one(
-        {"_id": ObjectId(project_id)},
-        {"$set": update_data}
+    updated_project = await update_and_fetch(
+        db.projects,
+        ObjectId(project_id),
+        {"$set": update_data},
+        projection=PROJECT_PROJECTION,
+        not_found="Project not found"
     )
-    
-    updated_project = await db.projects.find_one({"_id": ObjectId(project_id)})
+    await hooks.notify("projects", hooks.UPSERT, updated_project)
     updated_project["id"] = str(updated_project["_id"])
     del updated_project["_id"]
     
@@ -180,7 +200,7 @@ async def update_project(
 @router.delete("/{project_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_project(
     project_id: str,
-    current_user: TokenData = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Delete a project (Admin only)"""
     db = get_database()
@@ -188,8 +208,7 @@ async def delete_project(
     if not ObjectId.is_valid(project_id):
         raise HTTPException(status_code=400, detail="Invalid project ID")
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user or user.get("role") != "admin":
+    if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can delete projects"
@@ -199,6 +218,7 @@ async def delete_project(
         {"_id": ObjectId(project_id)},
         {"$set": {"is_active": False}}
     )
+    await hooks.notify("projects", hooks.REMOVE, {"_id": ObjectId(project_id)})
     
     return None
 
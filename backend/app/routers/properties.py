@@ -1,16 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, Request
 from typing import List, Optional
 from app.models import (
     Property, PropertyCreate, PropertyUpdate, PropertyFilter,
-    PropertyType, PropertyStatus, ListingType, User, TokenData
+    PropertyStatus, PropertyViewBatch, User, Principal
 )
-from app.auth import get_current_user
+from app.auth import get_current_principal
 from app.database import get_database
+from app.filters import property_filter
+from app.normalization import SHADOW_FIELDS, normalized_fields
+from app.pagination import NEXT_CURSOR_HEADER, keyset_sort, keyset_filter, decode_cursor, encode_cursor, set_next_cursor
+from app.listing_index import get_listing_index, fetch_in_order
+from app.view_counter import view_counter
+from app.updates import model_projection, update_and_fetch, update_owned_and_fetch
+from app.serialization import documents_response
+from app.response_cache import response_cache
+from app.conditional import check_body, check_document
+from app.geo import MAX_RADIUS_KM, geo_filter, geo_point_expression, parse_bbox
+from app.cluster_index import MAX_ZOOM, get_cluster_index
+from app.search_index import SEARCH_BATCH_SIZE, SEARCH_FACET_MAX_HITS, get_search_index, tokenize
+from app.facets import facet_counts, facet_key
+from app.percolator import percolate
+from app.similar_index import SIMILAR_MAX_RESULTS, get_similar_index, similar_listings
+from app.fieldsets import FIELDS_DESCRIPTION, select_fields, query_projection
+from app import hooks
 from bson import ObjectId
 from datetime import datetime
 
 router = APIRouter()
 
+# Response fields plus the shadow fields change subscribers (listing index) read
+PROPERTY_PROJECTION = model_projection(Property, *SHADOW_FIELDS.values(), "location")
+
 @router.post("/", response_model=Property, status_code=status.HTTP_201_CREATED)
 async def create_property(property_data: PropertyCreate):
     """Create a new property listing. No login required - contact details are stored."""
@@ -32,84 +52,158 @@ async def create_property(property_data: PropertyCreate):
         "is_active": True,
         "views": 0
     }
+    property_dict.update(normalized_fields(property_dict))
     
     result = await db.properties.insert_one(property_dict)
+    await hooks.notify("properties", hooks.UPSERT, property_dict)
     property_dict["id"] = str(result.inserted_id)
     
     return Property(**property_dict)
 
+def _search(q: Optional[str]):
+    """The search index for a q parameter (None without q); 503 while it is loading"""
+    if not q:
+        return None
+    search = get_search_index()
+    if search is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Search is not available yet",
+            headers={"Retry-After": "5"}
+        )
+    return search
+
+async def _search_page(db, hits: List[ObjectId], filter_dict: dict, projection, skip: int, limit: int) -> List[dict]:
+    """Rows skip..skip+limit of the ranked hits that pass the structured filters, checking
+    the hits SEARCH_BATCH_SIZE at a time until enough survive (one round trip usually)"""
+    survivors: List[dict] = []
+    for start in range(0, len(hits), SEARCH_BATCH_SIZE):
+        survivors += await fetch_in_order(db.properties, hits[start:start + SEARCH_BATCH_SIZE], filter_dict, projection)
+        if len(survivors) >= skip + limit:
+            break
+    return survivors[skip:skip + limit]
+
 @router.get("/", response_model=List[Property])
 async def get_properties(
-    city: Optional[str] = Query(None),
-    state: Optional[str] = Query(None),
-    locality: Optional[str] = Query(None),
-    property_type: Optional[PropertyType] = Query(None),
-    listing_type: Optional[ListingType] = Query(None),
-    min_price: Optional[float] = Query(None),
-    max_price: Optional[float] = Query(None),
-    min_area_sqft: Optional[float] = Query(None),
-    max_area_sqft: Optional[float] = Query(None),
-    bedrooms: Optional[int] = Query(None),
-    bathrooms: Optional[int] = Query(None),
-    parking: Optional[bool] = Query(None),
-    facing: Optional[str] = Query(None),
+    request: Request,
+    response: Response,
+    filter_dict: dict = Depends(property_filter),
     skip: int = Query(0, ge=0),
-    limit: int = Query(100, ge=1, le=100)
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor; takes precedence over skip"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    near: Optional[str] = Query(None, description="lat,lng - only listings within radius_km, nearest first"),
+    radius_km: float = Query(5, gt=0, le=MAX_RADIUS_KM),
+    within: Optional[str] = Query(None, description="Map viewport as min_lng,min_lat,max_lng,max_lat"),
+    q: Optional[str] = Query(None, max_length=200, description="Search title, description, locality and amenities; results by relevance")
 ):
     """Get all approved properties with filters"""
     db = get_database()
+    projection = select_fields(fields, Property, "properties")
+    location = geo_filter(near, radius_km, within)
+    if near and cursor:
+        raise HTTPException(status_code=400, detail="Results near a point are ordered by distance; page with skip, not cursor")
+    if q and (near or cursor):
+        raise HTTPException(status_code=400, detail="Search results are ordered by relevance; page with skip, and do not combine q with near")
+    search = _search(q)
+    cache_key = await response_cache.key(request, ("properties",))
+    cached = await response_cache.lookup(cache_key)
+    if cached is not None:
+        return check_body(request, cached, "properties")
+    
+    if location is not None:
+        filter_dict["location"] = location
+    
+    # $nearSphere already returns nearest first and search hits come by relevance;
+    # every other query pages by created_at
+    by_distance = bool(near)
+    sort = keyset_sort("created_at", -1)
+    
+    index_ids = None
+    index = get_listing_index()
+    if search is None and index is not None:
+        # Serve the filter from the in-memory listing index when it is enabled and can answer it
+        after = decode_cursor(cursor) if cursor else None
+        index_ids = index.search_filter(filter_dict, after=after, skip=0 if cursor else skip, limit=limit)
+    
+    if search is not None:
+        # Rank by BM25, then keep the hits that pass the structured filters
+        properties = await _search_page(db, search.search(q), filter_dict, query_projection(projection, sort), skip, limit)
+    elif index_ids is not None:
+        properties = await fetch_in_order(db.properties, index_ids, filter_dict, query_projection(projection, sort))
+        if len(index_ids) == limit and len(properties) < limit and index_ids[-1] in index:
+            # Rows changed on another worker since the last rebuild dropped out, so a short
+            # page must not end the paging
+            index_cursor = encode_cursor(*index.sort_key(index_ids[-1]))
+            if cursor:
+                # Top the page up from MongoDB after the index page; the next cursor follows
+                # the last row served, so nothing repeats
+                after_index = keyset_filter(filter_dict, sort, index_cursor)
+                db_cursor = db.properties.find(after_index, query_projection(projection, sort)).sort(sort)
+                properties += await db_cursor.limit(limit - len(properties)).to_list(length=limit)
+            else:
+                # The next skip page starts after the index page, which a top-up would repeat;
+                # hand out a cursor past the index page instead
+                response.headers[NEXT_CURSOR_HEADER] = index_cursor
+    else:
+        if cursor:
+            filter_dict = keyset_filter(filter_dict, sort, cursor)
+            skip = 0
+        db_cursor = db.properties.find(filter_dict, query_projection(projection, sort))
+        if not by_distance:
+            db_cursor = db_cursor.sort(sort)
+        db_cursor = db_cursor.skip(skip).limit(limit)
+        properties = await db_cursor.to_list(length=limit)
+    if not by_distance and search is None:
+        set_next_cursor(response, properties, sort, limit)
+    
+    page = await response_cache.store(cache_key, documents_response(properties, Property, response, fields=projection))
+    return check_body(request, page, "properties")
+
+@router.get("/facets")
+async def get_property_facets(
+    filter_dict: dict = Depends(property_filter),
+    near: Optional[str] = Query(None, description="lat,lng - only listings within radius_km"),
+    radius_km: float = Query(5, gt=0, le=MAX_RADIUS_KM),
+    within: Optional[str] = Query(None, description="Map viewport as min_lng,min_lat,max_lng,max_lat"),
+    q: Optional[str] = Query(None, max_length=200, description="Search title, description, locality and amenities")
+):
+    """Listing counts per property type, listing type, bedrooms and city, plus price and area
+    histograms, under the same filters as the list"""
+    db = get_database()
+    location = geo_filter(near, radius_km, within)
+    search = _search(q)
+    if location is not None:
+        filter_dict["location"] = location
+    
+    cache_key = facet_key("properties", filter_dict, " ".join(sorted(set(tokenize(q)))) if q else "")
+    if search is None:
+        return await facet_counts(db, "properties", filter_dict, cache_key)
+    # Count every hit, not just the best-ranked ones; past SEARCH_FACET_MAX_HITS say so
+    hits = search.search(q)
+    filter_dict["_id"] = {"$in": hits[:SEARCH_FACET_MAX_HITS]}
+    facets = await facet_counts(db, "properties", filter_dict, cache_key)
+    return {**facets, "truncated": len(hits) > SEARCH_FACET_MAX_HITS}
+
+@router.get("/clusters")
+async def get_property_clusters(
+    bbox: str = Query(..., description="Map viewport as min_lng,min_lat,max_lng,max_lat"),
+    zoom: int = Query(..., ge=0, le=MAX_ZOOM)
+):
+    """Aggregated map clusters (count, centroid, price range) of approved listings in the viewport"""
+    viewport = parse_bbox(bbox)
+    index = get_cluster_index()
+    if index is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Map clusters are not available yet",
+            headers={"Retry-After": "5"}
+        )
     
-    filter_dict = {
-        "is_active": True,
-        "status": PropertyStatus.APPROVED.value
-    }
-    
-    if city:
-        filter_dict["city"] = {"$regex": city, "$options": "i"}
-    if state:
-        filter_dict["state"] = {"$regex": state, "$options": "i"}
-    if locality:
-        filter_dict["locality"] = {"$regex": locality, "$options": "i"}
-    if property_type:
-        filter_dict["property_type"] = property_type.value
-    if listing_type:
-        filter_dict["listing_type"] = listing_type.value
-    if min_price is not None:
-        filter_dict["price"] = {"$gte": min_price}
-    if max_price is not None:
-        if "price" in filter_dict:
-            filter_dict["price"]["$lte"] = max_price
-        else:
-            filter_dict["price"] = {"$lte": max_price}
-    if min_area_sqft is not None:
-        filter_dict["area_sqft"] = {"$gte": min_area_sqft}
-    if max_area_sqft is not None:
-        if "area_sqft" in filter_dict:
-            filter_dict["area_sqft"]["$lte"] = max_area_sqft
-        else:
-            filter_dict["area_sqft"] = {"$lte": max_area_sqft}
-    if bedrooms:
-        filter_dict["bedrooms"] = bedrooms
-    if bathrooms:
-        filter_dict["bathrooms"] = bathrooms
-    if parking is not None:
-        filter_dict["parking"] = parking
-    if facing:
-        filter_dict["facing"] = {"$regex": facing, "$options": "i"}
-    
-    cursor = db.properties.find(filter_dict).sort("created_at", -1).skip(skip).limit(limit)
-    properties = await cursor.to_list(length=limit)
-    
-    result = []
-    for prop in properties:
-        prop["id"] = str(prop["_id"])
-        del prop["_id"]
-        result.append(Property(**prop))
-    
-    return result
+    return {"zoom": zoom, "clusters": index.clusters(viewport, zoom)}
 
 @router.get("/{property_id}", response_model=Property)
-async def get_property(property_id: str):
+async def get_property(property_id: str, request: Request, response: Response):
     db = get_database()
     
     if not ObjectId.is_valid(property_id):
@@ -119,36 +213,55 @@ async def get_property(property_id: str):
     if not property:
         raise HTTPException(status_code=404, detail="Property not found")
     
+    not_modified = check_document(request, response, "property", property, "views")
+    if not_modified is not None:
+        return not_modified
+    
     property["id"] = str(property["_id"])
     del property["_id"]
     
     return Property(**property)
 
-@router.put("/{property_id}", response_model=Property)
-async def update_property(
+@router.get("/{property_id}/similar", response_model=List[Property])
+async def get_similar_properties(
     property_id: str,
-    property_data: PropertyUpdate,
-    current_user: TokenData = Depends(get_current_user)
+    response: Response,
+    limit: int = Query(10, ge=1, le=SIMILAR_MAX_RESULTS),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)
 ):
+    """Approved listings most like this one (price, area, rooms, type, city and location), most similar first"""
     db = get_database()
     
     if not ObjectId.is_valid(property_id):
         raise HTTPException(status_code=400, detail="Invalid property ID")
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    property = await db.properties.find_one({"_id": ObjectId(property_id)})
-    if not property:
-        raise HTTPException(status_code=404, detail="Property not found")
-    
-    # Check if user is the seller or admin (any user can list, but only owner can update)
-    if str(property["seller_id"]) != str(user["_id"]) and user.get("role") != "admin":
+    index = get_similar_index()
+    if index is None:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to update this property"
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Similar listings are not available yet",
+            headers={"Retry-After": "5"}
         )
+    if ObjectId(property_id) not in index:
+        raise HTTPException(status_code=404, detail="Property not found")
+    
+    projection = select_fields(fields, Property, "properties")
+    similar_ids = similar_listings(index, ObjectId(property_id), limit)
+    properties = await fetch_in_order(
+        db.properties, similar_ids, {"is_active": True, "status": PropertyStatus.APPROVED.value}, projection
+    )
+    return documents_response(properties, Property, response, fields=projection)
+
+@router.put("/{property_id}", response_model=Property)
+async def update_property(
+    property_id: str,
+    property_data: PropertyUpdate,
+    current_user: Principal = Depends(get_current_principal)
+):
+    db = get_database()
+    
+    if not ObjectId.is_valid(property_id):
+        raise HTTPException(status_code=400, detail="Invalid property ID")
     
     update_data = {k: v for k, v in property_data.dict().items() if v is not None}
     
@@ -159,14 +272,29 @@ async def update_property(
             detail="Maximum 3 images allowed"
         )
     
+    update_data.update(normalized_fields(update_data))
     update_data["updated_at"] = datetime.utcnow()
-    
-    await db.properties.update_one(
-        {"_id": ObjectId(property_id)},
-        {"$set": update_data}
+    update = {"$set": update_data}
+    if ("latitude" in update_data) != ("longitude" in update_data):
+        # One coordinate changed: rebuild the point from the merged document in a pipeline
+        # update ($literal keeps values such as "$..." strings from reading as expressions)
+        update = [
+            {"$set": {field: {"$literal": value} for field, value in update_data.items()}},
+            {"$set": {"location": geo_point_expression()}},
+        ]
+    
+    # Only the seller or an admin may update (any user can list, but only owner can update)
+    updated_property = await update_owned_and_fetch(
+        db.properties,
+        ObjectId(property_id),
+        update,
+        owner_field="seller_id",
+        current_user=current_user,
+        projection=PROPERTY_PROJECTION,
+        not_found="Property not found",
+        forbidden="Not authorized to update this property"
     )
-    
-    updated_property = await db.properties.find_one({"_id": ObjectId(property_id)})
+    await hooks.notify("properties", hooks.UPSERT, updated_property)
     updated_property["id"] = str(updated_property["_id"])
     del updated_property["_id"]
     
@@ -175,46 +303,39 @@ async def update_property(
 @router.delete("/{property_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_property(
     property_id: str,
-    current_user: TokenData = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     db = get_database()
     
     if not ObjectId.is_valid(property_id):
         raise HTTPException(status_code=400, detail="Invalid property ID")
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     property = await db.properties.find_one({"_id": ObjectId(property_id)})
     if not property:
         raise HTTPException(status_code=404, detail="Property not found")
     
     # Check if user is the seller or admin (any user can list, but only owner can delete)
-    if str(property["seller_id"]) != str(user["_id"]) and user.get("role") != "admin":
+    if str(property["seller_id"]) != current_user.id and current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to delete this property"
         )
     
-    # Soft delete
+    # Soft delete; bumping updated_at lets stored recommendations drop it on their next refresh
     await db.properties.update_one(
         {"_id": ObjectId(property_id)},
-        {"$set": {"is_active": False}}
+        {"$set": {"is_active": False, "updated_at": datetime.utcnow()}}
     )
+    await hooks.notify("properties", hooks.REMOVE, {"_id": ObjectId(property_id)})
     
     return None
 
 @router.get("/my-properties", response_model=List[Property])
-async def get_my_properties(current_user: TokenData = Depends(get_current_user)):
+async def get_my_properties(current_user: Principal = Depends(get_current_principal)):
     """Get all properties listed by the current user (any user can list properties)"""
     db = get_database()
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    cursor = db.properties.find({"seller_id": str(user["_id"])}).sort("created_at", -1)
+    cursor = db.properties.find({"seller_id": current_user.id}).sort("created_at", -1)
     properties = await cursor.to_list(length=1000)
     
     result = []
@@ -255,13 +376,12 @@ async def get_admin_projects():
 
 @router.get("/pending", response_model=List[Property])
 async def get_pending_properties(
-    current_user: TokenData = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get all pending properties awaiting approval (Admin only)"""
     db = get_database()
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user or user.get("role") != "admin":
+    if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can view pending properties"
@@ -285,7 +405,7 @@ async def get_pending_properties(
 @router.put("/{property_id}/approve", response_model=Property)
 async def approve_property(
     property_id: str,
-    current_user: TokenData = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Approve a pending property (Admin only)"""
     db = get_database()
@@ -293,19 +413,28 @@ async def approve_property(
     if not ObjectId.is_valid(property_id):
         raise HTTPException(status_code=400, detail="Invalid property ID")
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user or user.get("role") != "admin":
+    if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can approve properties"
         )
     
-    await db.properties.update_one(
-        {"_id": ObjectId(property_id)},
-        {"$set": {"status": PropertyStatus.APPROVED.value, "updated_at": datetime.utcnow()}}
+    # approved_at marks when the listing becomes new to saved search alert digests; $min
+    # keeps the first approval so re-approving a listing does not alert again
+    now = datetime.utcnow()
+    updated = await update_and_fetch(
+        db.properties,
+        ObjectId(property_id),
+        {"$set": {"status": PropertyStatus.APPROVED.value, "updated_at": now}, "$min": {"approved_at": now}},
+        projection=PROPERTY_PROJECTION,
+        not_found="Property not found"
     )
-    
-    updated = await db.properties.find_one({"_id": ObjectId(property_id)})
+    await hooks.notify("properties", hooks.UPSERT, updated)
+    # Match the new listing back to waiting property requirements
+    try:
+        await percolate(db, updated)
+    except Exception as e:
+        print(f"Warning: could not match property {property_id} to stored searches: {e}")
     updated["id"] = str(updated["_id"])
     del updated["_id"]
     
@@ -314,7 +443,7 @@ async def approve_property(
 @router.put("/{property_id}/reject", response_model=Property)
 async def reject_property(
     property_id: str,
-    current_user: TokenData = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Reject a pending property (Admin only)"""
     db = get_database()
@@ -322,36 +451,46 @@ async def reject_property(
     if not ObjectId.is_valid(property_id):
         raise HTTPException(status_code=400, detail="Invalid property ID")
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user or user.get("role") != "admin":
+    if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can reject properties"
         )
     
-    await db.properties.update_one(
-        {"_id": ObjectId(property_id)},
-        {"$set": {"status": PropertyStatus.REJECTED.value, "updated_at": datetime.utcnow()}}
+    updated = await update_and_fetch(
+        db.properties,
+        ObjectId(property_id),
+        {"$set": {"status": PropertyStatus.REJECTED.value, "updated_at": datetime.utcnow()}},
+        projection=PROPERTY_PROJECTION,
+        not_found="Property not found"
     )
-    
-    updated = await db.properties.find_one({"_id": ObjectId(property_id)})
+    await hooks.notify("properties", hooks.UPSERT, updated)
     updated["id"] = str(updated["_id"])
     del updated["_id"]
     
     return Property(**updated)
 
+def _view_client(request: Request) -> Optional[str]:
+    """Key for per-client view dedupe: the peer address. Behind a proxy, uvicorn's
+    --proxy-headers replaces it with the forwarded client, but only for proxies listed in
+    --forwarded-allow-ips, so clients cannot pick their own address per request"""
+    return request.client.host if request.client else None
+
 @router.put("/{property_id}/view")
-async def increment_property_views(property_id: str):
+async def increment_property_views(property_id: str, request: Request):
     """Increment property view count"""
-    db = get_database()
-    
     if not ObjectId.is_valid(property_id):
         raise HTTPException(status_code=400, detail="Invalid property ID")
     
-    await db.properties.update_one(
-        {"_id": ObjectId(property_id)},
-        {"$inc": {"views": 1}}
-    )
+    # Buffered in memory and written in batches by the view counter
+    view_counter.record([ObjectId(property_id)], client=_view_client(request))
     
     return {"message": "View counted"}
 
+@router.post("/views")
+async def record_property_views(batch: PropertyViewBatch, request: Request):
+    """Count views for many listings in one call (e.g. a navigator.sendBeacon on page hide)"""
+    property_ids = [ObjectId(property_id) for property_id in batch.property_ids if ObjectId.is_valid(property_id)]
+    counted = view_counter.record(property_ids, client=_view_client(request))
+    
+    return {"message": "Views counted", "counted": counted}
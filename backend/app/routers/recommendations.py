@@ -1,95 +1,39 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from typing import List, Optional
 from app.models import (
-    PropertyRecommendation, PropertyRecommendationForm, Property, TokenData
+    PropertyRecommendation, PropertyRecommendationForm, Property, PropertyStatus, Principal
 )
-from app.auth import get_current_user
+from app.auth import get_current_principal
 from app.database import get_database
+from app.scoring import candidate_filter, compile_query, rank_properties, refresh_ranking
+from app.listing_index import fetch_in_order
 from bson import ObjectId
 from datetime import datetime
+import json
 
 router = APIRouter()
 
-def match_properties(form_data: PropertyRecommendationForm, properties: List[dict]) -> List[str]:
-    """Match properties based on recommendation form criteria."""
-    matched_property_ids = []
-    
-    for prop in properties:
-        if not prop.get("is_active", True):
-            continue
-        
-        # Property type match
-        if form_data.property_type and prop.get("property_type") != form_data.property_type.value:
-            continue
-        
-        # Location matches
-        if form_data.city and prop.get("city", "").lower() != form_data.city.lower():
-            continue
-        if form_data.state and prop.get("state", "").lower() != form_data.state.lower():
-            continue
-        if form_data.locality and form_data.locality.lower() not in prop.get("locality", "").lower():
-            continue
-        
-        # Price range match
-        prop_price = prop.get("price", 0)
-        if form_data.min_price and prop_price < form_data.min_price:
-            continue
-        if form_data.max_price and prop_price > form_data.max_price:
-            continue
-        
-        # Area range match
-        prop_area = prop.get("area_sqft", 0)
-        if form_data.min_area_sqft and prop_area < form_data.min_area_sqft:
-            continue
-        if form_data.max_area_sqft and prop_area > form_data.max_area_sqft:
-            continue
-        
-        # Bedrooms match (for house/flat)
-        if form_data.bedrooms is not None and prop.get("bedrooms") != form_data.bedrooms:
-            continue
-        
-        # Bathrooms match (for house/flat)
-        if form_data.bathrooms is not None and prop.get("bathrooms") != form_data.bathrooms:
-            continue
-        
-        # Parking match
-        if form_data.parking is not None and prop.get("parking") != form_data.parking:
-            continue
-        
-        # Facing match
-        if form_data.facing and form_data.facing.lower() not in prop.get("facing", "").lower():
-            continue
-        
-        matched_property_ids.append(str(prop["_id"]))
-    
-    return matched_property_ids
-
 @router.post("/", response_model=PropertyRecommendation, status_code=status.HTTP_201_CREATED)
 async def create_recommendation(
     form_data: PropertyRecommendationForm,
-    current_user: TokenData = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
-    """Submit a property recommendation form and get matched properties."""
+    """Submit a property recommendation form and get the best-matching properties, ranked."""
     db = get_database()
     
-    # Get buyer
-    buyer = await db.users.find_one({"email": current_user.email})
-    if not buyer:
-        raise HTTPException(status_code=404, detail="User not found")
+    # Score candidates on every criterion instead of requiring all of them to match
+    evaluated_at = datetime.utcnow()
+    ranked = await rank_properties(db, form_data)
     
-    # Get all active properties
-    cursor = db.properties.find({"is_active": True})
-    all_properties = await cursor.to_list(length=10000)
-    
-    # Match properties based on form criteria
-    matched_property_ids = match_properties(form_data, all_properties)
-    
-    # Create recommendation record
+    # Create recommendation record; reads re-score only listings changed after evaluated_at
     recommendation_dict = {
-        "buyer_id": str(buyer["_id"]),
+        "buyer_id": current_user.id,
         "form_data": form_data.dict(),
-        "created_at": datetime.utcnow(),
-        "matched_properties": matched_property_ids
+        "query": compile_query(form_data),
+        "created_at": evaluated_at,
+        "last_evaluated_at": evaluated_at,
+        "matched_properties": [str(property_id) for property_id, _ in ranked],
+        "scores": [score for _, score in ranked]
     }
     
     result = await db.recommendations.insert_one(recommendation_dict)
@@ -99,18 +43,14 @@ async def create_recommendation(
 
 @router.get("/", response_model=List[PropertyRecommendation])
 async def get_my_recommendations(
-    current_user: TokenData = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100)
 ):
     """Get all property recommendations submitted by the current user."""
     db = get_database()
     
-    buyer = await db.users.find_one({"email": current_user.email})
-    if not buyer:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    cursor = db.recommendations.find({"buyer_id": str(buyer["_id"])}).sort("created_at", -1).skip(skip).limit(limit)
+    cursor = db.recommendations.find({"buyer_id": current_user.id}).sort("created_at", -1).skip(skip).limit(limit)
     recommendations = await cursor.to_list(length=limit)
     
     result = []
@@ -121,42 +61,67 @@ async def get_my_recommendations(
     
     return result
 
+async def _current_ranking(db, recommendation: dict) -> List[ObjectId]:
+    """The recommendation's ranking, brought up to date with the listings changed since it
+    was last evaluated (and stored back)."""
+    form_data = PropertyRecommendationForm(**recommendation["form_data"])
+    query = json.loads(recommendation["query"]) if recommendation.get("query") else candidate_filter(form_data)
+    ranked = [
+        (ObjectId(property_id), score)
+        for property_id, score in zip(recommendation.get("matched_properties", []), recommendation.get("scores", []))
+    ]
+    last_evaluated_at = recommendation.get("last_evaluated_at")
+    evaluated_at = datetime.utcnow()
+    if last_evaluated_at is None:
+        # Stored before incremental refresh: rank once from scratch
+        refreshed = await rank_properties(db, form_data, query=query)
+    else:
+        refreshed = await refresh_ranking(db, form_data, query, ranked, since=last_evaluated_at)
+    if refreshed is None:
+        return [property_id for property_id, _ in ranked]
+    
+    # Skip the write if a concurrent read already moved the mark on
+    await db.recommendations.update_one(
+        {"_id": recommendation["_id"], "last_evaluated_at": last_evaluated_at},
+        {"$set": {
+            "query": json.dumps(query),
+            "last_evaluated_at": evaluated_at,
+            "matched_properties": [str(property_id) for property_id, _ in refreshed],
+            "scores": [score for _, score in refreshed]
+        }}
+    )
+    return [property_id for property_id, _ in refreshed]
+
 @router.get("/{recommendation_id}/properties", response_model=List[Property])
 async def get_recommendation_properties(
     recommendation_id: str,
-    current_user: TokenData = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100)
 ):
-    """Get the matched properties for a specific recommendation."""
+    """Get the matched properties for a specific recommendation, best match first."""
     db = get_database()
     
     if not ObjectId.is_valid(recommendation_id):
         raise HTTPException(status_code=400, detail="Invalid recommendation ID")
     
-    buyer = await db.users.find_one({"email": current_user.email})
-    if not buyer:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     recommendation = await db.recommendations.find_one({"_id": ObjectId(recommendation_id)})
     if not recommendation:
         raise HTTPException(status_code=404, detail="Recommendation not found")
     
     # Check if recommendation belongs to the user
-    if recommendation.get("buyer_id") != str(buyer["_id"]):
+    if recommendation.get("buyer_id") != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to view this recommendation"
         )
     
-    # Get matched properties
-    matched_ids = recommendation.get("matched_properties", [])
-    if not matched_ids:
-        return []
-    
-    # Convert string IDs to ObjectIds
-    object_ids = [ObjectId(pid) for pid in matched_ids if ObjectId.is_valid(pid)]
-    
-    cursor = db.properties.find({"_id": {"$in": object_ids}, "is_active": True})
-    properties = await cursor.to_list(length=len(object_ids))
+    ranked_ids = await _current_ranking(db, recommendation)
+    properties = await fetch_in_order(
+        db.properties,
+        ranked_ids[skip:skip + limit],
+        {"is_active": True, "status": PropertyStatus.APPROVED.value}
+    )
     
     result = []
     for prop in properties:
@@ -165,4 +130,3 @@ async def get_recommendation_properties(
         result.append(Property(**prop))
     
     return result
-
@@ -1,16 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, Request
 from typing import List, Optional
 from app.models import (
     RentalProperty, RentalPropertyCreate, PropertyStatus,
-    PropertyType, RentType, TenantType, TokenData
+    PropertyType, RentType, TenantType, Principal
 )
-from app.auth import get_current_user
+from app.auth import get_current_principal
 from app.database import get_database
+from app.normalization import normalized_fields, canonical_city_id, canonical_state_id
+from app.pagination import keyset_sort, keyset_filter, set_next_cursor
+from app.serialization import documents_response
+from app.response_cache import response_cache
+from app.conditional import check_body, check_document
+from app.geo import MAX_RADIUS_KM, geo_filter
+from app.facets import facet_counts
+from app.fieldsets import FIELDS_DESCRIPTION, select_fields, query_projection
+from app.updates import model_projection, update_and_fetch
+from app import hooks
 from bson import ObjectId
 from datetime import datetime
 
 router = APIRouter()
 
+RENTAL_PROJECTION = model_projection(RentalProperty)
+
 @router.post("/", response_model=RentalProperty, status_code=status.HTTP_201_CREATED)
 async def create_rental_listing(rental_data: RentalPropertyCreate):
     """Create a new rental property listing. No login required - contact details are stored."""
@@ -24,14 +36,15 @@ async def create_rental_listing(rental_data: RentalPropertyCreate):
         "updated_at": datetime.utcnow(),
         "is_active": True
     }
+    rental_dict.update(normalized_fields(rental_dict))
     
     result = await db.rentals.insert_one(rental_dict)
+    await hooks.notify("rentals", hooks.UPSERT, rental_dict)
     rental_dict["id"] = str(result.inserted_id)
     
     return RentalProperty(**rental_dict)
 
-@router.get("/", response_model=List[RentalProperty])
-async def get_rental_properties(
+def rental_filter(
     city: Optional[str] = Query(None),
     state: Optional[str] = Query(None),
     property_type: Optional[PropertyType] = Query(None),
@@ -39,22 +52,18 @@ async def get_rental_properties(
     tenant_type: Optional[TenantType] = Query(None),
     min_rent: Optional[float] = Query(None),
     max_rent: Optional[float] = Query(None),
-    bedrooms: Optional[int] = Query(None),
-    skip: int = Query(0, ge=0),
-    limit: int = Query(50, ge=1, le=100)
-):
-    """Get all approved rental properties"""
-    db = get_database()
-    
+    bedrooms: Optional[int] = Query(None)
+) -> dict:
+    """MongoDB filter for approved rentals matching the structured list filters"""
     filter_dict = {
         "is_active": True,
         "status": PropertyStatus.APPROVED.value
     }
     
     if city:
-        filter_dict["city"] = {"$regex": city, "$options": "i"}
+        filter_dict["city_id"] = canonical_city_id(city)
     if state:
-        filter_dict["state"] = {"$regex": state, "$options": "i"}
+        filter_dict["state_id"] = canonical_state_id(state)
     if property_type:
         filter_dict["property_type"] = property_type.value
     if rent_type:
@@ -71,30 +80,78 @@ async def get_rental_properties(
     if bedrooms:
         filter_dict["bedrooms"] = bedrooms
     
-    cursor = db.rentals.find(filter_dict).sort("created_at", -1).skip(skip).limit(limit)
-    rentals = await cursor.to_list(length=limit)
-    
-    result = []
-    for rental in rentals:
-        rental["id"] = str(rental["_id"])
-        del rental["_id"]
-        result.append(RentalProperty(**rental))
+    return filter_dict
+
+@router.get("/", response_model=List[RentalProperty])
+async def get_rental_properties(
+    request: Request,
+    response: Response,
+    filter_dict: dict = Depends(rental_filter),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor; takes precedence over skip"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    near: Optional[str] = Query(None, description="lat,lng - only listings within radius_km, nearest first"),
+    radius_km: float = Query(5, gt=0, le=MAX_RADIUS_KM),
+    within: Optional[str] = Query(None, description="Map viewport as min_lng,min_lat,max_lng,max_lat")
+):
+    """Get all approved rental properties"""
+    db = get_database()
+    projection = select_fields(fields, RentalProperty, "rentals")
+    location = geo_filter(near, radius_km, within)
+    if near and cursor:
+        raise HTTPException(status_code=400, detail="Results near a point are ordered by distance; page with skip, not cursor")
+    cache_key = await response_cache.key(request, ("rentals",))
+    cached = await response_cache.lookup(cache_key)
+    if cached is not None:
+        return check_body(request, cached, "rentals")
+    
+    if location is not None:
+        filter_dict["location"] = location
+    
+    # $nearSphere already returns nearest first; every other query pages by created_at
+    by_distance = bool(near)
+    sort = keyset_sort("created_at", -1)
+    if cursor:
+        filter_dict = keyset_filter(filter_dict, sort, cursor)
+        skip = 0
+    
+    db_cursor = db.rentals.find(filter_dict, query_projection(projection, sort))
+    if not by_distance:
+        db_cursor = db_cursor.sort(sort)
+    db_cursor = db_cursor.skip(skip).limit(limit)
+    rentals = await db_cursor.to_list(length=limit)
+    if not by_distance:
+        set_next_cursor(response, rentals, sort, limit)
+    
+    page = await response_cache.store(cache_key, documents_response(rentals, RentalProperty, response, fields=projection))
+    return check_body(request, page, "rentals")
+
+@router.get("/facets")
+async def get_rental_facets(
+    filter_dict: dict = Depends(rental_filter),
+    near: Optional[str] = Query(None, description="lat,lng - only listings within radius_km"),
+    radius_km: float = Query(5, gt=0, le=MAX_RADIUS_KM),
+    within: Optional[str] = Query(None, description="Map viewport as min_lng,min_lat,max_lng,max_lat")
+):
+    """Rental counts per property type, furnishing, tenant type, bedrooms and city, plus rent
+    and area histograms, under the same filters as the list"""
+    db = get_database()
+    location = geo_filter(near, radius_km, within)
+    if location is not None:
+        filter_dict["location"] = location
     
-    return result
+    return await facet_counts(db, "rentals", filter_dict)
 
 @router.get("/my-listings", response_model=List[RentalProperty])
 async def get_my_rental_listings(
-    current_user: TokenData = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get all rental listings by current user"""
     db = get_database()
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     cursor = db.rentals.find({
-        "owner_id": str(user["_id"]),
+        "owner_id": current_user.id,
         "is_active": True
     }).sort("created_at", -1)
     
@@ -110,13 +167,12 @@ async def get_my_rental_listings(
 
 @router.get("/pending", response_model=List[RentalProperty])
 async def get_pending_rentals(
-    current_user: TokenData = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get all pending rental listings (Admin only)"""
     db = get_database()
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user or user.get("role") != "admin":
+    if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can view pending rentals"
@@ -138,7 +194,7 @@ async def get_pending_rentals(
     return result
 
 @router.get("/{rental_id}", response_model=RentalProperty)
-async def get_rental_property(rental_id: str):
+async def get_rental_property(rental_id: str, request: Request, response: Response):
     """Get a specific rental property"""
     db = get_database()
     
@@ -153,6 +209,10 @@ async def get_rental_property(rental_id: str):
     if not rental:
         raise HTTPException(status_code=404, detail="Rental property not found")
     
+    not_modified = check_document(request, response, "rental", rental)
+    if not_modified is not None:
+        return not_modified
+    
     rental["id"] = str(rental["_id"])
     del rental["_id"]
     
@@ -161,7 +221,7 @@ async def get_rental_property(rental_id: str):
 @router.put("/{rental_id}/approve", response_model=RentalProperty)
 async def approve_rental(
     rental_id: str,
-    current_user: TokenData = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Approve a rental listing (Admin only)"""
     db = get_database()
@@ -169,19 +229,20 @@ async def approve_rental(
     if not ObjectId.is_valid(rental_id):
         raise HTTPException(status_code=400, detail="Invalid rental ID")
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user or user.get("role") != "admin":
+    if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can approve rentals"
         )
     
-    await db.rentals.update_one(
-        {"_id": ObjectId(rental_id)},
-        {"$set": {"status": PropertyStatus.APPROVED.value, "updated_at": datetime.utcnow()}}
+    updated = await update_and_fetch(
+        db.rentals,
+        ObjectId(rental_id),
+        {"$set": {"status": PropertyStatus.APPROVED.value, "updated_at": datetime.utcnow()}},
+        projection=RENTAL_PROJECTION,
+        not_found="Rental property not found"
     )
-    
-    updated = await db.rentals.find_one({"_id": ObjectId(rental_id)})
+    await hooks.notify("rentals", hooks.UPSERT, updated)
     updated["id"] = str(updated["_id"])
     del updated["_id"]
     
@@ -190,7 +251,7 @@ async def approve_rental(
 @router.put("/{rental_id}/reject", response_model=RentalProperty)
 async def reject_rental(
     rental_id: str,
-    current_user: TokenData = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Reject a rental listing (Admin only)"""
     db = get_database()
@@ -198,19 +259,20 @@ async def reject_rental(
     if not ObjectId.is_valid(rental_id):
         raise HTTPException(status_code=400, detail="Invalid rental ID")
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user or user.get("role") != "admin":
+    if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can reject rentals"
         )
     
-    await db.rentals.update_one(
-        {"_id": ObjectId(rental_id)},
-        {"$set": {"status": PropertyStatus.REJECTED.value, "updated_at": datetime.utcnow()}}
+    updated = await update_and_fetch(
+        db.rentals,
+        ObjectId(rental_id),
+        {"$set": {"status": PropertyStatus.REJECTED.value, "updated_at": datetime.utcnow()}},
+        projection=RENTAL_PROJECTION,
+        not_found="Rental property not found"
     )
-    
-    updated = await db.rentals.find_one({"_id": ObjectId(rental_id)})
+    await hooks.notify("rentals", hooks.UPSERT, updated)
     updated["id"] = str(updated["_id"])
     del updated["_id"]
     
@@ -219,7 +281,7 @@ async def reject_rental(
 @router.delete("/{rental_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_rental(
     rental_id: str,
-    current_user: TokenData = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Delete a rental listing"""
     db = get_database()
@@ -227,16 +289,12 @@ async def delete_rental(
     if not ObjectId.is_valid(rental_id):
         raise HTTPException(status_code=400, detail="Invalid rental ID")
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     rental = await db.rentals.find_one({"_id": ObjectId(rental_id)})
     if not rental:
         raise HTTPException(status_code=404, detail="Rental not found")
     
     # Check if user is owner or admin
-    if str(rental["owner_id"]) != str(user["_id"]) and user.get("role") != "admin":
+    if str(rental["owner_id"]) != current_user.id and current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to delete this rental"
@@ -246,6 +304,7 @@ async def delete_rental(
         {"_id": ObjectId(rental_id)},
         {"$set": {"is_active": False}}
     )
+    await hooks.notify("rentals", hooks.REMOVE, {"_id": ObjectId(rental_id)})
     
     return None
 
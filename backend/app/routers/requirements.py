@@ -1,15 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from typing import List, Optional
 from app.models import (
-    PropertyRequirement, PropertyRequirementCreate, PropertyType, TokenData
+    PropertyRequirement, PropertyRequirementCreate, PropertyType, Principal
 )
-from app.auth import get_current_user
+from app.auth import get_current_principal
 from app.database import get_database
+from app.normalization import normalized_fields, canonical_city_id
+from app.listing_index import get_listing_index
+from app.percolator import requirement_filter
+from app.updates import model_projection, update_and_fetch
+from app import hooks
 from bson import ObjectId
 from datetime import datetime
 
 router = APIRouter()
 
+REQUIREMENT_PROJECTION = model_projection(PropertyRequirement)
+
 @router.post("/", response_model=PropertyRequirement, status_code=status.HTTP_201_CREATED)
 async def submit_property_requirement(requirement: PropertyRequirementCreate):
     """Submit a property requirement (What you're looking for)"""
@@ -22,25 +29,22 @@ async def submit_property_requirement(requirement: PropertyRequirementCreate):
         "is_fulfilled": False,
         "matched_properties": []
     }
+    req_dict.update(normalized_fields(req_dict))
     
     result = await db.property_requirements.insert_one(req_dict)
+    await hooks.notify("property_requirements", hooks.UPSERT, req_dict)
     req_dict["id"] = str(result.inserted_id)
     
-    # Try to match with existing properties
-    filter_dict = {"is_active": True}
-    
-    if requirement.property_type:
-        filter_dict["property_type"] = requirement.property_type.value
-    if requirement.city:
-        filter_dict["city"] = {"$regex": requirement.city, "$options": "i"}
-    if requirement.min_budget is not None and requirement.max_budget is not None:
-        filter_dict["price"] = {
-            "$gte": requirement.min_budget,
-            "$lte": requirement.max_budget
-        }
+    # Try to match with existing properties, on the same criteria percolation uses later
+    filter_dict = requirement_filter(req_dict)
     
-    matched = await db.properties.find(filter_dict).limit(10).to_list(10)
-    matched_ids = [str(p["_id"]) for p in matched]
+    index = get_listing_index()
+    index_ids = index.search_filter(filter_dict, limit=10) if index is not None else None
+    if index_ids is not None:
+        matched_ids = [str(object_id) for object_id in index_ids]
+    else:
+        matched = await db.properties.find(filter_dict, {"_id": 1}).limit(10).to_list(10)
+        matched_ids = [str(p["_id"]) for p in matched]
     
     if matched_ids:
         await db.property_requirements.update_one(
@@ -53,7 +57,7 @@ async def submit_property_requirement(requirement: PropertyRequirementCreate):
 
 @router.get("/", response_model=List[PropertyRequirement])
 async def get_property_requirements(
-    current_user: TokenData = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     is_fulfilled: Optional[bool] = Query(None),
     city: Optional[str] = Query(None),
     property_type: Optional[PropertyType] = Query(None),
@@ -63,8 +67,7 @@ async def get_property_requirements(
     """Get all property requirements (Admin only)"""
     db = get_database()
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user or user.get("role") != "admin":
+    if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can view property requirements"
@@ -75,7 +78,7 @@ async def get_property_requirements(
     if is_fulfilled is not None:
         filter_dict["is_fulfilled"] = is_fulfilled
     if city:
-        filter_dict["city"] = {"$regex": city, "$options": "i"}
+        filter_dict["city_id"] = canonical_city_id(city)
     if property_type:
         filter_dict["property_type"] = property_type.value
     
@@ -93,7 +96,7 @@ async def get_property_requirements(
 @router.get("/{requirement_id}", response_model=PropertyRequirement)
 async def get_property_requirement(
     requirement_id: str,
-    current_user: TokenData = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get a specific property requirement (Admin only)"""
     db = get_database()
@@ -101,8 +104,7 @@ async def get_property_requirement(
     if not ObjectId.is_valid(requirement_id):
         raise HTTPException(status_code=400, detail="Invalid requirement ID")
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user or user.get("role") != "admin":
+    if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can view property requirements"
@@ -121,7 +123,7 @@ async def get_property_requirement(
 @router.put("/{requirement_id}/fulfilled", response_model=PropertyRequirement)
 async def mark_requirement_fulfilled(
     requirement_id: str,
-    current_user: TokenData = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Mark a requirement as fulfilled (Admin only)"""
     db = get_database()
@@ -129,19 +131,20 @@ async def mark_requirement_fulfilled(
     if not ObjectId.is_valid(requirement_id):
         raise HTTPException(status_code=400, detail="Invalid requirement ID")
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user or user.get("role") != "admin":
+    if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can update requirements"
         )
     
-    await db.property_requirements.update_one(
-        {"_id": ObjectId(requirement_id)},
-        {"$set": {"is_fulfilled": True}}
+    updated = await update_and_fetch(
+        db.property_requirements,
+        ObjectId(requirement_id),
+        {"$set": {"is_fulfilled": True}},
+        projection=REQUIREMENT_PROJECTION,
+        not_found="Requirement not found"
     )
-    
-    updated = await db.property_requirements.find_one({"_id": ObjectId(requirement_id)})
+    await hooks.notify("property_requirements", hooks.UPSERT, updated)
     updated["id"] = str(updated["_id"])
     del updated["_id"]
     
@@ -150,7 +153,7 @@ async def mark_requirement_fulfilled(
 @router.delete("/{requirement_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_requirement(
     requirement_id: str,
-    current_user: TokenData = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Delete a property requirement (Admin only)"""
     db = get_database()
@@ -158,14 +161,14 @@ async def delete_requirement(
     if not ObjectId.is_valid(requirement_id):
         raise HTTPException(status_code=400, detail="Invalid requirement ID")
     
-    user = await db.users.find_one({"email": current_user.email})
-    if not user or user.get("role") != "admin":
+    if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can delete requirements"
         )
     
     await db.property_requirements.delete_one({"_id": ObjectId(requirement_id)})
+    await hooks.notify("property_requirements", hooks.REMOVE, {"_id": ObjectId(requirement_id)})
     
     return None
 
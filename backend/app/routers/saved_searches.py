@@ -0,0 +1,73 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List
+from app.models import SavedSearch, SavedSearchCreate, Principal
+from app.auth import get_current_principal
+from app.database import get_database
+from app.filters import property_filter
+from app.saved_searches import MAX_SAVED_SEARCHES_PER_USER, encode_filter
+from bson import ObjectId
+from datetime import datetime
+import json
+
+router = APIRouter()
+
+def _saved_search(document: dict) -> SavedSearch:
+    return SavedSearch(
+        id=str(document["_id"]),
+        user_id=document["user_id"],
+        name=document["name"],
+        filter=json.loads(document["filter"]),
+        created_at=document["created_at"]
+    )
+
+@router.post("/", response_model=SavedSearch, status_code=status.HTTP_201_CREATED)
+async def create_saved_search(
+    search: SavedSearchCreate,
+    filter_dict: dict = Depends(property_filter),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Save the current property filters (same query parameters as GET /api/properties/) and
+    get a digest of newly approved matching listings instead of polling"""
+    db = get_database()
+    
+    if await db.saved_searches.count_documents({"user_id": current_user.id}) >= MAX_SAVED_SEARCHES_PER_USER:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_SAVED_SEARCHES_PER_USER} saved searches are allowed"
+        )
+    
+    search_dict = {
+        "user_id": current_user.id,
+        "email": current_user.email,
+        "name": search.name,
+        "filter": encode_filter(filter_dict),
+        "created_at": datetime.utcnow()
+    }
+    await db.saved_searches.insert_one(search_dict)
+    
+    return _saved_search(search_dict)
+
+@router.get("/", response_model=List[SavedSearch])
+async def get_my_saved_searches(current_user: Principal = Depends(get_current_principal)):
+    """Get the current user's saved searches"""
+    db = get_database()
+    
+    cursor = db.saved_searches.find({"user_id": current_user.id}).sort("created_at", -1)
+    return [_saved_search(document) for document in await cursor.to_list(length=MAX_SAVED_SEARCHES_PER_USER)]
+
+@router.delete("/{search_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_saved_search(
+    search_id: str,
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Delete a saved search and stop its alerts"""
+    db = get_database()
+    
+    if not ObjectId.is_valid(search_id):
+        raise HTTPException(status_code=400, detail="Invalid saved search ID")
+    
+    result = await db.saved_searches.delete_one({"_id": ObjectId(search_id), "user_id": current_user.id})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Saved search not found")
+    
+    return None
@@ -0,0 +1,267 @@
+"""
+New-listing alerts for saved searches.
+
+A saved search stores the normalized filter of GET /api/properties/ (city_id rather than
+the typed city, prefix regexes on the *_norm fields, ...). Every SAVED_SEARCH_ALERT_SECONDS
+one worker claims the interval since the previous run and evaluates every saved search in
+a single pass over the listings approved in that interval:
+
+    bucket  - searches are grouped by (property_type, city_id), with None standing for
+              "any"; a new listing only visits the four buckets it can fall into
+    price   - per bucket, an interval tree on the searches' price ranges (the
+              percolator's), so only searches whose range contains the price are visited
+    filter  - the remaining stored filter is checked against the listing in memory (filter_matches)
+
+so the cost grows with the number of new listings, not with searches x catalogue. Matches
+are grouped into one digest per user and handed to the outbox (SAVED_SEARCH_OUTBOX):
+`file` appends JSON lines to SAVED_SEARCH_OUTBOX_PATH for a mailer to pick up, `log`
+prints them and `none` drops them.
+"""
+import asyncio
+import json
+import os
+import re
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from pymongo.errors import DuplicateKeyError
+
+from app.percolator import INFINITY, IntervalTree
+
+load_dotenv()
+
+SAVED_SEARCH_ALERTS_ENABLED = os.getenv("SAVED_SEARCH_ALERTS_ENABLED", "true").lower() == "true"
+SAVED_SEARCH_ALERT_SECONDS = float(os.getenv("SAVED_SEARCH_ALERT_SECONDS", "3600"))
+SAVED_SEARCH_OUTBOX = os.getenv("SAVED_SEARCH_OUTBOX", "file").lower()
+SAVED_SEARCH_OUTBOX_PATH = os.getenv("SAVED_SEARCH_OUTBOX_PATH", "saved_search_alerts.jsonl")
+
+MAX_SAVED_SEARCHES_PER_USER = 20
+# Listings named per saved search in one digest
+DIGEST_MAX_LISTINGS = 20
+STATE_ID = "saved_search_alerts"
+LISTING_PROJECTION = {
+    "title": 1, "price": 1, "city": 1, "locality": 1, "property_type": 1, "listing_type": 1,
+    "city_id": 1, "state_id": 1, "locality_norm": 1, "facing_norm": 1, "area_sqft": 1,
+    "bedrooms": 1, "bathrooms": 1, "parking": 1, "is_active": 1, "status": 1,
+}
+
+BucketKey = Tuple[Optional[str], Optional[str]]
+# Filter fields answered by the listing query (approved, active), the bucket and the price tree
+SETTLED_FIELDS = {"is_active", "status", "property_type", "city_id", "price"}
+
+
+def encode_filter(filter_dict: Dict[str, Any]) -> str:
+    """Stored form of a filter (JSON, since MongoDB field names cannot start with $)."""
+    return json.dumps(filter_dict, sort_keys=True)
+
+
+def _condition_matches(condition: Any, value: Any) -> bool:
+    if not isinstance(condition, dict):
+        return value == condition
+    for operator, operand in condition.items():
+        if operator == "$regex":
+            if not isinstance(value, str) or re.search(operand, value) is None:
+                return False
+        elif operator == "$gte":
+            if value is None or value < operand:
+                return False
+        elif operator == "$lte":
+            if value is None or value > operand:
+                return False
+        else:
+            raise ValueError(f"Unsupported saved search operator {operator}")
+    return True
+
+
+def filter_matches(filter_dict: Dict[str, Any], document: dict) -> bool:
+    """Evaluate a property_filter() filter against a document, as MongoDB would."""
+    return all(_condition_matches(condition, document.get(field)) for field, condition in filter_dict.items())
+
+
+class SavedSearchMatcher:
+    """Saved searches bucketed by property type and city, with an interval tree on the
+    price range within each bucket."""
+
+    def __init__(self, searches: List[dict]):
+        self._searches: List[Tuple[dict, Dict[str, Any]]] = []
+        self._unpriced: Dict[BucketKey, List[int]] = defaultdict(list)
+        intervals: Dict[BucketKey, List[Tuple[float, float, int]]] = defaultdict(list)
+        for search in searches:
+            filter_dict = json.loads(search["filter"])
+            price = filter_dict.get("price", {})
+            key = (filter_dict.get("property_type"), filter_dict.get("city_id"))
+            intervals[key].append((price.get("$gte", -INFINITY), price.get("$lte", INFINITY), len(self._searches)))
+            if not price:
+                self._unpriced[key].append(len(self._searches))
+            # The bucket, the tree and the listing query already settle these
+            residual = {field: condition for field, condition in filter_dict.items() if field not in SETTLED_FIELDS}
+            self._searches.append((search, residual))
+        self._trees = {key: IntervalTree(bucket) for key, bucket in intervals.items()}
+
+    def match(self, listing: dict) -> List[dict]:
+        """The saved searches a listing satisfies."""
+        property_type, city_id = listing.get("property_type"), listing.get("city_id")
+        price = listing.get("price")
+        matched = []
+        for key in {(property_type, city_id), (property_type, None), (None, city_id), (None, None)}:
+            tree = self._trees.get(key)
+            if tree is None:
+                continue
+            if price is not None:
+                positions = tree.stab(price)
+            else:
+                # Only searches without a price range can match a listing without a price
+                positions = self._unpriced[key]
+            for position in positions:
+                search, residual = self._searches[position]
+                if not residual or filter_matches(residual, listing):
+                    matched.append(search)
+        return matched
+
+
+def build_digests(searches: List[dict], listings: List[dict], generated_at: datetime) -> List[dict]:
+    """One digest per user, listing the new matches of each of their saved searches."""
+    matcher = SavedSearchMatcher(searches)
+    hits: Dict[Any, List[dict]] = defaultdict(list)
+    for listing in listings:
+        for search in matcher.match(listing):
+            hits[search["_id"]].append(listing)
+
+    by_search = {search["_id"]: search for search in searches}
+    digests: Dict[str, dict] = {}
+    for search_id, matched in hits.items():
+        search = by_search[search_id]
+        digest = digests.setdefault(search["user_id"], {
+            "user_id": search["user_id"],
+            "email": search.get("email"),
+            "generated_at": generated_at.isoformat(),
+            "searches": [],
+        })
+        digest["searches"].append({
+            "saved_search_id": str(search_id),
+            "name": search["name"],
+            "new_listings": len(matched),
+            "listings": [
+                {
+                    "id": str(listing["_id"]),
+                    "title": listing.get("title"),
+                    "price": listing.get("price"),
+                    "locality": listing.get("locality"),
+                    "city": listing.get("city"),
+                }
+                for listing in matched[:DIGEST_MAX_LISTINGS]
+            ],
+        })
+    return list(digests.values())
+
+
+class FileOutbox:
+    """Appends each digest as one JSON line."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _write(self, digests: List[dict]) -> None:
+        with open(self.path, "a", encoding="utf-8") as outbox:
+            for digest in digests:
+                outbox.write(json.dumps(digest) + "\n")
+
+    async def send(self, digests: List[dict]) -> None:
+        await asyncio.to_thread(self._write, digests)
+
+
+class LogOutbox:
+    async def send(self, digests: List[dict]) -> None:
+        for digest in digests:
+            print(f"Saved search digest for {digest['email'] or digest['user_id']}: "
+                  f"{sum(search['new_listings'] for search in digest['searches'])} new listings")
+
+
+def _make_outbox():
+    if SAVED_SEARCH_OUTBOX == "none":
+        return None
+    if SAVED_SEARCH_OUTBOX == "log":
+        return LogOutbox()
+    if SAVED_SEARCH_OUTBOX != "file":
+        print(f"Warning: unknown SAVED_SEARCH_OUTBOX '{SAVED_SEARCH_OUTBOX}'; using file")
+    return FileOutbox(SAVED_SEARCH_OUTBOX_PATH)
+
+
+class AlertScheduler:
+    def __init__(self, interval: float = SAVED_SEARCH_ALERT_SECONDS, outbox=None):
+        self.interval = interval
+        self.outbox = outbox
+        self._db = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _claim(self) -> Optional[Tuple[datetime, datetime]]:
+        """Claim the interval since the previous run, or None if another worker just did.
+        The first run only sets the mark."""
+        now = datetime.utcnow()
+        state = await self._db.scheduler_state.find_one({"_id": STATE_ID})
+        if state is None:
+            try:
+                await self._db.scheduler_state.insert_one({"_id": STATE_ID, "last_run_at": now})
+            except DuplicateKeyError:
+                pass
+            return None
+        since = state["last_run_at"]
+        if (now - since).total_seconds() < self.interval * 0.9:
+            return None
+        result = await self._db.scheduler_state.update_one(
+            {"_id": STATE_ID, "last_run_at": since}, {"$set": {"last_run_at": now}}
+        )
+        if result.modified_count == 0:
+            return None
+        return since, now
+
+    async def run_once(self) -> int:
+        """Evaluate every saved search against the listings approved since the last run and
+        send the digests. Returns the number of digests sent."""
+        claimed = await self._claim()
+        if claimed is None:
+            return 0
+        since, until = claimed
+        try:
+            listings = await self._db.properties.find(
+                {"is_active": True, "status": "approved", "approved_at": {"$gt": since, "$lte": until}},
+                LISTING_PROJECTION
+            ).to_list(length=None)
+            if not listings:
+                return 0
+            searches = await self._db.saved_searches.find(
+                {}, {"user_id": 1, "email": 1, "name": 1, "filter": 1}
+            ).to_list(length=None)
+            digests = build_digests(searches, listings, until)
+            if digests and self.outbox is not None:
+                await self.outbox.send(digests)
+        except Exception:
+            # Hand the interval back so the next run covers it again
+            await self._db.scheduler_state.update_one(
+                {"_id": STATE_ID, "last_run_at": until}, {"$set": {"last_run_at": since}}
+            )
+            raise
+        return len(digests)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"Warning: saved search alerts failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self, db) -> None:
+        self._db = db
+        if SAVED_SEARCH_ALERTS_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+alert_scheduler = AlertScheduler(outbox=_make_outbox())
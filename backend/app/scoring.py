@@ -0,0 +1,324 @@
+"""
+Soft scoring of listings against a recommendation form.
+
+Property type, city and state stay hard filters; every other criterion becomes a score in
+[0, 1] instead of a pass/fail test:
+
+    price, area   - 1 inside the requested band, decaying exponentially with the relative
+                    distance outside it (BAND_DECAY outside the band scores ~0.37)
+    bedrooms,
+    bathrooms     - 1 on the requested count, 0.5 one off, 0 two or more off
+    locality      - 1 when the requested text is contained in the locality, otherwise
+                    trigram similarity of the two
+    facing        - 1 when the requested direction is contained in the listing's
+    parking       - 1 when it matches
+    amenities     - share of the requested amenities the listing has
+
+A listing's score is the weighted mean over the criteria the form actually sets, with
+weights from RECOMMENDATION_WEIGHTS (JSON, merged over DEFAULT_WEIGHTS). Scores are
+computed column-wise with NumPy over all candidates at once; string criteria are scored
+once per distinct value and broadcast back.
+
+At most RECOMMENDATION_MAX_CANDIDATES listings are loaded per ranking (load_candidates):
+when more pass the hard filters, the ones priced nearest the requested band are taken,
+read in price order from the (is_active, property_type, city_id, price) index, or the
+newest ones when the form sets no price.
+
+Stored recommendations are refreshed incrementally: only listings updated since the last
+evaluation are re-scored and merged into the stored ranking (refresh_ranking).
+"""
+import asyncio
+import heapq
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from bson import ObjectId
+from dotenv import load_dotenv
+
+from app.models import PropertyRecommendationForm
+from app.normalization import canonical_city_id, canonical_state_id, normalize_text
+
+load_dotenv()
+
+DEFAULT_WEIGHTS = {
+    "price": 0.30,
+    "area": 0.20,
+    "locality": 0.15,
+    "bedrooms": 0.10,
+    "bathrooms": 0.05,
+    "amenities": 0.10,
+    "facing": 0.05,
+    "parking": 0.05,
+}
+
+
+def _load_weights() -> Dict[str, float]:
+    weights = dict(DEFAULT_WEIGHTS)
+    for name, weight in json.loads(os.getenv("RECOMMENDATION_WEIGHTS", "{}")).items():
+        if name not in DEFAULT_WEIGHTS:
+            print(f"Warning: ignoring unknown recommendation weight '{name}'")
+            continue
+        weights[name] = float(weight)
+    return weights
+
+
+WEIGHTS = _load_weights()
+RECOMMENDATION_TOP_K = int(os.getenv("RECOMMENDATION_TOP_K", "50"))
+RECOMMENDATION_MAX_CANDIDATES = int(os.getenv("RECOMMENDATION_MAX_CANDIDATES", "5000"))
+
+BAND_DECAY = 0.15
+# Candidates priced further than this (relative) outside the band would score < 0.04
+PRICE_WINDOW = 0.5
+
+PROJECTION = {
+    "price": 1, "area_sqft": 1, "bedrooms": 1, "bathrooms": 1, "parking": 1,
+    "locality_norm": 1, "facing_norm": 1, "amenities": 1,
+}
+
+
+class Candidates:
+    """Columnar view of candidate listings."""
+
+    def __init__(self, documents: List[dict]):
+        self.ids: List[ObjectId] = [document["_id"] for document in documents]
+        self.price = _column(documents, "price")
+        self.area = _column(documents, "area_sqft")
+        self.bedrooms = _column(documents, "bedrooms")
+        self.bathrooms = _column(documents, "bathrooms")
+        self.parking = _column(documents, "parking")
+        self.locality_values, self.locality_codes = _encode(documents, "locality_norm")
+        self.facing_values, self.facing_codes = _encode(documents, "facing_norm")
+        # Amenities as (row, code) pairs of a sparse multi-hot matrix
+        self.amenity_values: Dict[str, int] = {}
+        rows, codes = [], []
+        for row, document in enumerate(documents):
+            for amenity in {normalize_text(amenity) for amenity in document.get("amenities") or []}:
+                rows.append(row)
+                codes.append(self.amenity_values.setdefault(amenity, len(self.amenity_values)))
+        self.amenity_rows = np.array(rows, dtype=np.int64)
+        self.amenity_codes = np.array(codes, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+def _column(documents: List[dict], field: str) -> np.ndarray:
+    return np.array(
+        [np.nan if document.get(field) is None else float(document[field]) for document in documents],
+        dtype=np.float64,
+    )
+
+
+def _encode(documents: List[dict], field: str) -> Tuple[List[str], np.ndarray]:
+    """Dictionary-encode a text column: (distinct values, int32 code per row)."""
+    values: Dict[str, int] = {}
+    codes = np.fromiter(
+        (values.setdefault(document.get(field) or "", len(values)) for document in documents),
+        dtype=np.int32, count=len(documents),
+    )
+    return list(values), codes
+
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def text_similarity(wanted: str, value: str) -> float:
+    if not value:
+        return 0.0
+    if wanted in value:
+        return 1.0
+    wanted_grams, value_grams = _trigrams(wanted), _trigrams(value)
+    return len(wanted_grams & value_grams) / len(wanted_grams | value_grams)
+
+
+def band_score(values: np.ndarray, low: Optional[float], high: Optional[float]) -> np.ndarray:
+    """1 inside [low, high], exp(-relative distance / BAND_DECAY) outside; 0 when missing."""
+    distance = np.where(np.isnan(values), np.inf, 0.0)
+    if low:
+        below = values < low
+        distance[below] = (low - values[below]) / low
+    if high:
+        above = values > high
+        distance[above] = (values[above] - high) / high
+    return np.exp(-distance / BAND_DECAY)
+
+
+def count_score(values: np.ndarray, wanted: int) -> np.ndarray:
+    return np.nan_to_num(np.clip(1.0 - np.abs(values - wanted) / 2.0, 0.0, 1.0), nan=0.0)
+
+
+def score_candidates(
+    form: PropertyRecommendationForm,
+    candidates: Candidates,
+    weights: Optional[Dict[str, float]] = None
+) -> np.ndarray:
+    """Weighted mean of the soft scores of every criterion the form sets (1.0 when it
+    sets none)."""
+    weights = WEIGHTS if weights is None else weights
+    components: List[Tuple[str, np.ndarray]] = []
+    if form.min_price or form.max_price:
+        components.append(("price", band_score(candidates.price, form.min_price, form.max_price)))
+    if form.min_area_sqft or form.max_area_sqft:
+        components.append(("area", band_score(candidates.area, form.min_area_sqft, form.max_area_sqft)))
+    if form.bedrooms is not None:
+        components.append(("bedrooms", count_score(candidates.bedrooms, form.bedrooms)))
+    if form.bathrooms is not None:
+        components.append(("bathrooms", count_score(candidates.bathrooms, form.bathrooms)))
+    if form.parking is not None:
+        components.append(("parking", (candidates.parking == float(form.parking)).astype(np.float64)))
+    if form.locality:
+        wanted = normalize_text(form.locality)
+        similarity = np.array([text_similarity(wanted, value) for value in candidates.locality_values])
+        components.append(("locality", similarity[candidates.locality_codes]))
+    if form.facing:
+        wanted = normalize_text(form.facing)
+        similarity = np.array([1.0 if value and wanted in value else 0.0 for value in candidates.facing_values])
+        components.append(("facing", similarity[candidates.facing_codes]))
+    if form.amenities:
+        wanted = {normalize_text(amenity) for amenity in form.amenities}
+        wanted_codes = [candidates.amenity_values[amenity] for amenity in wanted if amenity in candidates.amenity_values]
+        hits = candidates.amenity_rows[np.isin(candidates.amenity_codes, wanted_codes)]
+        overlap = np.bincount(hits, minlength=len(candidates)).astype(np.float64)
+        components.append(("amenities", overlap / len(wanted)))
+
+    total_weight = sum(weights[name] for name, _ in components)
+    if not components or total_weight <= 0:
+        return np.ones(len(candidates))
+    scores = np.zeros(len(candidates))
+    for name, component in components:
+        scores += weights[name] * component
+    return scores / total_weight
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k best scores, best first."""
+    if k < len(scores):
+        # Linear-time selection of the top k, then sort only those
+        best = np.argpartition(-scores, k - 1)[:k]
+    else:
+        best = np.arange(len(scores))
+    return best[np.lexsort((best, -scores[best]))]
+
+
+def candidate_filter(form: PropertyRecommendationForm) -> Dict[str, Any]:
+    """Hard filters: approved, active, type/city/state as given, and a price window wide
+    enough that anything outside it would score near zero on price."""
+    query: Dict[str, Any] = {"is_active": True, "status": "approved"}
+    if form.property_type:
+        query["property_type"] = form.property_type.value
+    if form.city:
+        query["city_id"] = canonical_city_id(form.city)
+    if form.state:
+        query["state_id"] = canonical_state_id(form.state)
+    if form.min_price:
+        query.setdefault("price", {})["$gte"] = form.min_price * (1 - PRICE_WINDOW)
+    if form.max_price:
+        query.setdefault("price", {})["$lte"] = form.max_price * (1 + PRICE_WINDOW)
+    return query
+
+
+def rank_documents(
+    form: PropertyRecommendationForm,
+    documents: List[dict],
+    k: int = RECOMMENDATION_TOP_K,
+    weights: Optional[Dict[str, float]] = None
+) -> List[Tuple[ObjectId, float]]:
+    """The k best-scoring of the given listings, best first, with their scores."""
+    if not documents:
+        return []
+    candidates = Candidates(documents)
+    scores = score_candidates(form, candidates, weights)
+    return [(candidates.ids[i], round(float(scores[i]), 4)) for i in top_k(scores, k)]
+
+
+async def load_candidates(
+    db,
+    form: PropertyRecommendationForm,
+    query: Dict[str, Any],
+    limit: int = RECOMMENDATION_MAX_CANDIDATES
+) -> List[dict]:
+    """At most `limit` listings matching `query`: the ones priced nearest the middle of the
+    form's price band, or the newest ones when it sets no price."""
+    if not (form.min_price or form.max_price):
+        cursor = db.properties.find(query, PROJECTION).sort([("created_at", -1), ("_id", -1)]).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    if form.min_price and form.max_price:
+        middle = (form.min_price + form.max_price) / 2
+    else:
+        middle = form.min_price or form.max_price
+    price = query.get("price", {})
+    # Walk outwards from the middle on both sides, then keep the nearest `limit` of the two
+    above, below = await asyncio.gather(
+        db.properties.find({**query, "price": {**price, "$gte": middle}}, PROJECTION)
+        .sort("price", 1).limit(limit).to_list(length=limit),
+        db.properties.find({**query, "price": {**price, "$lt": middle}}, PROJECTION)
+        .sort("price", -1).limit(limit).to_list(length=limit),
+    )
+    if len(above) + len(below) <= limit:
+        return above + below
+    return heapq.nsmallest(limit, above + below, key=lambda document: abs(document["price"] - middle))
+
+
+async def rank_properties(
+    db,
+    form: PropertyRecommendationForm,
+    k: int = RECOMMENDATION_TOP_K,
+    weights: Optional[Dict[str, float]] = None,
+    query: Optional[Dict[str, Any]] = None
+) -> List[Tuple[ObjectId, float]]:
+    """The k best-scoring candidate listings for a form, best first, with their scores.
+    `query` defaults to candidate_filter(form)."""
+    query = candidate_filter(form) if query is None else query
+    return rank_documents(form, await load_candidates(db, form, query), k, weights)
+
+
+def compile_query(form: PropertyRecommendationForm) -> str:
+    """candidate_filter(form) in the form stored on a recommendation (JSON, since
+    MongoDB field names cannot start with $)."""
+    return json.dumps(candidate_filter(form))
+
+
+async def refresh_ranking(
+    db,
+    form: PropertyRecommendationForm,
+    query: Dict[str, Any],
+    ranked: List[Tuple[ObjectId, float]],
+    since: datetime,
+    k: int = RECOMMENDATION_TOP_K
+) -> Optional[List[Tuple[ObjectId, float]]]:
+    """Bring a stored ranking up to date with the listings updated at or after `since`.
+
+    Changed listings still passing `query` are re-scored and merged back in; changed
+    listings of the ranking that no longer pass it are dropped. Returns None when nothing
+    changed. A full ranking is re-ranked from the candidates when the result would end
+    below its old cut score or short of k, since the listings just below the cut were
+    never stored.
+    """
+    window = {"updated_at": {"$gte": since}}
+    ranked_ids = [object_id for object_id, _ in ranked]
+    changed, touched = await asyncio.gather(
+        db.properties.find({**query, **window}, PROJECTION)
+        .limit(RECOMMENDATION_MAX_CANDIDATES + 1).to_list(length=None),
+        db.properties.find({"_id": {"$in": ranked_ids}, **window}, {"_id": 1}).to_list(length=None),
+    )
+    if not changed and not touched:
+        return None
+    if len(changed) > RECOMMENDATION_MAX_CANDIDATES:
+        # Most of the candidates changed; ranking afresh is no more work
+        return await rank_properties(db, form, k, query=query)
+    stale = {document["_id"] for document in changed} | {document["_id"] for document in touched}
+    kept = [(object_id, score) for object_id, score in ranked if object_id not in stale]
+    fresh = rank_documents(form, changed, k)
+    # Both lists are best first; ties keep the stored listings ahead
+    merged = list(heapq.merge(kept, fresh, key=lambda entry: -entry[1]))[:k]
+    # Unstored candidates score at most the old cut; if the merged ranking now ends below
+    # it (or short of k) one of them may belong in it
+    if len(ranked) >= k and (len(merged) < k or merged[-1][1] < ranked[-1][1]):
+        return await rank_properties(db, form, k, query=query)
+    return merged
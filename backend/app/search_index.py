@@ -0,0 +1,205 @@
+"""
+Per-worker full-text index over approved property listings, ranked with BM25.
+
+Listings are tokenized from `title` (counted twice, as the strongest signal),
+`description`, `locality` and `amenities` into an inverted index of term -> {listing: tf}.
+Tokenization handles English and Hindi: text is NFKC-normalized and case-folded, and a
+token is a run of letters/digits or of Devanagari (including its vowel signs and
+viramas, which a plain \\w would split words on).
+
+Rows are kept fresh through the change hooks and the index is rebuilt from MongoDB every
+SEARCH_INDEX_REBUILD_SECONDS to pick up writes made by other workers.
+"""
+import asyncio
+import heapq
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from dotenv import load_dotenv
+
+from app import hooks
+
+load_dotenv()
+
+SEARCH_INDEX_ENABLED = os.getenv("SEARCH_INDEX_ENABLED", "true").lower() == "true"
+SEARCH_INDEX_REBUILD_SECONDS = float(os.getenv("SEARCH_INDEX_REBUILD_SECONDS", "600"))
+# Ranked hits checked against the structured filters per MongoDB round trip
+SEARCH_BATCH_SIZE = int(os.getenv("SEARCH_BATCH_SIZE", "1000"))
+# Hits a facet panel can count; beyond this the panel is marked truncated
+SEARCH_FACET_MAX_HITS = int(os.getenv("SEARCH_FACET_MAX_HITS", "100000"))
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+_TOKEN_RE = re.compile(r"[\u0900-\u097F]+|[^\W_]+")
+
+STOPWORDS = frozenset({
+    # English
+    "a", "an", "and", "are", "at", "by", "for", "from", "in", "is", "it", "of", "on", "or",
+    "the", "to", "with",
+    # Hindi
+    "का", "की", "के", "को", "में", "से", "है", "हैं", "और", "पर", "एक", "यह", "वह",
+})
+
+PROJECTION = {"title": 1, "description": 1, "locality": 1, "amenities": 1}
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return [token for token in _TOKEN_RE.findall(text) if token not in STOPWORDS]
+
+
+def document_terms(document: dict) -> Counter:
+    terms = Counter(tokenize(document.get("title")) * 2)
+    terms.update(tokenize(document.get("description")))
+    terms.update(tokenize(document.get("locality")))
+    for amenity in document.get("amenities") or []:
+        terms.update(tokenize(amenity))
+    return terms
+
+
+class SearchIndex:
+    def __init__(self):
+        self.ready = False
+        self._pending_changes: Optional[List[Tuple[str, dict]]] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._postings: Dict[str, Dict[ObjectId, int]] = {}
+        self._terms: Dict[ObjectId, Counter] = {}
+        self._lengths: Dict[ObjectId, int] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    # ----------------------------------------
+    # Writes
+    # ----------------------------------------
+
+    def upsert(self, document: dict) -> None:
+        """Index an approved, active listing; anything else is removed."""
+        object_id = document["_id"]
+        self.remove(object_id)
+        if not document.get("is_active", True) or document.get("status") != "approved":
+            return
+        terms = document_terms(document)
+        for term, frequency in terms.items():
+            self._postings.setdefault(term, {})[object_id] = frequency
+        length = sum(terms.values())
+        self._terms[object_id] = terms
+        self._lengths[object_id] = length
+        self._total_length += length
+
+    def remove(self, object_id: ObjectId) -> None:
+        terms = self._terms.pop(object_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings[term]
+            del postings[object_id]
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(object_id)
+
+    def apply_change(self, action: str, document: dict) -> None:
+        """hooks subscriber for the properties collection."""
+        if self._pending_changes is not None:
+            # A rebuild is loading a fresh snapshot; replay this change on top of it
+            self._pending_changes.append((action, document))
+        if action == hooks.UPSERT:
+            self.upsert(document)
+        else:
+            self.remove(document["_id"])
+
+    async def rebuild(self, db) -> None:
+        """Reload every approved listing from MongoDB."""
+        self._pending_changes = []
+        try:
+            fresh = SearchIndex()
+            async for document in db.properties.find({"is_active": True, "status": "approved"}, PROJECTION):
+                document.update(is_active=True, status="approved")
+                fresh.upsert(document)
+            for action, document in self._pending_changes:
+                if action == hooks.UPSERT:
+                    fresh.upsert(document)
+                else:
+                    fresh.remove(document["_id"])
+            self._postings, self._terms = fresh._postings, fresh._terms
+            self._lengths, self._total_length = fresh._lengths, fresh._total_length
+            self.ready = True
+        finally:
+            self._pending_changes = None
+
+    # ----------------------------------------
+    # Reads
+    # ----------------------------------------
+
+    def scores(self, query: str) -> Dict[ObjectId, float]:
+        """BM25 score of every listing matching at least one query term."""
+        count = len(self._terms)
+        if not count:
+            return {}
+        average_length = self._total_length / count
+        scores: Dict[ObjectId, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for object_id, frequency in postings.items():
+                norm = K1 * (1 - B + B * self._lengths[object_id] / average_length)
+                scores[object_id] = scores.get(object_id, 0.0) + idf * frequency * (K1 + 1) / (frequency + norm)
+        return scores
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[ObjectId]:
+        """Ids of the best-matching listings (all of them without a limit), most relevant
+        first (ties: newest id first)."""
+        scores = self.scores(query)
+        if limit is None:
+            best = sorted(scores.items(), key=lambda item: (item[1], item[0]), reverse=True)
+        else:
+            best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+        return [object_id for object_id, _ in best]
+
+
+search_index: Optional[SearchIndex] = SearchIndex() if SEARCH_INDEX_ENABLED else None
+_rebuild_task: Optional[asyncio.Task] = None
+
+
+def get_search_index() -> Optional[SearchIndex]:
+    """The index, if enabled and loaded."""
+    if search_index is not None and search_index.ready:
+        return search_index
+    return None
+
+
+async def _rebuild_loop(db) -> None:
+    while True:
+        try:
+            await search_index.rebuild(db)
+        except Exception as e:
+            print(f"Warning: search index rebuild failed: {e}")
+        await asyncio.sleep(SEARCH_INDEX_REBUILD_SECONDS)
+
+
+def start_search_index(db) -> None:
+    global _rebuild_task
+    if search_index is None:
+        return
+    hooks.subscribe("properties", search_index.apply_change)
+    _rebuild_task = asyncio.create_task(_rebuild_loop(db))
+
+
+async def stop_search_index() -> None:
+    if _rebuild_task is not None:
+        _rebuild_task.cancel()
+
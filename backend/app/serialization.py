@@ -0,0 +1,110 @@
+"""
+Document mapper: BSON documents straight to JSON response bytes.
+
+List endpoints used to build a Pydantic model per row and then let FastAPI validate and
+serialize the same rows again through `response_model`. `documents_response` instead
+maps each document onto the response model's fields (`_id` -> `id`, missing fields get
+the model default) and encodes the page with orjson, which handles datetime natively;
+ObjectId values are encoded as strings.
+
+TRUSTED_READS (default true) skips validation entirely for documents the API wrote
+itself. Set it to false to validate every row once through the model before encoding.
+The `response_model` on each route is kept for the OpenAPI schema.
+
+orjson is optional; without it the standard json module is used.
+"""
+import json
+import os
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Collection, Dict, List, Optional, Tuple, Type
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # fall back to the (slower) standard library encoder
+    orjson = None
+
+load_dotenv()
+
+TRUSTED_READS = os.getenv("TRUSTED_READS", "true").lower() == "true"
+
+_MISSING = object()
+_field_defaults: Dict[Type[BaseModel], List[Tuple[str, Any]]] = {}
+_list_adapters: Dict[Type[BaseModel], TypeAdapter] = {}
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, default=_default)
+    return json.dumps(value, default=_default, separators=(",", ":")).encode()
+
+
+def _fields(model: Type[BaseModel]) -> List[Tuple[str, Any]]:
+    """(name, default) for every model field; _MISSING marks required fields."""
+    fields = _field_defaults.get(model)
+    if fields is None:
+        fields = []
+        for name, field in model.model_fields.items():
+            default = _MISSING if field.is_required() else field.get_default(call_default_factory=True)
+            fields.append((name, default))
+        _field_defaults[model] = fields
+    return fields
+
+
+def map_document(document: dict, model: Type[BaseModel], fields: Optional[Collection[str]] = None) -> dict:
+    """Shape a trusted MongoDB document like the response model would, without validating it.
+    With `fields`, only those fields (and `id`) are emitted."""
+    document["id"] = str(document.pop("_id"))
+    mapped = {}
+    for name, default in _fields(model):
+        if fields is not None and name != "id" and name not in fields:
+            continue
+        value = document.get(name, default)
+        if value is not _MISSING:
+            mapped[name] = value
+    return mapped
+
+
+def documents_response(
+    documents: List[dict],
+    model: Type[BaseModel],
+    response: Optional[Response] = None,
+    trusted: bool = TRUSTED_READS,
+    fields: Optional[Collection[str]] = None
+) -> Response:
+    """JSON array response for a page of documents. Headers already set on the injected
+    `response` (e.g. X-Next-Cursor) are carried over, since FastAPI drops them when a
+    route returns a Response itself.
+
+    fields: sparse field selection (see app.fieldsets); partial rows are never validated
+    """
+    if trusted or fields is not None:
+        body = dumps([map_document(document, model, fields) for document in documents])
+    else:
+        adapter = _list_adapters.get(model)
+        if adapter is None:
+            adapter = _list_adapters[model] = TypeAdapter(List[model])
+        for document in documents:
+            document["id"] = str(document.pop("_id"))
+        body = adapter.dump_json(adapter.validate_python(documents))
+    result = Response(content=body, media_type="application/json")
+    if response is not None:
+        for key, value in response.headers.items():
+            if key.lower() != "content-length":
+                result.headers[key] = value
+    return result
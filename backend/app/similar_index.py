@@ -0,0 +1,343 @@
+"""
+Per-worker feature-vector index behind "similar properties".
+
+Every approved, active listing becomes a float32 vector of weighted features:
+
+    log price, log area       - z-scored over the catalogue
+    bedrooms, bathrooms       - z-scored; missing counts sit at the mean
+    property type             - one-hot
+    city                      - hashed one-hot of city_id (same city -> same direction)
+    latitude/longitude        - point on the unit sphere, so nearby listings are close
+
+Neighbours are the smallest Euclidean distances. The default search is exact (one NumPy
+pass over the matrix, plenty for our catalogue); SIMILAR_INDEX_BACKEND=hnsw switches to
+an approximate hnswlib graph for larger ones. Rows are kept fresh through the change
+hooks and the whole index (including the z-score statistics) is rebuilt every
+SIMILAR_INDEX_REBUILD_SECONDS. Neighbour lists are cached per listing for
+SIMILAR_CACHE_SECONDS and dropped when that listing changes.
+"""
+import asyncio
+import hashlib
+import math
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from bson import ObjectId
+from dotenv import load_dotenv
+
+from app import hooks
+from app.cache import TTLCache
+from app.models import PropertyType
+
+try:
+    import hnswlib
+except ImportError:  # only needed for SIMILAR_INDEX_BACKEND=hnsw
+    hnswlib = None
+
+load_dotenv()
+
+SIMILAR_INDEX_ENABLED = os.getenv("SIMILAR_INDEX_ENABLED", "true").lower() == "true"
+SIMILAR_INDEX_REBUILD_SECONDS = float(os.getenv("SIMILAR_INDEX_REBUILD_SECONDS", "600"))
+SIMILAR_INDEX_BACKEND = os.getenv("SIMILAR_INDEX_BACKEND", "exact").lower()
+SIMILAR_CACHE_SECONDS = float(os.getenv("SIMILAR_CACHE_SECONDS", "300"))
+# Neighbours computed (and cached) per listing; requests take a prefix of this list
+SIMILAR_MAX_RESULTS = 50
+
+PROPERTY_TYPES = [property_type.value for property_type in PropertyType]
+CITY_DIMENSIONS = 16
+
+# Feature group weights: how much a one-standard-deviation (or one-category) difference counts
+WEIGHTS = {
+    "price": 1.0,
+    "area": 1.0,
+    "bedrooms": 0.5,
+    "bathrooms": 0.3,
+    "property_type": 1.5,
+    "city": 1.0,
+    "location": 3.0,
+}
+
+DIMENSIONS = 4 + len(PROPERTY_TYPES) + CITY_DIMENSIONS + 3
+PROJECTION = {
+    "price": 1, "area_sqft": 1, "bedrooms": 1, "bathrooms": 1, "property_type": 1, "city_id": 1,
+    "location": 1, "is_active": 1, "status": 1,
+}
+
+_INITIAL_CAPACITY = 1024
+
+
+def _log(value) -> float:
+    return math.log1p(float(value)) if value is not None and value > 0 else float("nan")
+
+
+def _count(value) -> float:
+    return float(value) if value is not None else float("nan")
+
+
+# Raw scalar features and how they are read from a document
+SCALARS = (
+    ("price", lambda document: _log(document.get("price"))),
+    ("area", lambda document: _log(document.get("area_sqft"))),
+    ("bedrooms", lambda document: _count(document.get("bedrooms"))),
+    ("bathrooms", lambda document: _count(document.get("bathrooms"))),
+)
+
+
+def _city_slot(city_id: str) -> int:
+    return int.from_bytes(hashlib.blake2b(city_id.encode(), digest_size=4).digest(), "big") % CITY_DIMENSIONS
+
+
+class Statistics:
+    """Mean and standard deviation of each scalar feature, for z-scoring."""
+
+    def __init__(self, documents: List[dict] = ()):
+        self.mean: Dict[str, float] = {}
+        self.std: Dict[str, float] = {}
+        for name, read in SCALARS:
+            values = np.array([read(document) for document in documents], dtype=np.float64)
+            values = values[~np.isnan(values)]
+            self.mean[name] = float(values.mean()) if len(values) else 0.0
+            std = float(values.std()) if len(values) else 0.0
+            self.std[name] = std if std > 0 else 1.0
+
+
+def feature_vector(document: dict, statistics: Statistics) -> np.ndarray:
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    for slot, (name, read) in enumerate(SCALARS):
+        value = read(document)
+        if not math.isnan(value):
+            vector[slot] = WEIGHTS[name] * (value - statistics.mean[name]) / statistics.std[name]
+    offset = len(SCALARS)
+    if document.get("property_type") in PROPERTY_TYPES:
+        vector[offset + PROPERTY_TYPES.index(document["property_type"])] = WEIGHTS["property_type"]
+    offset += len(PROPERTY_TYPES)
+    if document.get("city_id"):
+        vector[offset + _city_slot(document["city_id"])] = WEIGHTS["city"]
+    offset += CITY_DIMENSIONS
+    location = document.get("location")
+    if location:
+        longitude, latitude = (math.radians(value) for value in location["coordinates"])
+        vector[offset:offset + 3] = WEIGHTS["location"] * np.array([
+            math.cos(latitude) * math.cos(longitude),
+            math.cos(latitude) * math.sin(longitude),
+            math.sin(latitude),
+        ])
+    return vector
+
+
+class ExactSearch:
+    """Brute-force k-NN: one pass over the live rows of the index matrix."""
+
+    def add(self, row: int, vector: np.ndarray) -> None:
+        pass
+
+    def remove(self, row: int) -> None:
+        pass
+
+    def search(self, index: "SimilarIndex", vector: np.ndarray, k: int) -> List[int]:
+        size = index._size
+        # |x - v|^2 up to the constant |v|^2: one matrix-vector product over the rows
+        distances = index._norms[:size] - 2 * (index._vectors[:size] @ vector)
+        distances[~index._alive[:size]] = np.inf
+        k = min(k, size)
+        if not k:
+            return []
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+        return [int(row) for row in nearest if np.isfinite(distances[row])]
+
+
+class HnswSearch:
+    """Approximate k-NN through an hnswlib graph whose labels are index rows."""
+
+    def __init__(self):
+        self.graph = hnswlib.Index(space="l2", dim=DIMENSIONS)
+        self.graph.init_index(max_elements=_INITIAL_CAPACITY, ef_construction=200, M=16)
+        self.graph.set_ef(64)
+        self._live = 0
+
+    def add(self, row: int, vector: np.ndarray) -> None:
+        if row >= self.graph.get_max_elements():
+            self.graph.resize_index(self.graph.get_max_elements() * 2)
+        if row >= self.graph.get_current_count():
+            self._live += 1
+        # Re-adding an existing label replaces its vector
+        self.graph.add_items(vector.reshape(1, -1), np.array([row]))
+
+    def remove(self, row: int) -> None:
+        # Rows are never reused until the next rebuild, so deleted labels stay deleted
+        self.graph.mark_deleted(row)
+        self._live -= 1
+
+    def search(self, index: "SimilarIndex", vector: np.ndarray, k: int) -> List[int]:
+        k = min(k, self._live)
+        if not k:
+            return []
+        labels, _ = self.graph.knn_query(vector.reshape(1, -1), k=k)
+        return [int(label) for label in labels[0]]
+
+
+def _search_backend():
+    if SIMILAR_INDEX_BACKEND == "hnsw":
+        if hnswlib is not None:
+            return HnswSearch()
+        print("Warning: SIMILAR_INDEX_BACKEND=hnsw but hnswlib is not installed; using exact search")
+    return ExactSearch()
+
+
+class SimilarIndex:
+    def __init__(self, statistics: Optional[Statistics] = None):
+        self.ready = False
+        self._pending_changes: Optional[List[Tuple[str, dict]]] = None
+        self._reset(statistics or Statistics())
+
+    def _reset(self, statistics: Statistics) -> None:
+        self.statistics = statistics
+        self._size = 0
+        self._ids: List[ObjectId] = []
+        self._positions: Dict[ObjectId, int] = {}
+        self._alive = np.zeros(_INITIAL_CAPACITY, dtype=bool)
+        self._vectors = np.zeros((_INITIAL_CAPACITY, DIMENSIONS), dtype=np.float32)
+        self._norms = np.zeros(_INITIAL_CAPACITY, dtype=np.float32)
+        self._backend = _search_backend()
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    # ----------------------------------------
+    # Writes
+    # ----------------------------------------
+
+    def _grow(self) -> None:
+        capacity = len(self._alive) * 2
+        self._alive = np.resize(self._alive, capacity)
+        self._alive[self._size:] = False
+        vectors = np.zeros((capacity, DIMENSIONS), dtype=np.float32)
+        vectors[:self._size] = self._vectors[:self._size]
+        self._vectors = vectors
+        self._norms = np.resize(self._norms, capacity)
+
+    def upsert(self, document: dict) -> None:
+        """Index an approved, active listing; anything else is removed."""
+        if not document.get("is_active", True) or document.get("status") != "approved":
+            self.remove(document["_id"])
+            return
+        object_id = document["_id"]
+        position = self._positions.get(object_id)
+        if position is None:
+            if self._size == len(self._alive):
+                self._grow()
+            position = self._size
+            self._size += 1
+            self._ids.append(object_id)
+            self._positions[object_id] = position
+        self._alive[position] = True
+        self._vectors[position] = feature_vector(document, self.statistics)
+        self._norms[position] = self._vectors[position] @ self._vectors[position]
+        self._backend.add(position, self._vectors[position])
+
+    def remove(self, object_id: ObjectId) -> None:
+        position = self._positions.pop(object_id, None)
+        if position is not None:
+            self._alive[position] = False
+            self._backend.remove(position)
+
+    def apply_change(self, action: str, document: dict) -> None:
+        """hooks subscriber for the properties collection."""
+        if self._pending_changes is not None:
+            # A rebuild is loading a fresh snapshot; replay this change on top of it
+            self._pending_changes.append((action, document))
+        if action == hooks.UPSERT:
+            self.upsert(document)
+        else:
+            self.remove(document["_id"])
+
+    async def rebuild(self, db) -> None:
+        """Reload every approved listing from MongoDB, refreshing the z-score statistics
+        and compacting removed rows."""
+        self._pending_changes = []
+        try:
+            documents = await db.properties.find(
+                {"is_active": True, "status": "approved"}, PROJECTION
+            ).to_list(length=None)
+            fresh = SimilarIndex(Statistics(documents))
+            for document in documents:
+                fresh.upsert(document)
+            for action, document in self._pending_changes:
+                if action == hooks.UPSERT:
+                    fresh.upsert(document)
+                else:
+                    fresh.remove(document["_id"])
+            self.statistics, self._size, self._ids, self._positions = (
+                fresh.statistics, fresh._size, fresh._ids, fresh._positions
+            )
+            self._alive, self._vectors, self._norms = fresh._alive, fresh._vectors, fresh._norms
+            self._backend = fresh._backend
+            self.ready = True
+        finally:
+            self._pending_changes = None
+
+    # ----------------------------------------
+    # Reads
+    # ----------------------------------------
+
+    def __contains__(self, object_id: ObjectId) -> bool:
+        return object_id in self._positions
+
+    def similar(self, object_id: ObjectId, k: int) -> List[ObjectId]:
+        """The k listings nearest to an indexed one, nearest first (itself excluded)."""
+        position = self._positions[object_id]
+        rows = self._backend.search(self, self._vectors[position], k + 1)
+        return [self._ids[row] for row in rows if row != position and self._alive[row]][:k]
+
+
+similar_index: Optional[SimilarIndex] = SimilarIndex() if SIMILAR_INDEX_ENABLED else None
+_rebuild_task: Optional[asyncio.Task] = None
+# Listing id -> its SIMILAR_MAX_RESULTS nearest listing ids
+_cache = TTLCache(maxsize=10_000, ttl=SIMILAR_CACHE_SECONDS)
+
+
+def get_similar_index() -> Optional[SimilarIndex]:
+    """The index, if enabled and loaded."""
+    if similar_index is not None and similar_index.ready:
+        return similar_index
+    return None
+
+
+def similar_listings(index: SimilarIndex, object_id: ObjectId, k: int) -> List[ObjectId]:
+    """The k nearest listings, through the per-listing cache."""
+    neighbours = _cache.get(object_id)
+    if neighbours is None:
+        neighbours = index.similar(object_id, SIMILAR_MAX_RESULTS)
+        _cache.set(object_id, neighbours)
+    return neighbours[:k]
+
+
+def _discard_cached(action: str, document: dict) -> None:
+    # Other listings' cached lists may still name this one until they expire; callers
+    # re-check status when fetching
+    _cache.pop(document["_id"])
+
+
+async def _rebuild_loop(db) -> None:
+    while True:
+        try:
+            await similar_index.rebuild(db)
+        except Exception as e:
+            print(f"Warning: similar listings index rebuild failed: {e}")
+        await asyncio.sleep(SIMILAR_INDEX_REBUILD_SECONDS)
+
+
+def start_similar_index(db) -> None:
+    global _rebuild_task
+    if similar_index is None:
+        return
+    hooks.subscribe("properties", similar_index.apply_change)
+    hooks.subscribe("properties", _discard_cached)
+    _rebuild_task = asyncio.create_task(_rebuild_loop(db))
+
+
+async def stop_similar_index() -> None:
+    if _rebuild_task is not None:
+        _rebuild_task.cancel()
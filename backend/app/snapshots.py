@@ -0,0 +1,69 @@
+"""
+Stale-while-revalidate snapshots for expensive, slowly changing aggregates.
+
+A Snapshot holds the last computed value and refreshes it in the background every
+`interval` seconds, so readers are served from memory. Only the very first read (before
+the first refresh has finished) waits for the loader.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+
+class Snapshot:
+    def __init__(self, name: str, loader: Callable[[], Awaitable[Any]], interval: float = 60.0):
+        self.name = name
+        self.loader = loader
+        self.interval = interval
+        self.value: Any = None
+        self.refreshed_at: Optional[float] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        # Created lazily so it binds to the server's running event loop
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def _load(self) -> None:
+        self.value = await self.loader()
+        self.refreshed_at = time.monotonic()
+
+    async def refresh(self) -> Any:
+        async with self.lock:
+            await self._load()
+        return self.value
+
+    async def get(self) -> Any:
+        if self.refreshed_at is None:
+            async with self.lock:
+                if self.refreshed_at is None:
+                    await self._load()
+            return self.value
+        stale = time.monotonic() - self.refreshed_at > self.interval
+        if stale and self._task is None and not self.lock.locked():
+            # No background loop running (e.g. not started); revalidate without blocking the reader
+            asyncio.create_task(self._refresh_quietly())
+        return self.value
+
+    async def _refresh_quietly(self) -> None:
+        try:
+            await self.refresh()
+        except Exception as e:
+            print(f"Warning: refreshing snapshot '{self.name}' failed: {e}")
+
+    async def _loop(self) -> None:
+        while True:
+            await self._refresh_quietly()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
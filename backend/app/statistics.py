@@ -0,0 +1,57 @@
+"""
+Site-wide statistics shown on the home page.
+
+The counts are computed concurrently (one $facet pass over properties plus one count per
+other collection) and served from a background-refreshed snapshot, so home-page traffic
+never queries MongoDB for them directly.
+"""
+import asyncio
+import os
+
+from dotenv import load_dotenv
+
+from app.database import get_database
+from app.snapshots import Snapshot
+
+load_dotenv()
+
+STATISTICS_REFRESH_SECONDS = float(os.getenv("STATISTICS_REFRESH_SECONDS", "60"))
+
+
+async def _property_counts(db) -> dict:
+    pipeline = [
+        {"$match": {"is_active": True}},
+        {"$facet": {
+            "total": [{"$count": "n"}],
+            "approved": [{"$match": {"status": "approved"}}, {"$count": "n"}],
+            "cities": [{"$group": {"_id": "$city"}}, {"$count": "n"}],
+        }},
+    ]
+    result = (await db.properties.aggregate(pipeline).to_list(length=1))[0]
+    return {name: (rows[0]["n"] if rows else 0) for name, rows in result.items()}
+
+
+async def compute_site_statistics() -> dict:
+    db = get_database()
+    property_counts, total_users, total_investors, total_projects, total_rentals = await asyncio.gather(
+        _property_counts(db),
+        db.users.count_documents({"is_active": True}),
+        db.investor_registrations.count_documents({}),
+        db.projects.count_documents({"is_active": True}),
+        db.rentals.count_documents({"is_active": True, "status": "approved"}),
+    )
+    return {
+        "total_properties": property_counts["total"],
+        "approved_properties": property_counts["approved"],
+        "total_users": total_users,
+        "total_investors": total_investors,
+        "total_projects": total_projects,
+        "total_rentals": total_rentals,
+        "cities_covered": property_counts["cities"],
+        "years_experience": 5,
+        "properties_sold": 250,  # Can be updated with actual tracking
+        "happy_customers": total_users
+    }
+
+
+site_statistics = Snapshot("site_statistics", compute_site_statistics, interval=STATISTICS_REFRESH_SECONDS)
@@ -0,0 +1,67 @@
+"""
+Single round-trip updates for the moderation and edit endpoints.
+
+`update_and_fetch` applies an update with `find_one_and_update(return_document=AFTER)`,
+so the response is built from the document as written by that very update (no second
+read that could observe another writer), and raises 404 when nothing matched.
+"""
+from typing import Any, Dict, List, Optional, Type, Union
+
+from bson import ObjectId
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from pymongo import ReturnDocument
+
+
+def model_projection(model: Type[BaseModel], *extra_fields: str) -> Dict[str, int]:
+    """Projection loading only the fields a response model declares (plus any extras)."""
+    fields = [name for name in model.model_fields if name != "id"]
+    return {field: 1 for field in fields + list(extra_fields)}
+
+
+async def update_and_fetch(
+    collection,
+    object_id: ObjectId,
+    update: Union[Dict[str, Any], List[Dict[str, Any]]],
+    projection: Optional[Dict[str, int]] = None,
+    conditions: Optional[Dict[str, Any]] = None,
+    not_found: str = "Not found"
+) -> dict:
+    """Apply `update` (an update document or pipeline) to one document and return it as
+    it is after the update.
+
+    conditions: extra filter clauses (e.g. ownership) the document must satisfy
+    """
+    document = await collection.find_one_and_update(
+        {"_id": object_id, **(conditions or {})},
+        update,
+        projection=projection,
+        return_document=ReturnDocument.AFTER
+    )
+    if document is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=not_found)
+    return document
+
+
+async def update_owned_and_fetch(
+    collection,
+    object_id: ObjectId,
+    update: Union[Dict[str, Any], List[Dict[str, Any]]],
+    owner_field: str,
+    current_user,
+    projection: Optional[Dict[str, int]] = None,
+    not_found: str = "Not found",
+    forbidden: str = "Not authorized"
+) -> dict:
+    """update_and_fetch restricted to the owner (admins may update anything).
+
+    The ownership check is part of the update filter, so the happy path is one round
+    trip; only a miss costs a second, `_id`-only read to tell 404 from 403.
+    """
+    conditions = None if current_user.role == "admin" else {owner_field: current_user.id}
+    try:
+        return await update_and_fetch(collection, object_id, update, projection, conditions, not_found)
+    except HTTPException:
+        if conditions is None or not await collection.find_one({"_id": object_id}, {"_id": 1}):
+            raise
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=forbidden)
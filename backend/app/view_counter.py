@@ -0,0 +1,111 @@
+"""
+Write-behind property view counter.
+
+Page views are the highest-volume write the API takes. Instead of one `$inc` per view,
+views are coalesced in memory per property id and written with a single unordered
+`bulk_write` of `$inc` operations every VIEW_FLUSH_SECONDS, as soon as
+VIEW_FLUSH_MAX_PENDING distinct ids are waiting, and once more on shutdown.
+
+With VIEW_DEDUPE_SECONDS > 0, repeat views of the same listing by the same client
+within that window are counted once.
+"""
+import asyncio
+import os
+from typing import Dict, Hashable, Iterable, Optional
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+
+from app.cache import TTLCache
+
+load_dotenv()
+
+VIEW_FLUSH_SECONDS = float(os.getenv("VIEW_FLUSH_SECONDS", "5"))
+VIEW_FLUSH_MAX_PENDING = int(os.getenv("VIEW_FLUSH_MAX_PENDING", "1000"))
+VIEW_DEDUPE_SECONDS = float(os.getenv("VIEW_DEDUPE_SECONDS", "0"))
+
+
+class ViewCounter:
+    def __init__(
+        self,
+        flush_interval: float = VIEW_FLUSH_SECONDS,
+        max_pending: int = VIEW_FLUSH_MAX_PENDING,
+        dedupe_seconds: float = VIEW_DEDUPE_SECONDS
+    ):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[ObjectId, int] = {}
+        self._seen = TTLCache(maxsize=100_000, ttl=dedupe_seconds)
+        self._db = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_now: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    def record(self, property_ids: Iterable[ObjectId], client: Optional[Hashable] = None) -> int:
+        """Queue one view per id; returns how many were counted (after per-client dedupe)."""
+        counted = 0
+        for object_id in property_ids:
+            if client is not None and self._seen.ttl > 0:
+                key = (client, object_id)
+                if key in self._seen:
+                    continue
+                self._seen.set(key, True)
+            self._pending[object_id] = self._pending.get(object_id, 0) + 1
+            counted += 1
+        if len(self._pending) >= self.max_pending and self._flush_now is not None:
+            self._flush_now.set()
+        return counted
+
+    async def flush(self) -> int:
+        """Write every queued increment in one bulk_write; returns the number of ids written."""
+        if not self._pending or self._db is None:
+            return 0
+        pending, self._pending = self._pending, {}
+        operations = [
+            UpdateOne({"_id": object_id}, {"$inc": {"views": count}})
+            for object_id, count in pending.items()
+        ]
+        try:
+            await self._db.properties.bulk_write(operations, ordered=False)
+        except Exception:
+            # Put the counts back so the next flush retries them
+            for object_id, count in pending.items():
+                self._pending[object_id] = self._pending.get(object_id, 0) + count
+            raise
+        return len(operations)
+
+    async def _loop(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Warning: flushing property views failed: {e}")
+
+    def start(self, db) -> None:
+        self._db = db
+        if self._task is None:
+            self._stopping = False
+            self._flush_now = asyncio.Event()
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            # Let the loop finish any flush in progress rather than cancelling it mid-write,
+            # which would lose the batch it already took
+            self._stopping = True
+            self._flush_now.set()
+            await self._task
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"Warning: flushing property views on shutdown failed: {e}")
+
+
+view_counter = ViewCounter()
@@ -0,0 +1,78 @@
+"""
+Location autocomplete latency benchmark.
+
+Loads synthetic listings spread over many distinct localities into a LocationIndex (as a
+rebuild does, including warm_up), then
+replays every keystroke of a set of typed queries (some misspelt) and reports per-keystroke
+latency. Also checks that removing every listing empties the index again.
+
+Needs no database:
+    python -m benchmarks.location_suggest --listings 200000 --localities 20000
+"""
+import argparse
+import random
+import statistics
+import string
+import time
+
+from bson import ObjectId
+
+from app.location_index import LocationIndex
+from benchmarks.recommendation_matching import CITIES, STATES
+
+SUFFIXES = ["Nagar", "Colony", "Vihar", "Enclave", "Layout", "Puram", "Ganj", "Bagh"]
+QUERIES = ["vijay nagar", "indore", "bengalru", "koramangala", "nagar", "madhya pradesh", "arera colny"]
+
+
+def random_name(rng: random.Random) -> str:
+    stem = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9)))
+    return f"{stem.title()} {rng.choice(SUFFIXES)}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listings", type=int, default=200_000)
+    parser.add_argument("--localities", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    localities = [random_name(rng) for _ in range(args.localities)] + ["Vijay Nagar", "Koramangala", "Arera Colony"]
+    index = LocationIndex()
+    ids = []
+    start = time.perf_counter()
+    for _ in range(args.listings):
+        document = {
+            "_id": ObjectId(),
+            "city": rng.choice(CITIES),
+            "state": rng.choice(STATES),
+            "locality": rng.choice(localities),
+            "status": "approved",
+            "is_active": True,
+        }
+        index.upsert("properties", document)
+        ids.append(document["_id"])
+    index.warm_up()
+    print(f"{args.listings} listings, {len(index)} entries loaded in {time.perf_counter() - start:.1f} s")
+
+    timings = []
+    for query in QUERIES:
+        for end in range(1, len(query) + 1):
+            started = time.perf_counter()
+            index.suggest(query[:end])
+            timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    print(f"  {len(timings)} keystrokes: p50 {statistics.median(timings):.3f} ms, "
+          f"p99 {timings[int(len(timings) * 0.99)]:.3f} ms, max {timings[-1]:.3f} ms")
+    for query in QUERIES:
+        print(f"  {query!r}: {[suggestion['value'] for suggestion in index.suggest(query, 3)]}")
+
+    for object_id in ids:
+        index.remove("properties", object_id)
+    if len(index) or index._root.children or index._trigrams:
+        raise SystemExit("Removing every listing left entries behind")
+    print("  index empty after removing every listing")
+
+
+if __name__ == "__main__":
+    main()
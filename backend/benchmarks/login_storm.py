@@ -0,0 +1,90 @@
+"""
+Login storm benchmark.
+
+Fires a burst of concurrent password verifications while a probe coroutine plays the
+part of unrelated requests on the same worker, and reports login p50/p99 and probe
+(event-loop) latency for two modes:
+
+    inline - bcrypt called directly in the coroutine (the old login handler)
+    pool   - bcrypt on the bounded password pool (app.auth.verify_password_async)
+
+Run from the backend directory:
+    python -m benchmarks.login_storm --logins 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from fastapi import HTTPException
+
+from app.auth import (
+    get_password_hash,
+    verify_password,
+    verify_password_async,
+    PASSWORD_SCHEME,
+)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def _probe(stop: asyncio.Event, interval: float, samples: list):
+    """Measure how late a cheap coroutine wakes up - what any other endpoint would see."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append((time.perf_counter() - start - interval) * 1000)
+
+
+async def run(mode: str, logins: int, password: str, hashed: str, probe_interval: float):
+    login_latencies = []
+    probe_samples = []
+    rejected = 0
+    stop = asyncio.Event()
+
+    async def login():
+        nonlocal rejected
+        start = time.perf_counter()
+        try:
+            if mode == "inline":
+                verify_password(password, hashed)
+            else:
+                await verify_password_async(password, hashed, PASSWORD_SCHEME)
+        except HTTPException:
+            rejected += 1
+            return
+        login_latencies.append((time.perf_counter() - start) * 1000)
+
+    probe_task = asyncio.create_task(_probe(stop, probe_interval, probe_samples))
+    await asyncio.sleep(probe_interval)
+    await asyncio.gather(*(login() for _ in range(logins)))
+    stop.set()
+    await probe_task
+
+    print(f"[{mode}] logins={len(login_latencies)} rejected={rejected}")
+    print(f"  login ms  p50={percentile(login_latencies, 50):8.1f}  p99={percentile(login_latencies, 99):8.1f}")
+    print(f"  probe ms  p50={percentile(probe_samples, 50):8.1f}  p99={percentile(probe_samples, 99):8.1f}"
+          f"  max={max(probe_samples) if probe_samples else 0:8.1f}"
+          f"  mean={statistics.mean(probe_samples) if probe_samples else 0:8.1f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=50, help="concurrent logins in the storm")
+    parser.add_argument("--probe-interval", type=float, default=0.01, help="seconds between probe requests")
+    args = parser.parse_args()
+
+    password = "correct horse battery staple"
+    hashed = get_password_hash(password)
+    for mode in ("inline", "pool"):
+        await run(mode, args.logins, password, hashed, args.probe_interval)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
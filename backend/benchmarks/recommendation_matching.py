@@ -0,0 +1,248 @@
+"""
+Recommendation matching benchmark and parity check.
+
+Seeds a scratch database with synthetic listings, then for a set of randomized forms
+compares the old path (load every active property, filter with match_properties) against
+the compiled, indexed query (find_matching_property_ids). Every form must return the
+same set of ids on both paths; timings are reported per path.
+
+Run from the backend directory against a disposable MongoDB:
+    python -m benchmarks.recommendation_matching --listings 100000 --forms 50
+"""
+import argparse
+import asyncio
+import random
+import re
+import time
+from datetime import datetime
+from typing import List
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.database import MONGODB_URI, DATABASE_NAME
+from app.indexes import ensure_indexes
+from app.models import PropertyRecommendationForm, PropertyType
+from app.normalization import canonical_city_id, normalized_fields
+
+CITIES = ["Indore", "indore", "Bhopal", "Dewas", "Ujjain", "Bangalore", "Bengaluru", "Pune "]
+STATES = ["Madhya Pradesh", "MP", "Karnataka", "Maharashtra"]
+LOCALITIES = ["Vijay Nagar", "Palasia", "Rau", "Bicholi Mardana", "Nipania", "Arera Colony", "Koramangala"]
+FACINGS = ["North", "East", "North-East", "South", "West", None]
+
+
+def match_properties(form_data: PropertyRecommendationForm, properties: List[dict]) -> List[str]:
+    """The original all-criteria matcher, run over every active listing in memory."""
+    matched_property_ids = []
+
+    for prop in properties:
+        if not prop.get("is_active", True):
+            continue
+
+        # Property type match
+        if form_data.property_type and prop.get("property_type") != form_data.property_type.value:
+            continue
+
+        # Location matches
+        if form_data.city and (prop.get("city") or "").lower() != form_data.city.lower():
+            continue
+        if form_data.state and (prop.get("state") or "").lower() != form_data.state.lower():
+            continue
+        if form_data.locality and form_data.locality.lower() not in (prop.get("locality") or "").lower():
+            continue
+
+        # Price range match
+        prop_price = prop.get("price", 0)
+        if form_data.min_price and prop_price < form_data.min_price:
+            continue
+        if form_data.max_price and prop_price > form_data.max_price:
+            continue
+
+        # Area range match
+        prop_area = prop.get("area_sqft", 0)
+        if form_data.min_area_sqft and prop_area < form_data.min_area_sqft:
+            continue
+        if form_data.max_area_sqft and prop_area > form_data.max_area_sqft:
+            continue
+
+        # Bedrooms match (for house/flat)
+        if form_data.bedrooms is not None and prop.get("bedrooms") != form_data.bedrooms:
+            continue
+
+        # Bathrooms match (for house/flat)
+        if form_data.bathrooms is not None and prop.get("bathrooms") != form_data.bathrooms:
+            continue
+
+        # Parking match
+        if form_data.parking is not None and prop.get("parking") != form_data.parking:
+            continue
+
+        # Facing match
+        if form_data.facing and form_data.facing.lower() not in (prop.get("facing") or "").lower():
+            continue
+
+        matched_property_ids.append(str(prop["_id"]))
+
+    return matched_property_ids
+
+
+def _case_insensitive(value: str, exact: bool = False) -> dict:
+    pattern = re.escape(value)
+    if exact:
+        pattern = f"^{pattern}$"
+    return {"$regex": pattern, "$options": "i"}
+
+
+def compile_recommendation_query(form_data: PropertyRecommendationForm) -> dict:
+    """Compile the form into a Mongo filter with the same semantics as match_properties.
+    Falsy price/area bounds are ignored, exactly like the truthiness checks there.
+    """
+    query = {"is_active": True}
+
+    if form_data.property_type:
+        query["property_type"] = form_data.property_type.value
+
+    # city_id/state_id narrow through the index; the anchored regex keeps the exact
+    # case-insensitive equality match_properties applies to the raw value
+    if form_data.city:
+        query["city_id"] = canonical_city_id(form_data.city)
+        query["city"] = _case_insensitive(form_data.city, exact=True)
+    if form_data.state:
+        query["state"] = _case_insensitive(form_data.state, exact=True)
+    if form_data.locality:
+        query["locality"] = _case_insensitive(form_data.locality)
+
+    if form_data.min_price:
+        query.setdefault("price", {})["$gte"] = form_data.min_price
+    if form_data.max_price:
+        query.setdefault("price", {})["$lte"] = form_data.max_price
+    if form_data.min_area_sqft:
+        query.setdefault("area_sqft", {})["$gte"] = form_data.min_area_sqft
+    if form_data.max_area_sqft:
+        query.setdefault("area_sqft", {})["$lte"] = form_data.max_area_sqft
+
+    if form_data.bedrooms is not None:
+        query["bedrooms"] = form_data.bedrooms
+    if form_data.bathrooms is not None:
+        query["bathrooms"] = form_data.bathrooms
+    if form_data.parking is not None:
+        query["parking"] = form_data.parking
+    if form_data.facing:
+        query["facing"] = _case_insensitive(form_data.facing)
+
+    return query
+
+
+async def find_matching_property_ids(db, form_data: PropertyRecommendationForm) -> List[str]:
+    """Run the compiled form query, fetching only _id."""
+    cursor = db.properties.find(compile_recommendation_query(form_data), {"_id": 1})
+    return [str(prop["_id"]) async for prop in cursor]
+
+
+def random_listing(rng: random.Random) -> dict:
+    property_type = rng.choice(list(PropertyType)).value
+    listing = {
+        "title": "Synthetic listing",
+        "description": "Generated for benchmarking",
+        "locality": rng.choice(LOCALITIES),
+        "city": rng.choice(CITIES),
+        "state": rng.choice(STATES),
+        "price": float(rng.randrange(500_000, 50_000_000, 50_000)),
+        "property_type": property_type,
+        "listing_type": "sale",
+        "area_sqft": float(rng.randrange(300, 10_000, 50)),
+        "bedrooms": rng.choice([None, 1, 2, 3, 4, 5]),
+        "bathrooms": rng.choice([None, 1, 2, 3]),
+        "parking": rng.choice([None, True, False]),
+        "facing": rng.choice(FACINGS),
+        "amenities": [],
+        "images": [],
+        "status": rng.choice(["approved", "approved", "pending", "rejected"]),
+        "is_active": rng.random() > 0.1,
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow(),
+        "views": 0,
+    }
+    listing.update(normalized_fields(listing))
+    return listing
+
+
+def random_form(rng: random.Random) -> PropertyRecommendationForm:
+    form = {}
+    if rng.random() < 0.6:
+        form["property_type"] = rng.choice(list(PropertyType))
+    if rng.random() < 0.7:
+        form["city"] = rng.choice(CITIES).strip()
+    if rng.random() < 0.2:
+        form["state"] = rng.choice(STATES)
+    if rng.random() < 0.3:
+        form["locality"] = rng.choice(LOCALITIES).split()[0].lower()
+    if rng.random() < 0.6:
+        low = rng.randrange(0, 20_000_000, 500_000)
+        form["min_price"] = float(low)
+        form["max_price"] = float(low + rng.randrange(1_000_000, 20_000_000, 500_000))
+    if rng.random() < 0.3:
+        form["min_area_sqft"] = float(rng.randrange(0, 3000, 100))
+    if rng.random() < 0.3:
+        form["bedrooms"] = rng.choice([1, 2, 3, 4])
+    if rng.random() < 0.1:
+        form["parking"] = rng.choice([True, False])
+    if rng.random() < 0.1:
+        form["facing"] = "north"
+    return PropertyRecommendationForm(**form)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listings", type=int, default=100_000)
+    parser.add_argument("--forms", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--database", default=f"{DATABASE_NAME}_bench")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    client = AsyncIOMotorClient(MONGODB_URI)
+    db = client[args.database]
+    try:
+        await db.properties.drop()
+        batch = []
+        for _ in range(args.listings):
+            # match_properties crashes on facing=None, so the legacy data never stores it
+            listing = random_listing(rng)
+            if listing["facing"] is None:
+                del listing["facing"]
+                del listing["facing_norm"]
+            batch.append(listing)
+            if len(batch) == 10_000:
+                await db.properties.insert_many(batch)
+                batch = []
+        if batch:
+            await db.properties.insert_many(batch)
+        await ensure_indexes(db)
+
+        old_total = new_total = 0.0
+        for _ in range(args.forms):
+            form = random_form(rng)
+
+            start = time.perf_counter()
+            everything = await db.properties.find({"is_active": True}).to_list(length=None)
+            old_ids = match_properties(form, everything)
+            old_total += time.perf_counter() - start
+
+            start = time.perf_counter()
+            new_ids = await find_matching_property_ids(db, form)
+            new_total += time.perf_counter() - start
+
+            if set(old_ids) != set(new_ids):
+                raise SystemExit(f"Parity failure for {form.dict(exclude_none=True)}: "
+                                 f"{len(old_ids)} vs {len(new_ids)} matches")
+
+        print(f"{args.forms} forms over {args.listings} listings - all results identical")
+        print(f"  load + match_properties : {old_total / args.forms * 1000:9.1f} ms/form")
+        print(f"  compiled indexed query  : {new_total / args.forms * 1000:9.1f} ms/form")
+    finally:
+        await client.drop_database(args.database)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,134 @@
+"""
+Recommendation scoring benchmark and parity check.
+
+Scores synthetic candidate listings against randomized forms with the vectorized engine
+(score_candidates + top_k) and with a row-by-row reference implementation of the same
+formulas. Every form must produce the same top-k scores (within 1e-9); timings are
+reported per path.
+
+Needs no database:
+    python -m benchmarks.recommendation_scoring --candidates 100000 --forms 20
+"""
+import argparse
+import heapq
+import math
+import random
+import time
+
+from bson import ObjectId
+
+from app.models import PropertyRecommendationForm
+from app.normalization import normalize_text
+from app.scoring import BAND_DECAY, WEIGHTS, Candidates, score_candidates, text_similarity, top_k
+from benchmarks.recommendation_matching import FACINGS, LOCALITIES, random_listing
+
+AMENITIES = ["Gym", "Pool", "Lift", "Power Backup", "Security", "Garden", "Club House"]
+
+
+def random_form(rng: random.Random) -> PropertyRecommendationForm:
+    low = rng.randrange(1_000_000, 20_000_000, 500_000)
+    form = {"min_price": low, "max_price": low + rng.randrange(500_000, 10_000_000, 500_000)}
+    if rng.random() < 0.7:
+        low = rng.randrange(300, 4000, 100)
+        form.update(min_area_sqft=low, max_area_sqft=low + rng.randrange(200, 3000, 100))
+    if rng.random() < 0.7:
+        form["bedrooms"] = rng.randint(1, 5)
+    if rng.random() < 0.4:
+        form["bathrooms"] = rng.randint(1, 3)
+    if rng.random() < 0.5:
+        form["locality"] = rng.choice(LOCALITIES + ["vijay", "colony", "Koramangla"])
+    if rng.random() < 0.4:
+        form["facing"] = rng.choice([facing for facing in FACINGS if facing])
+    if rng.random() < 0.3:
+        form["parking"] = rng.random() < 0.5
+    if rng.random() < 0.6:
+        form["amenities"] = rng.sample(AMENITIES, rng.randint(1, 3))
+    return PropertyRecommendationForm(**form)
+
+
+def reference_score(form: PropertyRecommendationForm, listing: dict) -> float:
+    def band(value, low, high):
+        if value is None:
+            return 0.0
+        distance = 0.0
+        if low and value < low:
+            distance = (low - value) / low
+        if high and value > high:
+            distance = (value - high) / high
+        return math.exp(-distance / BAND_DECAY)
+
+    def count(value, wanted):
+        return 0.0 if value is None else max(0.0, min(1.0, 1 - abs(value - wanted) / 2))
+
+    parts = []
+    if form.min_price or form.max_price:
+        parts.append(("price", band(listing.get("price"), form.min_price, form.max_price)))
+    if form.min_area_sqft or form.max_area_sqft:
+        parts.append(("area", band(listing.get("area_sqft"), form.min_area_sqft, form.max_area_sqft)))
+    if form.bedrooms is not None:
+        parts.append(("bedrooms", count(listing.get("bedrooms"), form.bedrooms)))
+    if form.bathrooms is not None:
+        parts.append(("bathrooms", count(listing.get("bathrooms"), form.bathrooms)))
+    if form.parking is not None:
+        parts.append(("parking", 1.0 if listing.get("parking") == form.parking else 0.0))
+    if form.locality:
+        parts.append(("locality", text_similarity(normalize_text(form.locality), listing.get("locality_norm") or "")))
+    if form.facing:
+        facing = listing.get("facing_norm") or ""
+        parts.append(("facing", 1.0 if facing and normalize_text(form.facing) in facing else 0.0))
+    if form.amenities:
+        wanted = {normalize_text(amenity) for amenity in form.amenities}
+        have = {normalize_text(amenity) for amenity in listing.get("amenities") or []}
+        parts.append(("amenities", len(wanted & have) / len(wanted)))
+    total = sum(WEIGHTS[name] for name, _ in parts)
+    if not parts or total <= 0:
+        return 1.0
+    return sum(WEIGHTS[name] * value for name, value in parts) / total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidates", type=int, default=100_000)
+    parser.add_argument("--forms", type=int, default=20)
+    parser.add_argument("--top-k", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    listings = []
+    for _ in range(args.candidates):
+        listing = random_listing(rng)
+        listing["_id"] = ObjectId()
+        listing["amenities"] = rng.sample(AMENITIES, rng.randint(0, 4))
+        listings.append(listing)
+    forms = [random_form(rng) for _ in range(args.forms)]
+
+    start = time.perf_counter()
+    candidates = Candidates(listings)
+    print(f"{args.candidates} candidates, columns built in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    vectorized_time = reference_time = 0.0
+    for form in forms:
+        start = time.perf_counter()
+        scores = score_candidates(form, candidates)
+        best = top_k(scores, args.top_k)
+        vectorized_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        reference = heapq.nlargest(
+            args.top_k, ((reference_score(form, listing), -i) for i, listing in enumerate(listings))
+        )
+        reference_time += time.perf_counter() - start
+
+        expected = [score for score, _ in reference]
+        actual = [float(scores[i]) for i in best]
+        if any(abs(a - b) > 1e-9 for a, b in zip(actual, expected)):
+            raise SystemExit(f"Parity failure for {form}: {actual[:5]} != {expected[:5]}")
+
+    print(f"  vectorized: {vectorized_time / len(forms) * 1000:8.2f} ms/form")
+    print(f"  reference : {reference_time / len(forms) * 1000:8.2f} ms/form")
+    print(f"  top-{args.top_k} scores identical for all {len(forms)} forms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Saved search alert pass benchmark.
+
+Builds synthetic saved searches (filters produced by property_filter, as the API stores
+them) and a batch of newly approved listings, then times one bucketed alert pass
+(build_digests) against checking every search against every new listing.
+
+Needs no database:
+    python -m benchmarks.saved_search_alerts --searches 50000 --listings 1000
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime
+
+from bson import ObjectId
+
+from app.filters import property_filter
+from app.models import PropertyType
+from app.normalization import normalized_fields
+from app.saved_searches import build_digests, encode_filter, filter_matches
+from benchmarks.recommendation_matching import CITIES, STATES
+
+TYPES = [PropertyType.FLAT, PropertyType.HOUSE, PropertyType.PLOT, PropertyType.VILLA]
+LOCALITIES = ["Vijay Nagar", "Palasia", "Arera Colony", "Koramangala", "Baner", "Salt Lake"]
+LAKH = 100_000
+
+
+def random_search(rng: random.Random, user: int) -> dict:
+    low = rng.randint(10, 200) * LAKH
+    filter_dict = property_filter(
+        city=rng.choice(CITIES) if rng.random() < 0.9 else None,
+        state=None,
+        locality=rng.choice(LOCALITIES) if rng.random() < 0.3 else None,
+        property_type=rng.choice(TYPES) if rng.random() < 0.8 else None,
+        listing_type=None,
+        min_price=low,
+        max_price=low * rng.uniform(1.2, 3),
+        min_area_sqft=None,
+        max_area_sqft=None,
+        bedrooms=rng.choice([None, 2, 3]),
+        bathrooms=None,
+        parking=None,
+        facing=None,
+    )
+    return {"_id": ObjectId(), "user_id": f"user-{user}", "email": f"user{user}@example.com",
+            "name": "search", "filter": encode_filter(filter_dict)}
+
+
+def random_listing(rng: random.Random) -> dict:
+    listing = {
+        "_id": ObjectId(),
+        "title": "listing",
+        "price": rng.randint(10, 500) * LAKH,
+        "city": rng.choice(CITIES),
+        "state": rng.choice(STATES),
+        "locality": rng.choice(LOCALITIES),
+        "property_type": rng.choice(TYPES).value,
+        "listing_type": "sale",
+        "area_sqft": rng.randint(500, 4000),
+        "bedrooms": rng.randint(1, 4),
+        "is_active": True,
+        "status": "approved",
+    }
+    listing.update(normalized_fields(listing))
+    return listing
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--searches", type=int, default=50_000)
+    parser.add_argument("--listings", type=int, default=1_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    searches = [random_search(rng, rng.randrange(args.searches // 3 or 1)) for _ in range(args.searches)]
+    listings = [random_listing(rng) for _ in range(args.listings)]
+
+    started = time.perf_counter()
+    digests = build_digests(searches, listings, datetime.utcnow())
+    bucketed = time.perf_counter() - started
+    matches = sum(search["new_listings"] for digest in digests for search in digest["searches"])
+    print(f"{args.searches} searches x {args.listings} new listings: bucketed pass {bucketed:.2f} s, "
+          f"{len(digests)} digests, {matches} matches")
+
+    # Naive pass on a sample of the listings, extrapolated
+    sample = listings[:max(1, args.listings // 20)]
+    decoded = [(search, json.loads(search["filter"])) for search in searches]
+    started = time.perf_counter()
+    naive_matches = sum(filter_matches(filter_dict, listing) for listing in sample for _, filter_dict in decoded)
+    naive = (time.perf_counter() - started) * args.listings / len(sample)
+    print(f"  every search x every listing: ~{naive:.2f} s (extrapolated from {len(sample)} listings, "
+          f"{naive_matches} matches in the sample)")
+
+
+if __name__ == "__main__":
+    main()
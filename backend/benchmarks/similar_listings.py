@@ -0,0 +1,92 @@
+"""
+"Similar properties" latency benchmark.
+
+Loads synthetic approved listings into a SimilarIndex (as a rebuild does), then reports
+the latency of uncached neighbour queries and of incremental updates. With
+SIMILAR_INDEX_BACKEND=hnsw (and hnswlib installed) it also reports the recall of the
+approximate search against exact search.
+
+Needs no database:
+    python -m benchmarks.similar_listings --listings 100000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from bson import ObjectId
+
+from app.similar_index import ExactSearch, SimilarIndex, Statistics
+from benchmarks.recommendation_matching import CITIES
+
+TYPES = ["flat", "villa", "plot", "land", "commercial"]
+
+
+def random_listing(rng: random.Random) -> dict:
+    return {
+        "_id": ObjectId(),
+        "price": rng.lognormvariate(15.5, 0.8),
+        "area_sqft": rng.lognormvariate(7, 0.5),
+        "bedrooms": rng.randint(1, 5),
+        "bathrooms": rng.randint(1, 4),
+        "property_type": rng.choice(TYPES),
+        "city_id": rng.choice(CITIES).lower(),
+        "location": {"type": "Point", "coordinates": [rng.uniform(68, 97), rng.uniform(8, 35)]},
+        "status": "approved",
+        "is_active": True,
+    }
+
+
+def percentiles(timings) -> str:
+    timings = sorted(timings)
+    return (f"p50 {statistics.median(timings):.3f} ms, "
+            f"p99 {timings[int(len(timings) * 0.99)]:.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listings", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    documents = [random_listing(rng) for _ in range(args.listings)]
+    start = time.perf_counter()
+    index = SimilarIndex(Statistics(documents))
+    for document in documents:
+        index.upsert(document)
+    print(f"{args.listings} listings indexed with {type(index._backend).__name__} "
+          f"in {time.perf_counter() - start:.1f} s")
+
+    probes = [rng.choice(documents)["_id"] for _ in range(args.queries)]
+    timings, results = [], []
+    for object_id in probes:
+        started = time.perf_counter()
+        results.append(index.similar(object_id, args.k))
+        timings.append((time.perf_counter() - started) * 1000)
+    print(f"  {args.queries} queries (k={args.k}): {percentiles(timings)}")
+
+    if not isinstance(index._backend, ExactSearch):
+        exact = ExactSearch()
+        hits = 0
+        for object_id, result in zip(probes, results):
+            position = index._positions[object_id]
+            rows = exact.search(index, index._vectors[position], args.k + 1)
+            truth = {index._ids[row] for row in rows if row != position}
+            hits += len(truth & set(result))
+        print(f"  recall@{args.k} against exact search: {hits / (args.queries * args.k):.3f}")
+
+    timings = []
+    for _ in range(args.queries):
+        document = rng.choice(documents)
+        document["price"] *= rng.uniform(0.9, 1.1)
+        started = time.perf_counter()
+        index.upsert(document)
+        timings.append((time.perf_counter() - started) * 1000)
+    print(f"  {args.queries} incremental updates: {percentiles(timings)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import random
+
+from bson import ObjectId
+
+from app.location_index import LocationIndex
+
+PREFIXES = ["l", "lo", "loc", "loc1", "loc2", "in", "indore", "madhya"]
+
+
+def _listing(rng: random.Random) -> dict:
+    return {
+        "_id": ObjectId(),
+        "city": rng.choice(["Indore", "Bhopal"]),
+        "state": "Madhya Pradesh",
+        "locality": f"Loc{rng.randint(1, 40)}",
+        "status": "approved",
+        "is_active": True,
+    }
+
+
+def _rebuilt(documents) -> LocationIndex:
+    index = LocationIndex()
+    for document in documents:
+        index.upsert("properties", document)
+    index.ready = True
+    return index
+
+
+def _counts(index: LocationIndex, prefix: str):
+    return [suggestion["count"] for suggestion in index.suggest(prefix, 20)]
+
+
+def test_incremental_updates_match_rebuild():
+    rng = random.Random(11)
+    live = {}
+    index = LocationIndex()
+    index.ready = True
+    for step in range(3000):
+        if live and rng.random() < 0.45:
+            object_id = rng.choice(list(live))
+            del live[object_id]
+            index.remove("properties", object_id)
+        else:
+            document = _listing(rng)
+            live[document["_id"]] = document
+            index.upsert("properties", document)
+        # Reading caches the top lists that later writes have to keep current
+        prefix = rng.choice(PREFIXES)
+        index.suggest(prefix, 20)
+        if step % 100 == 99:
+            fresh = _rebuilt(live.values())
+            for prefix in PREFIXES:
+                assert _counts(index, prefix) == _counts(fresh, prefix), (step, prefix)
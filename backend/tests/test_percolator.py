@@ -0,0 +1,54 @@
+import random
+
+from bson import ObjectId
+
+from app.percolator import Percolator, requirement_filter
+from app.saved_searches import filter_matches
+
+CITIES = ["Indore", "Bhopal", "Pune"]
+TYPES = ["flat", "villa", "plot"]
+
+
+def _requirement(rng: random.Random) -> dict:
+    low = rng.randrange(10, 90)
+    requirement = {
+        "_id": ObjectId(),
+        "property_type": rng.choice(TYPES),
+        "city": rng.choice(CITIES),
+        "min_budget": float(low),
+        "max_budget": float(low + rng.randrange(0, 40)),
+        "is_fulfilled": False,
+    }
+    if rng.random() < 0.5:
+        requirement["min_area_sqft"] = float(rng.randrange(500, 1500))
+    if rng.random() < 0.5:
+        requirement["max_area_sqft"] = float(rng.randrange(1000, 3000))
+    return requirement
+
+
+def _listing(rng: random.Random) -> dict:
+    return {
+        "_id": ObjectId(),
+        "property_type": rng.choice(TYPES),
+        "city_id": rng.choice(CITIES).lower(),
+        "price": float(rng.randrange(0, 140)) if rng.random() < 0.9 else None,
+        "area_sqft": float(rng.randrange(200, 3500)) if rng.random() < 0.8 else None,
+        "status": "approved",
+        "is_active": True,
+    }
+
+
+def test_percolation_matches_requirement_filter():
+    rng = random.Random(3)
+    requirements = [_requirement(rng) for _ in range(300)]
+    percolator = Percolator()
+    for requirement in requirements:
+        percolator.upsert("property_requirements", requirement)
+    for _ in range(500):
+        listing = _listing(rng)
+        matched = set(percolator.match(listing).get("property_requirements", []))
+        expected = {
+            requirement["_id"] for requirement in requirements
+            if filter_matches(requirement_filter(requirement), listing)
+        }
+        assert matched == expected
@@ -0,0 +1,103 @@
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app.models import PropertyRecommendationForm
+from app.scoring import candidate_filter, rank_properties, refresh_ranking
+
+
+def _matches(condition, value) -> bool:
+    if not isinstance(condition, dict):
+        return value == condition
+    for operator, operand in condition.items():
+        if operator == "$in":
+            if value not in operand:
+                return False
+        elif value is None:
+            return False
+        elif operator == "$gte" and value < operand:
+            return False
+        elif operator == "$lte" and value > operand:
+            return False
+        elif operator == "$lt" and value >= operand:
+            return False
+    return True
+
+
+class _Cursor:
+    def __init__(self, documents):
+        self._documents = documents
+
+    def sort(self, key, direction=None):
+        keys = key if isinstance(key, list) else [(key, direction)]
+        for field, direction in reversed(keys):
+            self._documents.sort(key=lambda document: document[field], reverse=direction == -1)
+        return self
+
+    def limit(self, count):
+        self._documents = self._documents[:count]
+        return self
+
+    async def to_list(self, length=None):
+        return [dict(document) for document in self._documents]
+
+
+class _Collection:
+    """Just enough of a Motor collection for the ranking queries."""
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    def find(self, query, projection=None):
+        return _Cursor([
+            document for document in self.documents
+            if all(_matches(condition, document.get(field)) for field, condition in query.items())
+        ])
+
+
+class _Database:
+    def __init__(self, documents):
+        self.properties = _Collection(documents)
+
+
+def _listing(rng: random.Random, now: datetime) -> dict:
+    return {
+        "_id": ObjectId(),
+        "price": float(rng.randrange(20, 120)),
+        "bedrooms": rng.randint(1, 4),
+        "status": "approved",
+        "is_active": True,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def test_refresh_matches_full_ranking():
+    rng = random.Random(5)
+    now = datetime(2024, 1, 1)
+    db = _Database([_listing(rng, now) for _ in range(300)])
+    form = PropertyRecommendationForm(min_price=50, max_price=70, bedrooms=2)
+    query = candidate_filter(form)
+    k = 10
+    ranked = asyncio.run(rank_properties(db, form, k, query=query))
+    for _ in range(200):
+        since = now = now + timedelta(minutes=1)
+        for _ in range(rng.randint(1, 3)):
+            # Mostly edit the stored listings, so re-scores below the cut are common
+            if rng.random() < 0.7:
+                object_id = rng.choice(ranked)[0]
+                document = next(document for document in db.properties.documents if document["_id"] == object_id)
+            else:
+                document = rng.choice(db.properties.documents)
+            if rng.random() < 0.2:
+                document["status"] = "rejected"
+            else:
+                document["price"] = float(rng.randrange(20, 120))
+                document["status"] = "approved"
+            document["updated_at"] = now
+        refreshed = asyncio.run(refresh_ranking(db, form, query, ranked, since, k))
+        ranked = ranked if refreshed is None else refreshed
+        full = asyncio.run(rank_properties(db, form, k, query=query))
+        assert [score for _, score in ranked] == [score for _, score in full]